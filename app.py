@@ -5,21 +5,49 @@ Slack에서 @gpt 를 멘션하면 질문 유형에 따라 라우팅하여 답변
 
 import os
 import re
+import time
 import logging
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
 from dotenv import load_dotenv
 
-from core.rag import RAG
-from core.models import list_models
-from core.memory import get_thread_history
+from core.rag import RAG, get_trace_writer
+from core.models import get_llm, list_models, DEFAULT_MODEL
+from core.memory import ThreadHistoryStore, SummaryMemory, HISTORY_MODE, MAX_TURNS, SUMMARY_SOURCE_TURNS
+from core.streaming import SlackMessageStreamer
+from core.worker import RequestQueue, QueueFull
+from core.dedup import EventDeduplicator
+from core.metrics import (
+    REGISTRY, SLACK_API_SECONDS, QUEUE_DEPTH, QUEUE_ACTIVE, QUEUE_REJECTED, start_http_server,
+)
 
 # ── 환경 설정 ─────────────────────────────────────────
 load_dotenv()
 
+STREAM_ANSWERS = True          # 답변을 생성되는 대로 "검색 중" 메시지에 점진적으로 표시
+STREAM_UPDATE_INTERVAL = 1.0   # 스트리밍 중 메시지 수정 최소 간격 (초, Slack Rate Limit 대응)
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "4"))  # 동시에 처리할 질문 수 (동시 LLM 호출 상한)
+QUEUE_MAX_SIZE = 50            # 대기 가능한 최대 질문 수 (넘으면 안내 메시지로 거절)
+QUEUE_MAX_PER_USER = 3         # 사용자 1명당 대기 가능한 질문 수
+QUEUE_MAX_PER_CHANNEL = 20     # 채널 1개당 대기 가능한 질문 수
+EVENT_DEDUP_TTL = 600          # 재전송된 이벤트를 중복으로 판단하는 기간 (초)
+EVENT_DEDUP_FILE = Path(__file__).parent / "cache" / "seen_events.json"  # None이면 재시작 시 초기화
+METRICS_PORT = os.getenv("METRICS_PORT")  # 설정 시 http://127.0.0.1:{포트}/metrics 제공 (Prometheus 형식)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+SLACK_API_URL = os.getenv("SLACK_API_URL", WebClient.BASE_URL)  # 부하 테스트 시 가짜 Slack 서버 주소
+
+# 요청 큐가 가득 찼을 때의 안내 메시지
+BUSY_MESSAGES = {
+    "queue_full": "지금 질문이 많아 바로 답변드리기 어렵습니다 🙏 잠시 후 다시 질문해 주세요.",
+    "user_limit": "이전 질문들에 아직 답변하는 중입니다 ⏳ 답변을 받은 뒤 다시 질문해 주세요.",
+    "channel_limit": "이 채널에 처리 중인 질문이 많습니다 🙏 잠시 후 다시 질문해 주세요.",
+}
+
 # ── 로깅 설정 (Layer 1: 터미널 + 파일 동시 기록) ──────
 LOG_DIR = Path(__file__).parent / "logs"
 LOG_DIR.mkdir(exist_ok=True)
@@ -40,9 +68,47 @@ logging.basicConfig(level=logging.INFO, handlers=[stream_handler, file_handler])
 logger = logging.getLogger(__name__)
 
 # Slack 앱 초기화
-app = App(token=os.environ["SLACK_BOT_TOKEN"])
+app = App(client=WebClient(token=os.environ["SLACK_BOT_TOKEN"], base_url=SLACK_API_URL))
+
+
+class MeteredWebClient(WebClient):
+    """모든 Slack API 호출의 소요 시간과 결과를 메트릭으로 기록하는 WebClient"""
+
+    def api_call(self, api_method: str, **kwargs):
+        t0 = time.time()
+        status = "ok"
+        try:
+            return super().api_call(api_method, **kwargs)
+        except SlackApiError as e:
+            status = e.response.get("error", "error") if e.response is not None else "error"
+            raise
+        except Exception:
+            status = "exception"
+            raise
+        finally:
+            SLACK_API_SECONDS.observe(time.time() - t0, method=api_method, status=status)
+
+
+@app.middleware
+def use_metered_client(context, next):
+    """요청마다 만들어지는 client를 메트릭 기록용 client로 교체합니다 (say 포함)."""
+    client = context.client
+    if client is not None and not isinstance(client, MeteredWebClient):
+        context["client"] = MeteredWebClient(
+            token=client.token,
+            base_url=client.base_url,
+            timeout=client.timeout,
+            ssl=client.ssl,
+            proxy=client.proxy,
+            headers=client.headers,
+            team_id=context.team_id,
+            logger=client.logger,
+            retry_handlers=client.retry_handlers,
+        )
+    next()
 
-# RAG 엔진 초기화
+
+# RAG 엔진 초기화 — 인덱스 빌드(문서 로더의 fork 프로세스 풀)는 아래 스레드들이 시작되기 전에 해야 함
 logger.info("RAG 엔진 초기화 중...")
 rag = RAG()
 logger.info("RAG 엔진 준비 완료!")
@@ -50,6 +116,30 @@ logger.info("RAG 엔진 준비 완료!")
 # 사용자별 모델 설정 저장 (user_id → model_name)
 user_models: dict[str, str] = {}
 
+# 이벤트 중복 제거 (Slack 재전송 / 같은 메시지의 중복 이벤트)
+deduplicator = EventDeduplicator(ttl=EVENT_DEDUP_TTL, path=EVENT_DEDUP_FILE)
+
+# 스레드 대화 저장소 (받은 이벤트 + 게시한 답변, 없거나 누락 시에만 Slack API 조회)
+thread_store = ThreadHistoryStore()
+
+# 긴 스레드의 이전 대화 요약 (HISTORY_MODE = "summary"일 때 사용)
+summary_memory = SummaryMemory()
+
+# 요청 큐 (리스너는 큐에 넣고 바로 반환, 워커가 질문 처리)
+request_queue = RequestQueue(
+    workers=WORKER_COUNT,
+    max_size=QUEUE_MAX_SIZE,
+    max_per_user=QUEUE_MAX_PER_USER,
+    max_per_channel=QUEUE_MAX_PER_CHANNEL,
+)
+
+# 수집 시점에 읽는 메트릭
+QUEUE_DEPTH.set_function(lambda: request_queue.pending)
+QUEUE_ACTIVE.set_function(lambda: request_queue.active)
+REGISTRY.gauge("trace_records_dropped", "Trace records dropped by the trace writer").set_function(
+    lambda: get_trace_writer().dropped
+)
+
 
 # ── 명령어 처리 ───────────────────────────────────────
 def handle_command(question: str, user: str) -> str | None:
@@ -67,7 +157,7 @@ def handle_command(question: str, user: str) -> str | None:
         if len(parts) == 1 or parts[1].lower() == "list":
             # 모델 목록 표시
             available = list_models()
-            current = user_models.get(user, "gpt-4o-mini")
+            current = user_models.get(user, DEFAULT_MODEL)
             lines = [f"📋 사용 가능한 모델 (현재: *{current}*)"]
             for name in available:
                 marker = " ✅" if name == current else ""
@@ -81,8 +171,8 @@ def handle_command(question: str, user: str) -> str | None:
         if model_name not in available:
             return f"❌ '{model_name}' 모델을 찾을 수 없습니다.\n사용 가능: {', '.join(available)}"
 
+        # 공유 RAG 객체의 모델은 바꾸지 않고, 이 사용자의 질문에만 적용
         user_models[user] = model_name
-        rag.set_model(model_name)
         return f"✅ 모델이 *{model_name}* 으로 변경되었습니다."
 
     if cmd == "/help":
@@ -97,10 +187,129 @@ def handle_command(question: str, user: str) -> str | None:
     return None
 
 
-# ── 이벤트 핸들러 ─────────────────────────────────────
+# ── 질문 처리 (워커 스레드에서 실행) ─────────────────
+def queue_extra(queue_info: dict) -> dict:
+    """요청 큐 정보를 trace에 기록할 형태로 변환합니다."""
+    return {"queue": queue_info, "timing": {"0_queue_wait": queue_info["wait"]}}
+
+
+def answer_mention(
+    client,
+    channel: str,
+    thread_ts: str,
+    message_ts: str,
+    user: str,
+    question: str,
+    loading_ts: str,
+    received_at: float,
+    queue_info: dict,
+):
+    """멘션 질문에 답변하여 "검색 중" 메시지를 교체합니다."""
+    streamer = None
+    if STREAM_ANSWERS:
+        streamer = SlackMessageStreamer(
+            client, channel, loading_ts, interval=STREAM_UPDATE_INTERVAL, started=received_at
+        )
+
+    try:
+        # 스레드 히스토리 수집 (멀티턴, 저장소에 없을 때만 Slack API 호출)
+        t_history = time.time()
+        max_turns = SUMMARY_SOURCE_TURNS if HISTORY_MODE == "summary" else MAX_TURNS
+        history, history_status = thread_store.get(client, channel, thread_ts, message_ts, max_turns=max_turns)
+        extra = queue_extra(queue_info)
+        extra["cache"] = {"thread_history": history_status}
+        extra["timing"]["0_thread_history"] = round(time.time() - t_history, 3)
+
+        # 긴 스레드: 최근 턴 원문 + 이전 대화 요약 (토큰 예산 내로 압축, 요약은 기본 모델 사용)
+        if HISTORY_MODE == "summary" and history:
+            t_summary = time.time()
+            history, summary_status = summary_memory.compact(
+                f"{channel}:{thread_ts}", history, get_llm(), model_name=user_models.get(user, DEFAULT_MODEL)
+            )
+            extra["cache"]["history_summary"] = summary_status
+            extra["timing"]["0_history_summary"] = round(time.time() - t_summary, 3)
+
+        trace = rag.ask_with_trace(
+            question, source="slack", chat_history=history,
+            on_token=streamer.on_token if streamer else None,
+            extra=extra,
+            model_name=user_models.get(user),
+        )
+
+        # 상세 로그
+        if trace.get("rewritten_query"):
+            logger.info(f"[Query Rewriting] '{question}' → '{trace['rewritten_query']}'")
+        logger.info(f"[라우팅] route={trace['route']} | model={trace['model']}")
+        if trace["retrieved_chunks"]:
+            logger.info(f"[검색 완료] 유사 청크 {len(trace['retrieved_chunks'])}개")
+            for i, chunk in enumerate(trace["retrieved_chunks"], 1):
+                logger.info(
+                    f"  [{i}] {chunk['source']} (p.{chunk['page']}) | "
+                    f"RRF: {chunk['rrf_score']} | 벡터 거리: {chunk['score']}"
+                )
+        logger.info(
+            f"[답변 생성] "
+            f"큐 대기={queue_info['wait']}s | "
+            f"라우팅={trace['timing'].get('0_routing', '?')}s | "
+            f"검색={trace['timing'].get('1_retrieval', '-')}s | "
+            f"첫 토큰={trace['timing'].get('2_first_token', '-')}s | "
+            f"LLM={trace['timing'].get('2_llm_generation', '?')}s | "
+            f"총={trace['timing'].get('total', '?')}s"
+        )
+        if trace.get("token_usage"):  # 병합된 요청(follower)은 LLM을 호출하지 않아 비어 있음
+            usage = trace["token_usage"]
+            logger.info(f"[토큰] 프롬프트={usage['prompt_tokens']} + 답변={usage['completion_tokens']} = 총 {usage['total_tokens']}")
+
+        # "검색 중" (또는 스트리밍 중인 메시지) → 최종 답변으로 교체
+        if streamer:
+            streamer.finish(trace["answer"])
+            logger.info(
+                f"[스트리밍] 첫 표시={streamer.first_visible if streamer.first_visible is not None else '-'}s | "
+                f"메시지 수정 {streamer.updates}회"
+            )
+        else:
+            client.chat_update(
+                channel=channel,
+                ts=loading_ts,
+                text=trace["answer"],
+            )
+        thread_store.record(channel, thread_ts, loading_ts, "assistant", trace["answer"])
+        logger.info(f"[슬랙 전송 완료] 답변 길이: {len(trace['answer'])}자")
+
+    except Exception as e:
+        logger.error(f"[답변 생성 실패] {e}", exc_info=True)
+        if streamer:
+            streamer.close()  # 스트리밍 수정이 오류 메시지를 덮어쓰지 않도록 먼저 멈춤
+        client.chat_update(
+            channel=channel,
+            ts=loading_ts,
+            text=f"답변 생성 중 오류가 발생했습니다.\n```{str(e)}```",
+        )
+
+
+def answer_dm(say, user: str, question: str, queue_info: dict):
+    """DM 질문에 답변합니다."""
+    try:
+        # DM은 스레드 없으므로 히스토리 없음
+        trace = rag.ask_with_trace(
+            question, source="dm", extra=queue_extra(queue_info), model_name=user_models.get(user)
+        )
+        logger.info(f"[DM] route={trace['route']} | 큐 대기={queue_info['wait']}s | 총={trace['timing'].get('total', '?')}s")
+        say(text=trace["answer"])
+    except Exception as e:
+        logger.error(f"[DM 답변 생성 실패] {e}", exc_info=True)
+        say(text=f"답변 생성 중 오류가 발생했습니다.\n```{str(e)}```")
+
+
+# ── 이벤트 핸들러 (큐에 넣고 바로 반환) ──────────────
 @app.event("app_mention")
-def handle_mention(event, say, client):
-    """@gpt 멘션을 받으면 라우팅하여 답변합니다."""
+def handle_mention(event, say, client, body):
+    """@gpt 멘션을 받으면 요청 큐에 넣어 라우팅/답변합니다."""
+    received_at = time.time()
+    if deduplicator.is_duplicate(EventDeduplicator.keys_for(event, body)):
+        logger.info(f"[중복 이벤트 무시] event_id={body.get('event_id')} | ts={event.get('ts')}")
+        return
+
     raw_text = event.get("text", "")
     user = event.get("user", "")
     channel = event.get("channel", "")
@@ -118,84 +327,67 @@ def handle_mention(event, say, client):
         return
 
     logger.info(f"[질문 수신] user={user} | question={question}")
+    thread_store.record_event(event, create=True)
 
-    # 명령어 처리
+    # 명령어 처리 (가벼우므로 큐를 거치지 않음)
     cmd_response = handle_command(question, user)
     if cmd_response is not None:
-        say(text=cmd_response, thread_ts=thread_ts)
+        posted = say(text=cmd_response, thread_ts=thread_ts)
+        thread_store.record(channel, thread_ts, posted["ts"], "assistant", cmd_response)
         logger.info(f"[명령어 처리] cmd={question} | 응답 길이: {len(cmd_response)}자")
         return
 
-    # "검색 중" 메시지
+    # "검색 중" 메시지 (앞에 대기 중인 요청이 있으면 함께 안내)
+    waiting = request_queue.pending
     loading_msg = client.chat_postMessage(
         channel=channel,
-        text="문서를 검색 중입니다...",
+        text="문서를 검색 중입니다..." + (f" (앞에 {waiting}건 대기 중)" if waiting else ""),
         thread_ts=thread_ts,
     )
 
     try:
-        # 스레드 히스토리 수집 (멀티턴)
-        history = get_thread_history(client, channel, thread_ts)
-        trace = rag.ask_with_trace(question, source="slack", chat_history=history)
-
-        # 상세 로그
-        if trace.get("rewritten_query"):
-            logger.info(f"[Query Rewriting] '{question}' → '{trace['rewritten_query']}'")
-        logger.info(f"[라우팅] route={trace['route']}")
-        if trace["retrieved_chunks"]:
-            logger.info(f"[검색 완료] 유사 청크 {len(trace['retrieved_chunks'])}개")
-            for i, chunk in enumerate(trace["retrieved_chunks"], 1):
-                logger.info(f"  [{i}] {chunk['source']} (p.{chunk['page']}) | 유사도: {chunk['score']}")
-        logger.info(
-            f"[답변 생성] "
-            f"라우팅={trace['timing'].get('0_routing', '?')}s | "
-            f"검색={trace['timing'].get('1_retrieval', '-')}s | "
-            f"LLM={trace['timing'].get('2_llm_generation', '?')}s | "
-            f"총={trace['timing'].get('total', '?')}s"
-        )
-        if "token_usage" in trace:
-            usage = trace["token_usage"]
-            logger.info(f"[토큰] 프롬프트={usage['prompt_tokens']} + 답변={usage['completion_tokens']} = 총 {usage['total_tokens']}")
-
-        # "검색 중" → 실제 답변으로 교체
-        client.chat_update(
+        request_queue.submit(
+            lambda queue_info: answer_mention(
+                client, channel, thread_ts, event["ts"], user, question, loading_msg["ts"], received_at, queue_info
+            ),
+            user=user,
             channel=channel,
-            ts=loading_msg["ts"],
-            text=trace["answer"],
-        )
-        logger.info(f"[슬랙 전송 완료] 답변 길이: {len(trace['answer'])}자")
-
-    except Exception as e:
-        logger.error(f"[답변 생성 실패] {e}", exc_info=True)
-        client.chat_update(
-            channel=channel,
-            ts=loading_msg["ts"],
-            text=f"답변 생성 중 오류가 발생했습니다.\n```{str(e)}```",
         )
+    except QueueFull as e:
+        QUEUE_REJECTED.inc(reason=e.reason)
+        client.chat_update(channel=channel, ts=loading_msg["ts"], text=BUSY_MESSAGES[e.reason])
 
 
 @app.event("message")
-def handle_dm(event, say):
-    """DM으로 질문이 오면 답변합니다."""
+def handle_dm(event, say, body):
+    """DM으로 질문이 오면 요청 큐에 넣어 답변합니다."""
     if event.get("bot_id") or event.get("subtype"):
         return
+    # 채널 메시지는 보관 중인 스레드의 대화로만 기록 (멘션 없이 달린 답글도 히스토리에 반영)
+    # message.channels / message.groups를 구독하지 않으면 이 이벤트가 오지 않아 스레드 히스토리는 항상 API로 조회
+    thread_store.record_event(event, message_event=True)
     if event.get("channel_type", "") != "im":
         return
+    if deduplicator.is_duplicate(EventDeduplicator.keys_for(event, body)):
+        logger.info(f"[중복 이벤트 무시] event_id={body.get('event_id')} | ts={event.get('ts')}")
+        return
 
     question = event.get("text", "").strip()
     if not question:
         return
 
+    user = event.get("user", "")
     logger.info(f"[DM 질문 수신] question={question}")
 
     try:
-        # DM은 스레드 없으므로 히스토리 없음
-        trace = rag.ask_with_trace(question, source="dm")
-        logger.info(f"[DM] route={trace['route']} | 총={trace['timing'].get('total', '?')}s")
-        say(text=trace["answer"])
-    except Exception as e:
-        logger.error(f"[DM 답변 생성 실패] {e}", exc_info=True)
-        say(text=f"답변 생성 중 오류가 발생했습니다.\n```{str(e)}```")
+        request_queue.submit(
+            lambda queue_info: answer_dm(say, user, question, queue_info),
+            user=user,
+            channel=event.get("channel", ""),
+        )
+    except QueueFull as e:
+        QUEUE_REJECTED.inc(reason=e.reason)
+        say(text=BUSY_MESSAGES[e.reason])
 
 
 # ── 실행 ──────────────────────────────────────────────
@@ -204,6 +396,10 @@ if __name__ == "__main__":
     print("  Slack RAG 챗봇이 시작됩니다!")
     print("  Slack에서 @gpt 를 멘션하여 질문하세요.")
     print("  명령어: /model, /help")
+    print(f"  워커: {WORKER_COUNT}개 | 대기 큐: 최대 {QUEUE_MAX_SIZE}건")
+    if METRICS_PORT:
+        start_http_server(int(METRICS_PORT), host=METRICS_HOST)
+        print(f"  메트릭: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
     print("  종료: Ctrl+C")
     print(f"  로그 저장: {LOG_DIR}")
     print("=" * 50)
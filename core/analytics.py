@@ -0,0 +1,262 @@
+"""
+트레이스 분석 (Trace Analytics)
+
+logs/traces.jsonl과 교체·압축된 이전 파일(traces-*.jsonl.gz)을 한 줄씩 읽어
+단계별 / 경로별 / 모델별 지연 시간 분위수(p50/p90/p99), 기간별 토큰 사용량과 추정 비용,
+가장 느린 요청을 보고합니다.
+레코드를 메모리에 모으지 않고 로그 구간 히스토그램으로 집계하므로 파일 크기와 무관하게 메모리가 일정합니다.
+
+실행:
+    python -m core.analytics
+    python -m core.analytics --since 2026-10-01 --until 2026-10-08 --source slack
+    python -m core.analytics --bucket hour --top 20 --json
+"""
+
+import argparse
+import gzip
+import heapq
+import json
+import math
+import sys
+from collections import defaultdict
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+
+# ── 설정 ──────────────────────────────────────────────
+DEFAULT_LOG_DIR = Path(__file__).parent.parent / "logs"
+TRACE_STEM = "traces"
+HISTOGRAM_GROWTH = 1.05     # 구간 경계 비율 (분위수 상대 오차 약 ±2.5%)
+HISTOGRAM_MIN = 0.001       # 이보다 작은 값은 첫 구간에 포함 (초)
+QUANTILES = (0.5, 0.9, 0.99)
+
+# 100만 토큰당 가격 (USD, 입력/출력) — 비용은 추정치이며 가격 변경 시 수정
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+
+class LogHistogram:
+    """값을 로그 간격 구간에 세어 분위수를 근사하는 고정 메모리 히스토그램"""
+
+    def __init__(self, growth: float = HISTOGRAM_GROWTH, minimum: float = HISTOGRAM_MIN):
+        self.growth = growth
+        self.minimum = minimum
+        self._log_growth = math.log(growth)
+        self.buckets: dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        index = 0 if value <= self.minimum else int(math.log(value / self.minimum) / self._log_growth) + 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """q 분위수의 근사값 (해당 구간의 기하 평균 값, 관측한 최댓값을 넘지 않음)"""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                if index == 0:
+                    # 첫 구간은 minimum 이하 값 전체 → 모든 값이 minimum보다 작으면 max가 더 정확
+                    return min(self.max, self.minimum)
+                low = self.minimum * self.growth ** (index - 1)
+                return min(self.max, low * math.sqrt(self.growth))
+        return self.max
+
+    def summary(self) -> dict:
+        result = {"count": self.count, "avg": round(self.total / self.count, 3) if self.count else 0.0}
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}"] = round(self.quantile(q), 3)
+        result["max"] = round(self.max, 3)
+        return result
+
+
+# ── 트레이스 읽기 ─────────────────────────────────────
+def trace_files(log_dir: Path) -> list[Path]:
+    """교체된 압축 파일(이름순 = 시간순) → 현재 파일 순서로 반환합니다."""
+    files = sorted(log_dir.glob(f"{TRACE_STEM}-*.jsonl.gz"))
+    current = log_dir / f"{TRACE_STEM}.jsonl"
+    if current.exists():
+        files.append(current)
+    return files
+
+
+def iter_records(files: list[Path]) -> Iterator[dict]:
+    """파일들을 한 줄씩 읽어 레코드를 yield 합니다. 깨진 줄은 건너뜁니다."""
+    for path in files:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def parse_time(value: str) -> datetime:
+    """"2026-10-01" 또는 "2026-10-01T09:30" 형식"""
+    return datetime.fromisoformat(value)
+
+
+# ── 집계 ──────────────────────────────────────────────
+class TraceReport:
+    """트레이스 레코드를 한 건씩 받아 집계합니다."""
+
+    def __init__(self, bucket: str = "day", top: int = 10):
+        self.bucket_format = "%Y-%m-%d %H:00" if bucket == "hour" else "%Y-%m-%d"
+        self.top = top
+        self.requests = 0
+        self.stages: dict[str, LogHistogram] = defaultdict(LogHistogram)
+        self.routes: dict[str, LogHistogram] = defaultdict(LogHistogram)
+        self.models: dict[str, LogHistogram] = defaultdict(LogHistogram)
+        self.tokens: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))  # 기간 → 항목 → 합계
+        self.cost: dict[str, float] = defaultdict(float)
+        self.model_tokens: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._slowest: list[tuple[float, int, dict]] = []  # 최소 힙 (총 시간, 순번, 요약)
+
+    def add(self, record: dict, timestamp: datetime):
+        self.requests += 1
+        timing = record.get("timing") or {}
+        for stage, seconds in timing.items():
+            if isinstance(seconds, (int, float)):
+                self.stages[stage].add(seconds)
+
+        total = timing.get("total")
+        route = record.get("route") or "-"
+        model = record.get("model") or "-"
+        if isinstance(total, (int, float)):
+            self.routes[route].add(total)
+            self.models[model].add(total)
+            item = (total, self.requests, {
+                "timestamp": record.get("timestamp", ""),
+                "total": total,
+                "route": route,
+                "model": model,
+                "source": record.get("source", ""),
+                "question": record.get("question", "")[:80],
+            })
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, item)
+            elif total > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+        usage = record.get("token_usage") or {}
+        if usage:
+            period = timestamp.strftime(self.bucket_format)
+            prompt = usage.get("prompt_tokens", 0)
+            completion = usage.get("completion_tokens", 0)
+            self.tokens[period]["requests"] += 1
+            self.tokens[period]["prompt_tokens"] += prompt
+            self.tokens[period]["completion_tokens"] += completion
+            self.model_tokens[model]["prompt_tokens"] += prompt
+            self.model_tokens[model]["completion_tokens"] += completion
+            price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+            self.cost[period] += (prompt * price_in + completion * price_out) / 1_000_000
+
+    def slowest(self) -> list[dict]:
+        return [item for _, _, item in sorted(self._slowest, reverse=True)]
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "stages": {k: v.summary() for k, v in sorted(self.stages.items())},
+            "routes": {k: v.summary() for k, v in sorted(self.routes.items())},
+            "models": {k: v.summary() for k, v in sorted(self.models.items())},
+            "tokens": {
+                period: {**values, "cost_usd": round(self.cost[period], 4)}
+                for period, values in sorted(self.tokens.items())
+            },
+            "model_tokens": {k: dict(v) for k, v in sorted(self.model_tokens.items())},
+            "slowest": self.slowest(),
+        }
+
+
+# ── 출력 ──────────────────────────────────────────────
+def _print_latency_table(title: str, histograms: dict[str, dict]):
+    print(f"\n■ {title}")
+    if not histograms:
+        print("  (데이터 없음)")
+        return
+    width = max(len(name) for name in histograms) + 2
+    print(f"  {'':<{width}}{'count':>8}{'avg':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, s in histograms.items():
+        print(
+            f"  {name:<{width}}{s['count']:>8,}{s['avg']:>10.3f}{s['p50']:>10.3f}"
+            f"{s['p90']:>10.3f}{s['p99']:>10.3f}{s['max']:>10.3f}"
+        )
+
+
+def print_report(report: dict):
+    print("=" * 70)
+    print(f"  트레이스 분석 — 요청 {report['requests']:,}건 (단위: 초)")
+    print("=" * 70)
+    _print_latency_table("단계별 지연 시간", report["stages"])
+    _print_latency_table("경로별 총 지연 시간", report["routes"])
+    _print_latency_table("모델별 총 지연 시간", report["models"])
+
+    print("\n■ 기간별 토큰 사용량 (비용은 MODEL_PRICES 기준 추정)")
+    if not report["tokens"]:
+        print("  (데이터 없음)")
+    for period, t in report["tokens"].items():
+        print(
+            f"  {period:<18} 요청 {t['requests']:>6,}건 | 입력 {t['prompt_tokens']:>10,} | "
+            f"출력 {t['completion_tokens']:>9,} | ${t['cost_usd']:.4f}"
+        )
+    for model, t in report["model_tokens"].items():
+        print(f"  [{model}] 입력 {t['prompt_tokens']:,} / 출력 {t['completion_tokens']:,}")
+
+    print(f"\n■ 가장 느린 요청 {len(report['slowest'])}건")
+    for item in report["slowest"]:
+        print(
+            f"  {item['total']:>7.3f}s | {item['timestamp'][:19]} | {item['route']:<8} | "
+            f"{item['model']:<12} | {item['source']:<5} | {item['question']}"
+        )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="traces.jsonl 지연 시간 / 토큰 사용량 분석")
+    parser.add_argument("--log-dir", type=Path, default=DEFAULT_LOG_DIR, help="traces.jsonl이 있는 폴더")
+    parser.add_argument("--since", type=parse_time, help="이 시각 이후 (예: 2026-10-01)")
+    parser.add_argument("--until", type=parse_time, help="이 시각 이전 (예: 2026-10-08)")
+    parser.add_argument("--source", help="요청 출처 필터 (slack, dm, test ...)")
+    parser.add_argument("--bucket", choices=["day", "hour"], default="day", help="토큰 사용량 집계 단위")
+    parser.add_argument("--top", type=int, default=10, help="표시할 느린 요청 수")
+    parser.add_argument("--json", action="store_true", help="JSON으로 출력")
+    args = parser.parse_args(argv)
+
+    files = trace_files(args.log_dir)
+    if not files:
+        print(f"❌ 트레이스 파일이 없습니다: {args.log_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    report = TraceReport(bucket=args.bucket, top=args.top)
+    for record in iter_records(files):
+        try:
+            timestamp = datetime.fromisoformat(record.get("timestamp", ""))
+        except ValueError:
+            continue
+        if args.since and timestamp < args.since:
+            continue
+        if args.until and timestamp >= args.until:
+            continue
+        if args.source and record.get("source") != args.source:
+            continue
+        report.add(record, timestamp)
+
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        print_report(report.to_dict())
+
+
+if __name__ == "__main__":
+    main()
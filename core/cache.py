@@ -0,0 +1,312 @@
+"""
+임베딩 캐시 (Embedding Cache)
+
+- EmbeddingCache / CachedEmbeddings: 청크 텍스트의 해시를 키로 임베딩 벡터를 디스크(SQLite)에 저장하여,
+  인덱스를 다시 빌드할 때 이미 임베딩한 청크는 API를 호출하지 않도록 합니다.
+- QueryEmbeddingCache: 자주 묻는 검색 질의의 임베딩을 메모리(LRU)에 보관하여
+  같은 질문이 반복되면 임베딩 API 왕복 없이 바로 검색합니다.
+- AnswerCache: 질문 임베딩 유사도가 임계값 이상인 이전 질문의 답변을 재사용합니다.
+"""
+
+import copy
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 50_000
+_SQLITE_BATCH = 500  # SQLite 바인딩 변수 개수 제한 대응
+
+
+class EmbeddingCache:
+    """(임베딩 모델 이름 + 텍스트 해시) → 벡터를 저장하는 SQLite 기반 캐시 (LRU 방식 용량 제한)"""
+
+    def __init__(self, path: Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> list[list[float] | None]:
+        """키 목록에 대한 벡터를 반환합니다. 캐시에 없으면 None."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[i:i + _SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def put_many(self, items: list[tuple[str, list[float]]]):
+        """(키, 벡터) 목록을 저장하고, 최대 개수를 넘으면 오래 쓰이지 않은 항목부터 삭제합니다."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                logger.info(f"[임베딩 캐시] {count - self.max_entries}개 항목 제거 (최대 {self.max_entries}개)")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """임베딩 모델을 감싸서 embed_documents 결과를 EmbeddingCache에 저장/재사용합니다."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.base = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.hits = 0
+        self.misses = 0
+
+    def _keys(self, texts: list[str]) -> list[str]:
+        return [EmbeddingCache.make_key(self.model, text) for text in texts]
+
+    def lookup(self, texts: list[str]) -> list[list[float] | None]:
+        """캐시된 벡터를 반환합니다. 캐시에 없으면 None."""
+        vectors = self.cache.get_many(self._keys(texts))
+        hit_count = sum(v is not None for v in vectors)
+        self.hits += hit_count
+        self.misses += len(vectors) - hit_count
+        return vectors
+
+    def store(self, texts: list[str], vectors: list[list[float]]):
+        self.cache.put_many(list(zip(self._keys(texts), vectors)))
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.lookup(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            new_vectors = self.base.embed_documents([texts[i] for i in missing])
+            self.store([texts[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.base.embed_query(text)
+
+
+def normalize_query(text: str) -> str:
+    """캐시 키용 질의 정규화 (유니코드 정규화 + 공백 정리 + 소문자)"""
+    return " ".join(unicodedata.normalize("NFKC", text).split()).lower()
+
+
+class QueryEmbeddingCache:
+    """
+    정규화된 검색 질의 → 임베딩 벡터 LRU 캐시
+
+    정규화한 질의는 캐시 키로만 쓰고, 임베딩은 사용자가 입력한 원래 질의로 만듭니다.
+    메모리에 없으면 디스크(EmbeddingCache, 선택)를 확인하고, 그래도 없을 때만 API를 호출합니다.
+    디스크에 저장된 벡터는 재시작 후에도 재사용됩니다.
+
+    Args:
+        embeddings: 임베딩 모델
+        max_size: 메모리에 보관할 최대 질의 수
+        ttl: 항목 유효 시간 (초, None이면 무제한)
+        disk: 디스크 영속화에 사용할 EmbeddingCache (None이면 메모리만 사용)
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_size: int = 1024,
+        ttl: float | None = None,
+        disk: EmbeddingCache | None = None,
+    ):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk = disk
+        self._entries: OrderedDict[str, tuple[list[float], float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_memory(self, key: str) -> list[float] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, created = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _put_memory(self, key: str, vector: list[float]):
+        with self._lock:
+            self._entries[key] = (vector, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _count(self, result: str):
+        with self._lock:
+            if result == "memory":
+                self.hits += 1
+            elif result == "disk":
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+
+    def embed(self, text: str) -> tuple[list[float], str]:
+        """질의 임베딩과 조회 결과("memory" | "disk" | "miss")를 반환합니다."""
+        key = normalize_query(text)
+
+        vector = self._get_memory(key)
+        if vector is not None:
+            self._count("memory")
+            return vector, "memory"
+
+        # "query:" 접두어: 정규화된 질의로 임베딩하던 이전 버전의 디스크 항목과 구분
+        disk_key = EmbeddingCache.make_key(self.model, f"query:{key}")
+        if self.disk is not None:
+            vector = self.disk.get_many([disk_key])[0]
+            if vector is not None:
+                self._count("disk")
+                self._put_memory(key, vector)
+                return vector, "disk"
+
+        self._count("miss")
+        vector = self.embeddings.embed_query(text)
+        self._put_memory(key, vector)
+        if self.disk is not None:
+            self.disk.put_many([(disk_key, vector)])
+        return vector, "miss"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+class AnswerCache:
+    """
+    질문 임베딩의 코사인 유사도로 이전 답변을 찾아 재사용하는 시맨틱 캐시
+
+    항목은 모델별로 구분되어 같은 모델로 생성한 답변만 매칭되며,
+    인덱스 버전(매니페스트)이 바뀌면 전체 항목을 비웁니다.
+
+    Args:
+        threshold: 캐시 적중으로 볼 최소 코사인 유사도
+        max_size: 최대 항목 수 (초과 시 가장 오래 쓰이지 않은 항목 삭제)
+        ttl: 항목 유효 시간 (초, None이면 무제한)
+    """
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 512, ttl: float | None = None):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.index_version = ""
+        self._entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def set_index_version(self, version: str):
+        """인덱스 버전을 갱신하고, 바뀌었으면 기존 답변을 모두 무효화합니다."""
+        with self._lock:
+            if version != self.index_version:
+                if self._entries:
+                    logger.info(f"[답변 캐시] 인덱스 변경 → {len(self._entries)}개 항목 무효화")
+                self._entries.clear()
+                self.index_version = version
+
+    def lookup(self, vector: list[float], model: str) -> tuple[dict, float] | None:
+        """가장 유사한 이전 질문의 (저장된 결과의 복사본, 유사도)를 반환합니다. 임계값 미만이면 None."""
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        now = time.time()
+
+        with self._lock:
+            best_key, best_score = None, -1.0
+            for key, entry in list(self._entries.items()):
+                if self.ttl is not None and now - entry["created"] > self.ttl:
+                    del self._entries[key]
+                    continue
+                if key[0] != model:
+                    continue
+                score = float(entry["vector"] @ query)
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            result = self._entries[best_key]["result"]
+        # 호출한 쪽이 결과(trace)를 고쳐도 캐시 항목이 바뀌지 않도록 복사본 반환
+        return copy.deepcopy(result), best_score
+
+    def store(self, question: str, vector: list[float], model: str, result: dict):
+        """질문 벡터와 결과(답변, 검색 청크 등)의 복사본을 저장합니다."""
+        result = copy.deepcopy(result)
+        vec = np.asarray(vector, dtype=np.float32)
+        vec /= np.linalg.norm(vec) or 1.0
+        key = (model, normalize_query(question))
+        with self._lock:
+            self._entries[key] = {"vector": vec, "result": result, "created": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,135 @@
+"""
+컨텍스트 조합 (Context Packing)
+
+검색된 청크를 프롬프트의 "참고 문서" 블록으로 조합합니다.
+- 같은 문서 / 같은 쪽의 청크는 블록 1개로 묶고, 청크 겹침(CHUNK_OVERLAP)으로 반복되는 텍스트는 이어 붙여 1번만 포함
+- 청크 내용 앞의 [출처: ...] 줄은 블록 제목과 중복되므로 제거
+- 관련도 순으로 토큰 예산 안에 들어가는 블록만 포함 (토큰 수는 답변 모델의 토크나이저 기준)
+"""
+
+from core.models import count_tokens
+
+BLOCK_SEPARATOR = "\n\n---\n\n"
+PART_SEPARATOR = "\n…\n"  # 같은 쪽이지만 이어지지 않는 청크 사이
+MIN_OVERLAP_CHARS = 20    # 이보다 짧게 겹치면 우연히 같은 문구로 보고 이어 붙이지 않음
+
+
+def _format_block(index: int, source: str, page, text: str) -> str:
+    return f"[문서 {index}] (출처: {source}, p.{page})\n{text}"
+
+
+def _strip_source_header(chunk: dict) -> str:
+    """로더가 청크 앞에 넣은 "[출처: 파일명]" 줄을 제거합니다."""
+    header = f"[출처: {chunk['source']}]\n"
+    text = chunk["text"]
+    return text[len(header):] if text.startswith(header) else text
+
+
+def _overlap(a: str, b: str) -> int:
+    """a의 끝과 b의 시작이 겹치는 가장 긴 길이 (MIN_OVERLAP_CHARS 미만이면 0)"""
+    for k in range(min(len(a), len(b)), MIN_OVERLAP_CHARS - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+
+def _join(a: str, b: str) -> str | None:
+    """두 텍스트가 포함 관계이거나 겹치면 하나로 합친 텍스트, 아니면 None"""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    k = _overlap(a, b)
+    if k:
+        return a + b[k:]
+    k = _overlap(b, a)
+    if k:
+        return b + a[k:]
+    return None
+
+
+def merge_overlapping(texts: list[str]) -> list[str]:
+    """겹치거나 포함되는 텍스트를 합칩니다 (합친 결과가 다른 텍스트와 또 겹칠 수 있으므로 더 합칠 수 없을 때까지)."""
+    merged = list(texts)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                combined = _join(merged[i], merged[j])
+                if combined is not None:
+                    merged[i] = combined
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+def _truncate(text: str, max_tokens: int, model_name: str | None = None) -> str:
+    """텍스트를 max_tokens 토큰 이내로 자릅니다 (앞부분 유지)."""
+    while text and count_tokens(text, model_name) > max_tokens:
+        text = text[: int(len(text) * 0.9)]
+    return text
+
+
+def build_context(chunks: list[dict]) -> str:
+    """retrieved_chunks를 그대로 이어 붙인 "참고 문서" 블록 (병합 / 예산 적용 전, 비교 기준)"""
+    return BLOCK_SEPARATOR.join(
+        _format_block(i, chunk["source"], chunk["page"], chunk["text"])
+        for i, chunk in enumerate(chunks, 1)
+    )
+
+
+def pack_context(
+    chunks: list[dict], token_budget: int | None = None, model_name: str | None = None
+) -> tuple[str, dict]:
+    """
+    retrieved_chunks(관련도 순)를 문서 / 쪽별로 묶고 겹침을 제거한 뒤 토큰 예산 안으로 조합합니다.
+
+    Args:
+        chunks: {"source", "page", "score", "rrf_score", "text"} 목록 (core.rag.chunk_records)
+        token_budget: 컨텍스트 최대 토큰 수 (None이면 제한 없음). 가장 관련도 높은 블록이
+            혼자 예산을 넘으면 잘라서 포함하고, 그 외 예산을 넘는 블록은 제외합니다.
+        model_name: 토큰 수를 셀 답변 모델 (None이면 기본 인코딩)
+
+    Returns:
+        (컨텍스트 문자열, trace 기록용 통계)
+    """
+    # 1. 같은 문서 / 쪽끼리 묶기 (가장 관련도 높은 청크가 나온 순서 유지)
+    groups: dict[tuple[str, str], list[str]] = {}
+    for chunk in chunks:
+        key = (chunk["source"], str(chunk["page"]))
+        groups.setdefault(key, []).append(_strip_source_header(chunk))
+
+    # 2. 겹침 제거 → 예산 안에서 블록 추가
+    parts_total = 0
+    blocks, tokens, dropped, truncated = [], 0, 0, False
+    separator_tokens = count_tokens(BLOCK_SEPARATOR, model_name)
+    for (source, page), texts in groups.items():
+        parts = merge_overlapping(texts)
+        parts_total += len(parts)
+        block = _format_block(len(blocks) + 1, source, page, PART_SEPARATOR.join(parts))
+        cost = count_tokens(block, model_name) + (separator_tokens if blocks else 0)
+        if token_budget is not None and tokens + cost > token_budget:
+            if blocks:
+                dropped += 1
+                continue
+            block = _truncate(block, token_budget, model_name)
+            cost, truncated = count_tokens(block, model_name), True
+        blocks.append(block)
+        tokens += cost
+
+    context = BLOCK_SEPARATOR.join(blocks)
+    stats = {
+        "chunks": len(chunks),
+        "blocks": len(blocks),
+        "merged": len(chunks) - parts_total,
+        "dropped_blocks": dropped,
+        "truncated": truncated,
+        "tokens": count_tokens(context, model_name),
+        "unpacked_tokens": count_tokens(build_context(chunks), model_name),
+        "token_budget": token_budget,
+    }
+    return context, stats
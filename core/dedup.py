@@ -0,0 +1,153 @@
+"""
+이벤트 중복 제거 (Event De-duplication)
+
+Slack은 3초 안에 응답(ack)을 받지 못하면 같은 이벤트를 다시 보냅니다.
+이미 받은 이벤트(event_id 또는 채널+메시지 ts)를 TTL 동안 기억하여,
+재전송/중복 이벤트는 비용이 드는 처리(재작성/라우팅/검색/생성)를 시작하기 전에 버립니다.
+파일 경로를 지정하면 재시작 후에도 처리한 이벤트를 기억합니다.
+파일 저장은 ack 경로를 막지 않도록 백그라운드 스레드가 일정 간격(변경이 있을 때만)과 종료 시에 합니다.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 600            # 이벤트를 기억하는 시간 (초)
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_PERSIST_INTERVAL = 1.0  # 파일 저장 간격 (초) — 이 사이에 종료되면 마지막 간격의 키는 종료 시 저장으로 보존
+
+
+class EventDeduplicator:
+    """
+    TTL 동안 처리한 이벤트 키를 기억하는 중복 제거기 (스레드 안전)
+
+    Args:
+        ttl: 이벤트 키 유효 시간 (초)
+        path: 영속화할 JSON 파일 경로 (None이면 메모리만 사용)
+        max_entries: 최대 기억 개수 (초과 시 오래된 키부터 삭제)
+        persist_interval: 변경된 키를 파일에 저장하는 간격 (초)
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        path: Path | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        persist_interval: float = DEFAULT_PERSIST_INTERVAL,
+    ):
+        self.ttl = ttl
+        self.path = path
+        self.max_entries = max_entries
+        self.persist_interval = persist_interval
+        self._seen: OrderedDict[str, float] = OrderedDict()  # 키 → 처음 받은 시각
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 백그라운드 저장과 종료 시 저장이 겹치지 않게
+        self._dirty = False
+        self._stop = threading.Event()
+        self.duplicates = 0
+        if path is not None:
+            self._load()
+            self._thread = threading.Thread(target=self._run, name="dedup-persist", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    @staticmethod
+    def keys_for(event: dict, body: dict | None = None) -> list[str]:
+        """이벤트를 식별하는 키 목록 (event_id, 채널+ts)"""
+        keys = []
+        event_id = (body or {}).get("event_id")
+        if event_id:
+            keys.append(f"id:{event_id}")
+        if event.get("channel") and event.get("ts"):
+            keys.append(f"msg:{event['channel']}:{event['ts']}")
+        return keys
+
+    def _prune(self, now: float):
+        while self._seen:
+            key, first_seen = next(iter(self._seen.items()))
+            if now - first_seen <= self.ttl and len(self._seen) <= self.max_entries:
+                break
+            del self._seen[key]
+
+    def is_duplicate(self, keys: list[str]) -> bool:
+        """
+        키 중 하나라도 TTL 안에 이미 받은 적이 있으면 True (중복).
+        처음 받은 이벤트면 키를 모두 기록하고 False를 반환합니다.
+        """
+        if not keys:
+            return False
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if any(key in self._seen for key in keys):
+                self.duplicates += 1
+                return True
+            for key in keys:
+                self._seen[key] = now
+            self._prune(now)
+            self._dirty = True
+        return False
+
+    # ── 저장/로드 ─────────────────────────────────────
+    def _run(self):
+        while not self._stop.wait(self.persist_interval):
+            self.flush()
+
+    def flush(self):
+        """변경된 키가 있으면 파일에 저장합니다 (잠금은 복사하는 동안만 잡음)."""
+        if self.path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = dict(self._seen)
+                self._dirty = False
+            if not self._save(snapshot):
+                self._dirty = True  # 다음 간격에 다시 시도
+
+    def close(self):
+        """백그라운드 저장을 멈추고 남은 변경을 저장합니다."""
+        if self.path is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[중복 제거] 저장된 이벤트 로드 실패: {e} → 새로 시작")
+            return
+        now = time.time()
+        for key, first_seen in sorted(data.items(), key=lambda item: item[1]):
+            if now - first_seen <= self.ttl:
+                self._seen[key] = first_seen
+        self._prune(now)
+
+    def _save(self, seen: dict[str, float]) -> bool:
+        """임시 파일에 쓴 뒤 교체하여, 저장 도중 종료되어도 파일이 깨지지 않게 합니다."""
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(seen, f)
+            os.replace(tmp_path, self.path)
+            return True
+        except OSError as e:
+            logger.warning(f"[중복 제거] 이벤트 저장 실패: {e}")
+            return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
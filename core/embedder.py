@@ -0,0 +1,197 @@
+"""
+임베딩 스케줄러 (Embedding Scheduler)
+
+인덱스 빌드 시 청크를 배치 단위로 나누어 제한된 동시성으로 임베딩하고,
+완료된 배치부터 원래 순서대로 FAISS 인덱스에 바로 추가합니다.
+- 분당 토큰 예산(TPM) 안에서만 요청
+- 429(Rate Limit) / 5xx / 시간 초과·연결 오류만 지수 백오프 + 지터로 재시도 (잘못된 API 키, 잘못된 입력 등은 바로 실패)
+- 진행률 출력 (또는 콜백)
+"""
+
+import random
+import threading
+import time
+import logging
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from core.cache import CachedEmbeddings
+from core.models import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# ── 기본 설정 ─────────────────────────────────────────
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_RETRIES = 6
+BASE_BACKOFF = 1.0   # 첫 재시도 대기 (초)
+MAX_BACKOFF = 60.0   # 재시도 대기 상한 (초)
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """429(Rate Limit) 오류인지 판별합니다."""
+    return getattr(exc, "status_code", None) == 429 or "RateLimit" in type(exc).__name__
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """재시도하면 성공할 수 있는 일시적 오류(429, 5xx, 시간 초과, 연결 오류)인지 판별합니다."""
+    if is_rate_limit_error(exc):
+        return True
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name  # openai.APITimeoutError, httpx.ConnectError 등
+
+
+class TokenBucket:
+    """분당 토큰 예산을 관리하는 토큰 버킷 (스레드 안전)"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        """토큰이 충분히 쌓일 때까지 대기한 뒤 차감합니다."""
+        tokens = min(tokens, self.capacity)  # 한 배치가 예산 전체보다 크면 가득 찼을 때 통과
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingScheduler:
+    """
+    청크 임베딩을 배치/동시성/토큰 예산 단위로 스케줄링합니다.
+
+    CachedEmbeddings를 받으면 캐시에 있는 청크는 API 호출 없이 채우고,
+    캐시에 없는 청크만 원본 임베딩 모델로 요청한 뒤 캐시에 저장합니다.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_backoff: float = BASE_BACKOFF,
+        on_progress: Callable[[int, int], None] | None = None,
+    ):
+        self.embeddings = embeddings
+        base = embeddings.base if isinstance(embeddings, CachedEmbeddings) else embeddings
+        self.model_name = getattr(base, "model", None)  # 토큰 예산을 세는 토크나이저 기준
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.bucket = TokenBucket(tokens_per_minute)
+        self.on_progress = on_progress or self._print_progress
+        self.retries = 0
+        self._last_reported = -1
+
+    # ── 배치 임베딩 ───────────────────────────────────
+    def _call_with_retry(self, texts: list[str]) -> list[list[float]]:
+        base = self.embeddings.base if isinstance(self.embeddings, CachedEmbeddings) else self.embeddings
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(sum(count_tokens(t, self.model_name) for t in texts))
+            try:
+                return base.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    raise
+                backoff = min(MAX_BACKOFF, self.base_backoff * 2 ** attempt)
+                wait = backoff / 2 + random.uniform(0, backoff / 2)  # 지터: 동시 재시도 분산
+                kind = "Rate Limit" if is_rate_limit_error(e) else type(e).__name__
+                logger.warning(f"[임베딩] {kind} → {wait:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries})")
+                self.retries += 1
+                time.sleep(wait)
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not isinstance(self.embeddings, CachedEmbeddings):
+            return self._call_with_retry(texts)
+
+        vectors = self.embeddings.lookup(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            new_vectors = self._call_with_retry([texts[i] for i in missing])
+            self.embeddings.store([texts[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def embed(self, texts: list[str]) -> Iterator[tuple[int, list[list[float]]]]:
+        """
+        텍스트를 배치로 임베딩하여 (시작 위치, 벡터 목록)을 입력 순서대로 yield 합니다.
+        동시에 진행 중인 배치는 max_concurrency의 2배로 제한하여 메모리 사용을 억제합니다.
+        """
+        total = len(texts)
+        starts = iter(range(0, total, self.batch_size))
+        pending: dict[int, Future] = {}
+        done = 0
+        self._last_reported = -1
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            def submit_next() -> bool:
+                start = next(starts, None)
+                if start is None:
+                    return False
+                pending[start] = executor.submit(self._embed_batch, texts[start:start + self.batch_size])
+                return True
+
+            for _ in range(self.max_concurrency * 2):
+                if not submit_next():
+                    break
+
+            next_start = 0
+            while next_start in pending:
+                vectors = pending.pop(next_start).result()
+                submit_next()
+                done += len(vectors)
+                self.on_progress(done, total)
+                yield next_start, vectors
+                next_start += len(vectors)
+
+    # ── FAISS 인덱스에 추가 ───────────────────────────
+    def add_documents(
+        self, vectorstore: FAISS | None, documents: list[Document], ids: list[str]
+    ) -> FAISS:
+        """
+        문서를 임베딩하여 배치가 끝나는 대로 FAISS 인덱스에 추가합니다.
+        vectorstore가 None이면 첫 배치로 새 인덱스를 생성합니다.
+        """
+        texts = [d.page_content for d in documents]
+        for start, vectors in self.embed(texts):
+            end = start + len(vectors)
+            text_embeddings = list(zip(texts[start:end], vectors))
+            metadatas = [d.metadata for d in documents[start:end]]
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(
+                    text_embeddings, self.embeddings, metadatas=metadatas, ids=ids[start:end]
+                )
+            else:
+                vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids[start:end])
+        return vectorstore
+
+    def _print_progress(self, done: int, total: int):
+        """10% 단위로 진행률을 출력합니다."""
+        step = done * 10 // total
+        if step != self._last_reported:
+            self._last_reported = step
+            print(f"  🧮 임베딩 진행: {done:,}/{total:,} ({done / total:.0%})")
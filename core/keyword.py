@@ -0,0 +1,123 @@
+"""
+키워드 검색 인덱스 (BM25)
+
+벡터 검색이 놓치기 쉬운 숫자/고유명사 질문("17기 수료율", "2024 여름방학")을 위해
+청크를 한국어 친화적으로 토큰화(글자 2-gram + 숫자 + 숫자·단위)하여 BM25로 검색합니다.
+FAISS와 같은 벡터 ID를 사용하므로 매니페스트 기반 증분 업데이트에 그대로 맞춰집니다.
+"""
+
+import heapq
+import json
+import math
+import re
+import unicodedata
+import logging
+from collections import Counter
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.5
+B = 0.75
+
+_WORD_RE = re.compile(r"\d+(?:\.\d+)?|[a-z]+|[가-힣]+")
+_NUMBER_UNIT_RE = re.compile(r"(\d+(?:\.\d+)?)\s?([가-힣%])")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    텍스트를 BM25용 토큰 목록으로 변환합니다.
+    - 한글: 글자 2-gram (조사/어미가 붙어도 매칭되도록), 한 글자 단어는 그대로
+    - 숫자/영문: 단어 그대로
+    - 숫자+단위: "17기", "85%", "2024년" 처럼 붙여서 추가
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        if "가" <= word[0] <= "힣" and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    tokens.extend(number + unit for number, unit in _NUMBER_UNIT_RE.findall(text))
+    return tokens
+
+
+class KeywordIndex:
+    """벡터 ID → 토큰 빈도를 저장하는 BM25 인덱스"""
+
+    def __init__(self):
+        self.docs: dict[str, dict[str, int]] = {}       # id → {토큰: 빈도}
+        self.doc_len: dict[str, int] = {}
+        self.postings: dict[str, dict[str, int]] = {}   # 토큰 → {id: 빈도}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _add_tf(self, doc_id: str, tf: dict[str, int]):
+        self.docs[doc_id] = tf
+        length = sum(tf.values())
+        self.doc_len[doc_id] = length
+        self.total_len += length
+        for term, count in tf.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def add(self, ids: list[str], texts: list[str]):
+        for doc_id, text in zip(ids, texts):
+            if doc_id in self.docs:
+                self.delete([doc_id])
+            self._add_tf(doc_id, dict(Counter(tokenize(text))))
+
+    def delete(self, ids: list[str]):
+        for doc_id in ids:
+            tf = self.docs.pop(doc_id, None)
+            if tf is None:
+                continue
+            self.total_len -= self.doc_len.pop(doc_id)
+            for term in tf:
+                posting = self.postings[term]
+                del posting[doc_id]
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """BM25 점수 상위 k개의 (벡터 ID, 점수)를 반환합니다."""
+        n = len(self.docs)
+        if not n:
+            return []
+        avg_len = self.total_len / n
+
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + K1 * (1 - B + B * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / norm
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    # ── 저장/로드 ─────────────────────────────────────
+    def save(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"docs": self.docs}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "KeywordIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        for doc_id, tf in data["docs"].items():
+            index._add_tf(doc_id, tf)
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """여러 검색 결과(ID 순위 목록)를 RRF 점수(Σ 1/(k + 순위))로 합쳐 내림차순 반환합니다."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
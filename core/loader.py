@@ -0,0 +1,204 @@
+"""
+문서 로더 (Loader)
+
+data/ 폴더의 PDF/Word 문서에서 텍스트를 추출하고 청크로 분할합니다.
+문서가 여러 개이면 프로세스 풀로 병렬 처리하며, 결과(청크 내용과 순서)는 순차 처리와 동일합니다.
+추출한 페이지 텍스트는 파일 내용 해시별로 캐시(PageCache)하여, 청크 설정 변경 / 재빌드 시 문서를 다시 파싱하지 않습니다.
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyMuPDFLoader, Docx2txtLoader
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+PAGE_CACHE_VERSION = 1        # 추출 방식이 바뀌면 올려서 기존 캐시 무효화
+PAGE_CACHE_MAX_FILES = 1_000  # 보관할 문서 수 (초과 시 오래 사용하지 않은 것부터 삭제)
+
+# spawn / forkserver 워커는 실행 스크립트(app.py 등)를 다시 import 하며 RAG()까지 또 생성하므로 fork만 사용.
+# fork는 다른 스레드가 잡고 있던 잠금까지 복사해 교착될 수 있으므로 스레드가 1개일 때만 병렬 처리
+# (app.py는 요청 큐 / Slack 연결 스레드를 시작하기 전에 인덱스를 빌드함). 그 외에는 순차 처리
+_MP_CONTEXT = (
+    multiprocessing.get_context("fork")
+    if "fork" in multiprocessing.get_all_start_methods()
+    else None
+)
+
+
+def load_file(path: Path) -> list[Document]:
+    """문서 1개를 페이지(PDF) 또는 문서 전체(Word) 단위 Document 목록으로 로드합니다."""
+    if path.suffix == ".pdf":
+        return PyMuPDFLoader(str(path)).load()
+    return Docx2txtLoader(str(path)).load()
+
+
+# ── 페이지 추출 캐시 ──────────────────────────────────
+class PageCache:
+    """
+    파일 내용 해시 → 추출한 페이지 목록을 gzip JSON 파일로 저장하는 캐시
+
+    파일 이름 / 위치가 바뀌어도 내용이 같으면 재사용하며, 읽을 때 출처 경로는 현재 경로로 바꿉니다.
+    프로세스 풀의 각 워커가 직접 읽고 쓰므로 파일 단위로 원자적으로 기록합니다.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry(self, digest: str) -> Path:
+        return self.directory / f"{digest}.json.gz"
+
+    def get(self, path: Path, digest: str) -> list[Document] | None:
+        entry = self._entry(digest)
+        try:
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"[추출 캐시] 읽기 실패: {entry.name} ({e}) → 다시 추출")
+            return None
+        if data.get("version") != PAGE_CACHE_VERSION:
+            return None
+        os.utime(entry)  # 최근 사용 시각 갱신 (prune 기준)
+
+        docs = []
+        for page in data["pages"]:
+            metadata = {**page["metadata"], "source": str(path)}
+            if "file_path" in metadata:
+                metadata["file_path"] = str(path)
+            docs.append(Document(page_content=page["text"], metadata=metadata))
+        return docs
+
+    def put(self, digest: str, docs: list[Document]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(digest)
+        tmp = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        data = {
+            "version": PAGE_CACHE_VERSION,
+            "pages": [{"text": d.page_content, "metadata": d.metadata} for d in docs],
+        }
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, entry)
+        except (OSError, TypeError) as e:
+            tmp.unlink(missing_ok=True)
+            logger.warning(f"[추출 캐시] 저장 실패: {entry.name} ({e})")
+
+    def prune(self, max_files: int = PAGE_CACHE_MAX_FILES):
+        """오래 사용하지 않은 항목부터 지워 max_files개 이하로 유지합니다."""
+        entries = sorted(self.directory.glob("*.json.gz"), key=lambda p: p.stat().st_mtime)
+        for entry in entries[: max(0, len(entries) - max_files)]:
+            entry.unlink(missing_ok=True)
+        if len(entries) > max_files:
+            logger.info(f"[추출 캐시] {len(entries) - max_files}개 항목 제거 (최대 {max_files}개)")
+
+
+def load_file_cached(path: Path, page_cache: PageCache | None) -> tuple[list[Document], bool]:
+    """캐시에 있으면 캐시에서, 없으면 문서를 파싱해 캐시에 저장한 뒤 (페이지 목록, 캐시 적중 여부)를 반환합니다."""
+    if page_cache is None:
+        return load_file(path), False
+    digest = page_cache.file_hash(path)
+    docs = page_cache.get(path, digest)
+    if docs is not None:
+        return docs, True
+    docs = load_file(path)
+    page_cache.put(digest, docs)
+    return docs, False
+
+
+def split_documents(docs: list[Document], chunk_size: int, chunk_overlap: int) -> list[Document]:
+    """Document 목록을 청크로 분할하고, 각 청크 앞에 출처 문서명을 삽입합니다."""
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS,
+    )
+    chunks = splitter.split_documents(docs)
+
+    # 각 청크의 텍스트 앞에 출처 문서명을 삽입 (검색 품질 향상)
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "")
+        source_name = Path(source).name if source else "알 수 없음"
+        chunk.page_content = f"[출처: {source_name}]\n{chunk.page_content}"
+    return chunks
+
+
+def load_and_split(
+    path: Path, chunk_size: int, chunk_overlap: int, page_cache: PageCache | None = None
+) -> tuple[list[Document], int, int, bool]:
+    """문서 1개를 로드 → 청크 분할하고 (청크 목록, 페이지 수, 총 글자 수, 추출 캐시 적중 여부)를 반환합니다."""
+    docs, cached = load_file_cached(path, page_cache)
+    total_chars = sum(len(d.page_content) for d in docs)
+    return split_documents(docs, chunk_size, chunk_overlap), len(docs), total_chars, cached
+
+
+def load_files(
+    paths: list[Path],
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: int = 1,
+    page_cache_dir: Path | None = None,
+) -> list[list[Document]]:
+    """
+    여러 문서를 로드 → 청크 분할하여 파일별 청크 목록을 입력 순서대로 반환합니다.
+
+    Args:
+        paths: 문서 경로 목록
+        chunk_size: 청크 크기 (자)
+        chunk_overlap: 청크 겹침 (자)
+        workers: 프로세스 수 (1 이하이거나 문서가 1개, 또는 fork를 안전하게 쓸 수 없으면 순차 처리)
+        page_cache_dir: 페이지 추출 캐시 폴더 (None이면 캐시 없이 매번 파싱)
+    """
+    page_cache = PageCache(page_cache_dir) if page_cache_dir is not None else None
+    task = partial(load_and_split, chunk_size=chunk_size, chunk_overlap=chunk_overlap, page_cache=page_cache)
+    workers = min(workers, len(paths))
+    if workers > 1 and (_MP_CONTEXT is None or threading.active_count() > 1):
+        logger.info(f"[로더] fork를 안전하게 쓸 수 없어 순차 처리 (실행 중인 스레드 {threading.active_count()}개)")
+        workers = 1
+
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as executor:
+                results = list(executor.map(task, paths))
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"[로더] 병렬 처리 실패: {e} → 순차 처리로 전환")
+            results = [task(path) for path in paths]
+    else:
+        results = [task(path) for path in paths]
+
+    per_file = []
+    hits = 0
+    for path, (chunks, pages, total_chars, cached) in zip(paths, results):
+        label = " — 추출 캐시" if cached else ""
+        if path.suffix == ".pdf":
+            print(f"  📄 [PDF] 로드 완료: {path.name} ({total_chars:,}자, {pages}페이지{label})")
+        else:
+            print(f"  📝 [Word] 로드 완료: {path.name} ({total_chars:,}자{label})")
+        hits += cached
+        per_file.append(chunks)
+
+    if page_cache is not None and paths:
+        print(f"  ♻️ 추출 캐시 적중 {hits}개 / 신규 추출 {len(paths) - hits}개")
+        page_cache.prune()
+    return per_file
@@ -3,17 +3,36 @@
 
 슬랙 스레드의 이전 메시지를 수집하고,
 대화 맥락을 반영하여 질문을 독립적으로 재작성(Query Rewriting)합니다.
+이미 받은 이벤트와 게시한 답변으로 스레드 대화를 메모리에 보관하여(ThreadHistoryStore),
+스레드 안의 질문마다 Slack API(conversations.replies)를 호출하지 않도록 합니다.
+긴 스레드는 최근 몇 턴만 원문으로 두고 이전 대화는 요약으로 압축합니다(SummaryMemory).
 """
 
+import hashlib
 import re
+import threading
+import time
 import logging
+from collections import OrderedDict
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from core.models import count_tokens
+
 logger = logging.getLogger(__name__)
 
 MAX_TURNS = 10
+THREAD_CACHE_MAX_THREADS = 1000    # 메모리에 보관할 최대 스레드 수 (LRU)
+THREAD_CACHE_TTL = 6 * 3600        # 마지막 활동 후 스레드 보관 시간 (초)
+THREAD_CACHE_MAX_MESSAGES = 100    # 스레드당 보관할 최대 메시지 수
+# "window": 최근 MAX_TURNS개 원문 | "summary": 최근 턴 원문 + 이전 대화 요약
+# summary는 요약이 갱신될 때 답변 경로에서 LLM을 1회 더 호출하므로(비용 / 지연 증가) 명시적으로 켤 때만 사용
+HISTORY_MODE = "window"
+SUMMARY_SOURCE_TURNS = 50          # summary 모드에서 가져올 최대 메시지 수
+RECENT_TURNS = 4                   # summary 모드에서 원문 그대로 두는 최근 메시지 수
+SUMMARY_BATCH_TURNS = 4            # 요약에 반영되지 않은 메시지가 이만큼 쌓이면 요약을 이어서 갱신
+HISTORY_TOKEN_BUDGET = 1500        # 프롬프트에 넣는 히스토리 블록의 최대 토큰 수
 
 # ── Query Rewriting 프롬프트 ──────────────────────────
 REWRITE_PROMPT = ChatPromptTemplate.from_messages([
@@ -30,6 +49,65 @@ REWRITE_PROMPT = ChatPromptTemplate.from_messages([
      "## 독립적으로 재작성된 질문"),
 ])
 
+# ── 대화 요약 프롬프트 ────────────────────────────────
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", (
+        "You maintain a running summary of a Slack conversation between a user and a document QA bot.\n"
+        "Update the existing summary with the new messages. Write it in Korean, as concise bullet points.\n"
+        "Keep facts, numbers, names and the topics/documents the user asked about, "
+        "because later follow-up questions may refer to them.\n"
+        "Output ONLY the updated summary."
+    )),
+    ("human",
+     "## 기존 요약\n{summary}\n\n"
+     "## 새 메시지\n{messages}\n\n"
+     "## 갱신된 요약"),
+])
+
+
+def _ts_key(ts: str) -> tuple[int, int]:
+    """Slack ts("1700000000.000100")를 정렬 가능한 값으로 변환합니다."""
+    seconds, _, micros = ts.partition(".")
+    return int(seconds), int(micros or 0)
+
+
+def _to_history_message(msg: dict) -> dict | None:
+    """Slack 메시지를 {"role", "content"} 형태로 변환합니다. 내용이 없으면 None."""
+    text = msg.get("text", "").strip()
+    if not text:
+        return None
+
+    # 봇 메시지인지 판별
+    if msg.get("bot_id") or msg.get("subtype") == "bot_message":
+        return {"role": "assistant", "content": text}
+
+    # 멘션 태그 제거
+    clean_text = re.sub(r"<@[A-Z0-9]+>", "", text).strip()
+    if clean_text:
+        return {"role": "user", "content": clean_text}
+    return None
+
+
+def _fetch_thread_messages(client, channel: str, thread_ts: str, max_turns: int) -> list[dict] | None:
+    """Slack API로 스레드 메시지를 가져옵니다 ({"ts", "role", "content"} 목록, 실패 시 None)."""
+    try:
+        result = client.conversations_replies(
+            channel=channel,
+            ts=thread_ts,
+            limit=max_turns * 2 + 1,  # user+bot 쌍 + 여유
+        )
+        messages = result.get("messages", [])
+    except Exception as e:
+        logger.warning(f"[메모리] 스레드 히스토리 수집 실패: {e}")
+        return None
+
+    fetched = []
+    for msg in messages:
+        converted = _to_history_message(msg)
+        if converted is not None:
+            fetched.append({"ts": msg.get("ts", ""), **converted})
+    return fetched
+
 
 def get_thread_history(client, channel: str, thread_ts: str, max_turns: int = MAX_TURNS) -> list[dict]:
     """
@@ -45,32 +123,11 @@ def get_thread_history(client, channel: str, thread_ts: str, max_turns: int = MA
     Returns:
         대화 히스토리 리스트 (최근 max_turns개 메시지)
     """
-    try:
-        result = client.conversations_replies(
-            channel=channel,
-            ts=thread_ts,
-            limit=max_turns * 2 + 1,  # user+bot 쌍 + 여유
-        )
-        messages = result.get("messages", [])
-    except Exception as e:
-        logger.warning(f"[메모리] 스레드 히스토리 수집 실패: {e}")
+    fetched = _fetch_thread_messages(client, channel, thread_ts, max_turns)
+    if fetched is None:
         return []
 
-    history = []
-    for msg in messages:
-        # 현재 메시지(가장 마지막)는 제외하고 이전 메시지만 수집
-        text = msg.get("text", "").strip()
-        if not text:
-            continue
-
-        # 봇 메시지인지 판별
-        if msg.get("bot_id") or msg.get("subtype") == "bot_message":
-            history.append({"role": "assistant", "content": text})
-        else:
-            # 멘션 태그 제거
-            clean_text = re.sub(r"<@[A-Z0-9]+>", "", text).strip()
-            if clean_text:
-                history.append({"role": "user", "content": clean_text})
+    history = [{"role": m["role"], "content": m["content"]} for m in fetched]
 
     # 마지막 메시지(현재 질문)는 제외
     if history:
@@ -84,6 +141,143 @@ def get_thread_history(client, channel: str, thread_ts: str, max_turns: int = MA
     return history
 
 
+class ThreadHistoryStore:
+    """
+    스레드별 대화를 메모리에 보관하는 LRU + TTL 저장소 (스레드 안전)
+
+    - 받은 이벤트(record_event)와 게시한 답변(record)으로 대화를 채움
+    - 새 스레드를 시작한 메시지를 받았거나 API로 한 번 가져온 스레드만 보관
+    - 현재 질문 메시지가 기록되어 있지 않거나(누락 이벤트) 보관 중이 아니면 API로 다시 가져옴
+    - 현재 질문이 message 이벤트로도 도착하지 않았으면(message.channels 등 미구독) 멘션 없는 답글을
+      받지 못하므로 보관 중인 대화를 믿지 않고 API로 가져옴
+
+    Args:
+        max_threads: 보관할 최대 스레드 수 (초과 시 가장 오래 쓰이지 않은 스레드 삭제)
+        ttl: 마지막 활동 후 스레드 보관 시간 (초)
+        max_messages: 스레드당 보관할 최대 메시지 수
+    """
+
+    def __init__(
+        self,
+        max_threads: int = THREAD_CACHE_MAX_THREADS,
+        ttl: float = THREAD_CACHE_TTL,
+        max_messages: int = THREAD_CACHE_MAX_MESSAGES,
+    ):
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._threads: OrderedDict[tuple[str, str], dict] = OrderedDict()  # (채널, thread_ts) → 대화
+        # message 이벤트로 받은 (채널, ts) — 답글 이벤트를 구독 중인지 메시지 단위로 확인 (멘션 이벤트보다 먼저 와도 유지)
+        self._message_events: OrderedDict[tuple[str, str], None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key: tuple[str, str], now: float) -> dict | None:
+        entry = self._threads.get(key)
+        if entry is None:
+            return None
+        if now - entry["updated"] > self.ttl:
+            del self._threads[key]
+            return None
+        self._threads.move_to_end(key)
+        return entry
+
+    def _put(self, key: tuple[str, str], messages: dict[str, dict], now: float):
+        self._threads[key] = {"messages": messages, "updated": now}
+        self._threads.move_to_end(key)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    def _add(self, entry: dict, ts: str, message: dict, now: float):
+        messages = entry["messages"]
+        messages[ts] = message
+        if len(messages) > self.max_messages:
+            for old_ts in sorted(messages, key=_ts_key)[:len(messages) - self.max_messages]:
+                del messages[old_ts]
+        entry["updated"] = now
+
+    def record(self, channel: str, thread_ts: str, ts: str, role: str, content: str, create: bool = False):
+        """
+        메시지를 스레드 대화에 기록합니다.
+        보관 중이 아닌 스레드는 create=True이고 스레드를 시작한 메시지(ts == thread_ts)일 때만 새로 만듭니다.
+        """
+        if not content:
+            return
+        key = (channel, thread_ts)
+        now = time.time()
+        with self._lock:
+            entry = self._entry(key, now)
+            if entry is None:
+                if not (create and ts == thread_ts):
+                    return  # 이전 메시지를 모르는 스레드 → 다음 조회 때 API로 가져옴
+                self._put(key, {}, now)
+                entry = self._threads[key]
+            self._add(entry, ts, {"role": role, "content": content}, now)
+
+    def record_event(self, event: dict, create: bool = False, message_event: bool = False):
+        """
+        Slack 메시지/멘션 이벤트를 기록합니다.
+        message_event=True: message 이벤트로 받음 (멘션 없는 답글도 받고 있다는 뜻, get()에서 캐시 신뢰 조건)
+        """
+        if message_event and event.get("ts"):
+            with self._lock:
+                self._message_events[(event.get("channel", ""), event["ts"])] = None
+                while len(self._message_events) > self.max_threads * 10:
+                    self._message_events.popitem(last=False)
+        converted = _to_history_message(event)
+        if converted is None or not event.get("ts"):
+            return
+        thread_ts = event.get("thread_ts") or event["ts"]
+        self.record(event.get("channel", ""), thread_ts, event["ts"], converted["role"], converted["content"], create)
+
+    def get(self, client, channel: str, thread_ts: str, current_ts: str, max_turns: int = MAX_TURNS) -> tuple[list[dict], str]:
+        """
+        현재 메시지(current_ts) 이전의 대화 히스토리와 조회 결과("hit" | "miss")를 반환합니다.
+        보관 중이지 않거나 현재 메시지가 기록되지 않은 스레드, 답글 이벤트를 받고 있는지 확인되지 않은
+        (현재 메시지가 message 이벤트로 오지 않은) 경우에는 Slack API로 가져와 저장합니다.
+        """
+        key = (channel, thread_ts)
+        now = time.time()
+        with self._lock:
+            entry = self._entry(key, now)
+            trusted = (
+                entry is not None
+                and current_ts in entry["messages"]
+                and (channel, current_ts) in self._message_events
+            )
+            messages = dict(entry["messages"]) if trusted else None
+
+        status = "hit"
+        if messages is None:
+            status = "miss"
+            fetched = _fetch_thread_messages(client, channel, thread_ts, max_turns)
+            messages = {m["ts"]: {"role": m["role"], "content": m["content"]} for m in fetched or []}
+            if fetched is not None:  # 수집 실패 시에는 불완전한 대화를 저장하지 않음
+                with self._lock:
+                    # 가져오는 동안 기록된 메시지(다른 이벤트, 게시한 답변)도 유지
+                    current = self._entry(key, time.time())
+                    if current is not None:
+                        messages = {**messages, **current["messages"]}
+                    self._put(key, dict(messages), time.time())
+
+        with self._lock:
+            if status == "hit":
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        current_key = _ts_key(current_ts)
+        history = [
+            messages[ts] for ts in sorted(messages, key=_ts_key) if _ts_key(ts) < current_key
+        ][-max_turns:]
+        logger.info(f"[메모리] 스레드 히스토리 {len(history)}턴 ({'캐시' if status == 'hit' else 'API'})")
+        return history, status
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+
 def format_history(history: list[dict]) -> str:
     """대화 히스토리를 텍스트 형식으로 변환합니다."""
     if not history:
@@ -91,11 +285,138 @@ def format_history(history: list[dict]) -> str:
 
     lines = []
     for msg in history:
-        role = "사용자" if msg["role"] == "user" else "봇"
+        role = {"user": "사용자", "summary": "이전 대화 요약"}.get(msg["role"], "봇")
         lines.append(f"{role}: {msg['content']}")
     return "\n".join(lines)
 
 
+def _fingerprint(msg: dict) -> str:
+    return hashlib.sha1(f"{msg['role']}\0{msg['content']}".encode("utf-8")).hexdigest()
+
+
+def _history_tokens(history: list[dict], model_name: str | None = None) -> int:
+    return count_tokens(format_history(history), model_name) if history else 0
+
+
+def _truncate(text: str, max_tokens: int, model_name: str | None = None) -> str:
+    """텍스트를 대략 max_tokens 토큰 이내로 자릅니다 (앞부분 유지)."""
+    tokens = count_tokens(text, model_name)
+    if tokens <= max_tokens:
+        return text
+    return text[:max(0, len(text) * max_tokens // tokens - 1)] + "…"
+
+
+class SummaryMemory:
+    """
+    스레드별 누적 요약 메모리
+
+    최근 RECENT_TURNS개 메시지는 원문 그대로 두고, 그 이전 대화는 요약 1개로 압축합니다.
+    요약은 스레드별로 보관하여 새 메시지만 이어서 반영하며(전체 재요약 없음),
+    아직 요약되지 않은 메시지가 SUMMARY_BATCH_TURNS개 쌓였을 때만 LLM을 호출합니다.
+    결과 히스토리는 토큰 예산(HISTORY_TOKEN_BUDGET) 안으로 맞춥니다.
+
+    Args:
+        recent_turns: 원문 그대로 두는 최근 메시지 수
+        batch_turns: 요약 갱신 단위 (메시지 수)
+        token_budget: 히스토리 블록의 최대 토큰 수
+        max_threads: 요약을 보관할 최대 스레드 수 (LRU)
+    """
+
+    def __init__(
+        self,
+        recent_turns: int = RECENT_TURNS,
+        batch_turns: int = SUMMARY_BATCH_TURNS,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        max_threads: int = THREAD_CACHE_MAX_THREADS,
+    ):
+        self.recent_turns = recent_turns
+        self.batch_turns = batch_turns
+        self.token_budget = token_budget
+        self.max_threads = max_threads
+        # 스레드 키 → {"summary", "last": 요약에 반영된 마지막 메시지 지문, "prev": 그 직전 메시지 지문}
+        self._summaries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unsummarized(older: list[dict], state: dict | None) -> list[dict] | None:
+        """요약에 아직 반영되지 않은 메시지를 반환합니다. 이어 붙일 위치를 찾지 못하면 None."""
+        if state is None:
+            return None
+        fingerprints = [_fingerprint(m) for m in older]
+        for i in range(len(fingerprints) - 1, -1, -1):
+            if fingerprints[i] != state["last"]:
+                continue
+            if i == 0 or state["prev"] is None or fingerprints[i - 1] == state["prev"]:
+                return older[i + 1:]
+        return None
+
+    def _extend(self, summary: str, messages: list[dict], llm) -> str:
+        chain = SUMMARY_PROMPT | llm | StrOutputParser()
+        return chain.invoke({
+            "summary": summary or "(없음)",
+            "messages": format_history(messages),
+        }).strip()
+
+    def compact(self, key: str, history: list[dict], llm, model_name: str | None = None) -> tuple[list[dict], str]:
+        """
+        히스토리를 [요약] + 최근 원문 메시지로 압축하여 (히스토리, 요약 상태)를 반환합니다.
+        요약 상태: "none"(요약 없음) | "reused"(기존 요약 사용) | "extended"(새 메시지 반영) | "failed"
+        model_name: 히스토리를 받을 답변 모델 (토큰 예산 계산 기준, None이면 요약 llm의 모델)
+        """
+        split = max(0, len(history) - self.recent_turns)
+        older, recent = history[:split], history[split:]
+
+        with self._lock:
+            state = self._summaries.get(key)
+            if state is not None:
+                self._summaries.move_to_end(key)
+                state = dict(state)
+
+        status = "none"
+        summary = ""
+        pending = older
+        if older:
+            unsummarized = self._unsummarized(older, state)
+            if unsummarized is not None:
+                summary, pending, status = state["summary"], unsummarized, "reused"
+            else:
+                state = None  # 이어 붙일 수 없으면(히스토리가 잘림 등) 처음부터 요약
+
+            if len(pending) >= self.batch_turns:
+                try:
+                    summary = self._extend(summary, pending, llm)
+                    pending, status = [], "extended"
+                    with self._lock:
+                        self._summaries[key] = {
+                            "summary": summary,
+                            "last": _fingerprint(older[-1]),
+                            "prev": _fingerprint(older[-2]) if len(older) > 1 else None,
+                        }
+                        self._summaries.move_to_end(key)
+                        while len(self._summaries) > self.max_threads:
+                            self._summaries.popitem(last=False)
+                except Exception as e:
+                    logger.warning(f"[메모리] 대화 요약 실패: {e} → 원문 사용")
+                    status = "failed"
+
+        compacted = ([{"role": "summary", "content": summary}] if summary else []) + pending + recent
+        return self._fit_budget(compacted, model_name or getattr(llm, "model_name", None)), status
+
+    def _fit_budget(self, history: list[dict], model_name: str | None = None) -> list[dict]:
+        """토큰 예산을 넘으면 오래된 원문 메시지부터 빼고, 그래도 넘으면 요약/메시지를 자릅니다."""
+        history = list(history)
+        while _history_tokens(history, model_name) > self.token_budget:
+            messages = [i for i, m in enumerate(history) if m["role"] != "summary"]
+            if len(messages) > 1:
+                del history[messages[0]]
+                continue
+            # 남은 항목(요약 + 마지막 메시지)을 예산에 맞게 균등하게 자름
+            share = max(1, self.token_budget // len(history) - 10)
+            history = [{**m, "content": _truncate(m["content"], share, model_name)} for m in history]
+            break
+        return history
+
+
 def rewrite_query(question: str, history: list[dict], llm) -> str:
     """
     대화 히스토리를 참고하여 현재 질문을 독립적인 질문으로 재작성합니다.
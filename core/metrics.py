@@ -0,0 +1,246 @@
+"""
+메트릭 (Metrics)
+
+카운터 / 게이지 / 히스토그램을 라벨별로 집계하고 Prometheus 텍스트 형식으로 내보냅니다.
+METRICS_PORT 환경 변수를 설정하면 로컬 HTTP 서버(/metrics)로 대시보드에서 직접 수집할 수 있습니다.
+- RAG: 경로/모델별 요청 수, 단계별 소요 시간, 캐시 적중, 토큰 사용량 (observe_trace)
+- Slack: API 메서드별 호출 시간과 결과, 요청 큐 대기 수 (app.py)
+"""
+
+import bisect
+import threading
+import logging
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# 지연 시간 히스토그램 구간 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    """단조 증가하는 값 (요청 수, 토큰 수 등)"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """현재 값 (큐 대기 수 등). set_function으로 수집 시점에 값을 읽을 수도 있습니다."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def render(self) -> list[str]:
+        if self._function is not None:
+            try:
+                self.set(self._function())
+            except Exception as e:
+                logger.warning(f"[메트릭] {self.name} 값 계산 실패: {e}")
+        return super().render()
+
+
+class Histogram(_Metric):
+    """값의 분포 (소요 시간 등), 구간별 누적 개수 + 합계 + 개수"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_samples(self, items) -> list[str]:
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(state['sum'], 6))}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """메트릭을 이름으로 등록하고 Prometheus 텍스트 형식으로 내보냅니다."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ── RAG 파이프라인 메트릭 ─────────────────────────────
+RAG_REQUESTS = REGISTRY.counter(
+    "rag_requests_total", "Answered questions", ("route", "route_tier", "model", "source")
+)
+RAG_STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_seconds", "Pipeline stage latency (trace timing keys)", ("stage", "route", "model")
+)
+RAG_CACHE_EVENTS = REGISTRY.counter(
+    "rag_cache_events_total", "Cache lookups by cache and result", ("cache", "result")
+)
+RAG_TOKENS = REGISTRY.counter("rag_tokens_total", "LLM tokens used", ("model", "kind"))
+RAG_COALESCED = REGISTRY.counter(
+    "rag_coalesced_requests_total", "Questions served by an identical in-flight request", ("route",)
+)
+
+# ── Slack / 요청 큐 메트릭 ────────────────────────────
+SLACK_API_SECONDS = REGISTRY.histogram(
+    "slack_api_seconds", "Slack Web API call latency", ("method", "status")
+)
+QUEUE_DEPTH = REGISTRY.gauge("request_queue_depth", "Questions waiting in the request queue")
+QUEUE_ACTIVE = REGISTRY.gauge("request_queue_active", "Questions being processed by workers")
+QUEUE_REJECTED = REGISTRY.counter("request_queue_rejected_total", "Questions rejected by the request queue", ("reason",))
+
+
+def observe_trace(trace: dict):
+    """완료된 trace 1건을 메트릭에 반영합니다."""
+    route = trace.get("route") or "none"
+    model = trace.get("model") or "none"
+    RAG_REQUESTS.inc(
+        route=route, route_tier=trace.get("route_tier") or "none", model=model, source=trace.get("source") or "unknown"
+    )
+    if trace.get("coalesced"):
+        RAG_COALESCED.inc(route=route)
+
+    for stage, seconds in (trace.get("timing") or {}).items():
+        if isinstance(seconds, (int, float)):
+            RAG_STAGE_SECONDS.observe(seconds, stage=stage, route=route, model=model)
+
+    for cache, value in (trace.get("cache") or {}).items():
+        if isinstance(value, dict):
+            result = value.get("result") or ("hit" if value.get("hit") else "miss")
+        else:
+            result = str(value)
+        RAG_CACHE_EVENTS.inc(cache=cache, result=result)
+
+    usage = trace.get("token_usage") or {}
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            RAG_TOKENS.inc(usage[kind], model=model, kind=kind.removesuffix("_tokens"))
+
+
+# ── HTTP 서버 (/metrics) ──────────────────────────────
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 수집 요청마다 로그를 남기지 않음
+
+
+def start_http_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """백그라운드 스레드에서 /metrics를 제공하는 HTTP 서버를 시작합니다."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"[메트릭] http://{host}:{server.server_address[1]}/metrics")
+    return server
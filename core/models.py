@@ -8,8 +8,12 @@ LangChain의 BaseChatModel 인터페이스를 활용하여,
 """
 
 import os
+import threading
 import logging
+from collections.abc import Callable
+from functools import lru_cache
 
+import httpx
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 logger = logging.getLogger(__name__)
@@ -17,56 +21,133 @@ logger = logging.getLogger(__name__)
 # ── 기본 설정 ─────────────────────────────────────────
 DEFAULT_MODEL = "gpt-4o-mini"
 DEFAULT_TEMPERATURE = 0.2
+HTTP_MAX_CONNECTIONS = 50            # 모든 모델이 공유하는 HTTP 연결 풀 크기
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_TIMEOUT = 60.0                  # 요청 타임아웃 (초)
+
+
+# ── 공유 HTTP 클라이언트 ──────────────────────────────
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """모든 모델/임베딩 클라이언트가 공유하는 HTTP 연결 풀 (연결·TLS 재사용)"""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        timeout=HTTP_TIMEOUT,
+    )
+
+
+def _openai_chat(model: str) -> Callable:
+    # stream_usage: 스트리밍 응답에서도 토큰 사용량을 받기 위함
+    return lambda: ChatOpenAI(
+        model=model,
+        temperature=DEFAULT_TEMPERATURE,
+        stream_usage=True,
+        http_client=get_http_client(),
+    )
+
+
+# pip install langchain-google-genai
+# def _gemini_chat(model: str) -> Callable:
+#     from langchain_google_genai import ChatGoogleGenerativeAI
+#     return lambda: ChatGoogleGenerativeAI(model=model, temperature=DEFAULT_TEMPERATURE)
+
+# pip install langchain-anthropic
+# def _claude_chat(model: str) -> Callable:
+#     from langchain_anthropic import ChatAnthropic
+#     return lambda: ChatAnthropic(model=model, temperature=DEFAULT_TEMPERATURE)
+
+
+# ── 모델 레지스트리 (이름 → (필요한 API Key 또는 None, 생성 함수)) ─
+MODEL_REGISTRY: dict[str, tuple[str | None, Callable]] = {
+    # ── OpenAI ──
+    "gpt-4o-mini": ("OPENAI_API_KEY", _openai_chat("gpt-4o-mini")),
+    "gpt-4o": ("OPENAI_API_KEY", _openai_chat("gpt-4o")),
 
+    # ── Google Gemini (확장 시 주석 해제, 위 _gemini_chat 포함) ──
+    # "gemini-2.0-flash": ("GOOGLE_API_KEY", _gemini_chat("gemini-2.0-flash")),
 
-def get_available_models() -> dict:
-    """
-    사용 가능한 LLM 모델 딕셔너리를 반환합니다.
-    .env에 API Key가 존재하는 제공자의 모델만 등록합니다.
-    """
-    models = {}
-
-    # ── OpenAI ──
-    if os.getenv("OPENAI_API_KEY"):
-        models["gpt-4o-mini"] = ChatOpenAI(model="gpt-4o-mini", temperature=DEFAULT_TEMPERATURE)
-        models["gpt-4o"] = ChatOpenAI(model="gpt-4o", temperature=DEFAULT_TEMPERATURE)
+    # ── Anthropic Claude (확장 시 주석 해제, 위 _claude_chat 포함) ──
+    # "claude-sonnet": ("ANTHROPIC_API_KEY", _claude_chat("claude-sonnet-4-20250514")),
+}
 
-    # ── Google Gemini (확장 시 주석 해제) ──
-    # pip install langchain-google-genai
-    # if os.getenv("GOOGLE_API_KEY"):
-    #     from langchain_google_genai import ChatGoogleGenerativeAI
-    #     models["gemini-2.0-flash"] = ChatGoogleGenerativeAI(
-    #         model="gemini-2.0-flash", temperature=DEFAULT_TEMPERATURE
-    #     )
+_instances: dict[str, object] = {}  # 이름 → 생성된 모델 (모델당 1회만 생성)
+_instances_lock = threading.Lock()
 
-    # ── Anthropic Claude (확장 시 주석 해제) ──
-    # pip install langchain-anthropic
-    # if os.getenv("ANTHROPIC_API_KEY"):
-    #     from langchain_anthropic import ChatAnthropic
-    #     models["claude-sonnet"] = ChatAnthropic(
-    #         model="claude-sonnet-4-20250514", temperature=DEFAULT_TEMPERATURE
-    #     )
 
-    return models
+def list_models() -> list[str]:
+    """
+    사용 가능한 모델 이름 목록을 반환합니다.
+    .env에 API Key가 존재하는 제공자의 모델(API Key가 필요 없는 모델은 항상)만 포함하며, 모델 객체는 생성하지 않습니다.
+    """
+    return [name for name, (env_key, _) in MODEL_REGISTRY.items() if env_key is None or os.getenv(env_key)]
 
 
 def get_llm(model_name: str | None = None):
-    """모델 이름으로 LLM 인스턴스를 반환합니다."""
-    models = get_available_models()
+    """모델 이름으로 LLM 인스턴스를 반환합니다. 처음 요청될 때 1회만 생성하고 이후에는 재사용합니다."""
     name = model_name or DEFAULT_MODEL
 
-    if name not in models:
-        available = ", ".join(models.keys())
-        raise ValueError(f"'{name}' 모델을 찾을 수 없습니다. 사용 가능: {available}")
+    llm = _instances.get(name)
+    if llm is not None:
+        return llm
 
-    return models[name]
+    available = list_models()
+    if name not in available:
+        raise ValueError(f"'{name}' 모델을 찾을 수 없습니다. 사용 가능: {', '.join(available)}")
 
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = MODEL_REGISTRY[name][1]()
+            logger.info(f"[모델] {name} 클라이언트 생성")
+        return _instances[name]
 
-def list_models() -> list[str]:
-    """사용 가능한 모델 이름 목록을 반환합니다."""
-    return list(get_available_models().keys())
+
+def get_available_models() -> dict:
+    """사용 가능한 LLM 모델 딕셔너리를 반환합니다 (이름 → 재사용되는 모델 인스턴스)."""
+    return {name: get_llm(name) for name in list_models()}
 
 
 def get_embeddings():
     """임베딩 모델 인스턴스를 반환합니다."""
-    return OpenAIEmbeddings(model="text-embedding-3-small")
+    return OpenAIEmbeddings(model="text-embedding-3-small", http_client=get_http_client())
+
+
+# ── 토큰 수 계산 ──────────────────────────────────────
+# 모델별 인코딩은 tiktoken이 정함 (gpt-4o 계열 o200k_base, text-embedding-3 계열 cl100k_base)
+DEFAULT_TOKENIZER_ENCODING = "cl100k_base"  # 모델 이름을 모르거나 tiktoken에 없는 모델(Gemini, Claude 등)
+
+
+@lru_cache(maxsize=64)
+def encoding_name_for(model_name: str | None) -> str:
+    """모델이 사용하는 tiktoken 인코딩 이름 (알 수 없으면 DEFAULT_TOKENIZER_ENCODING)"""
+    if not model_name:
+        return DEFAULT_TOKENIZER_ENCODING
+    try:
+        from tiktoken.model import encoding_name_for_model
+        return encoding_name_for_model(model_name)
+    except Exception:
+        return DEFAULT_TOKENIZER_ENCODING
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(name: str):
+    """tiktoken 인코딩을 인코딩별로 1회만 로드합니다. 실패하면(미설치/오프라인) None."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"[토크나이저] tiktoken 로드 실패 ({name}): {e} → 바이트 수 기반 근사치 사용")
+        return None
+
+
+def count_tokens(text: str, model_name: str | None = None) -> int:
+    """
+    model_name 모델 기준 텍스트의 토큰 수를 반환합니다 (tiktoken 사용 불가 시 UTF-8 바이트 수 / 3 근사).
+    model_name이 None이면 DEFAULT_TOKENIZER_ENCODING 기준입니다.
+    """
+    encoding = _get_encoding(encoding_name_for(model_name))
+    if encoding is None:
+        return max(1, len(text.encode("utf-8")) // 3)
+    return len(encoding.encode(text, disallowed_special=()))
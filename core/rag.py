@@ -4,23 +4,38 @@ RAG (Retrieval-Augmented Generation) 엔진 — LangChain 기반
 질문 라우팅 → 하이브리드 검색 → LLM 답변 생성 파이프라인을 통합 관리합니다.
 """
 
+import os
+import copy
 import json
+import hashlib
 import shutil
 import time
+import uuid
+import threading
 import logging
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyMuPDFLoader, Docx2txtLoader
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
 from core.models import get_llm, get_embeddings, DEFAULT_MODEL
-from core.router import classify, get_meta_response
+from core.cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache, AnswerCache, normalize_query
+from core.loader import load_files
+from core.context import pack_context
+from core.embedder import EmbeddingScheduler
+from core.keyword import KeywordIndex, reciprocal_rank_fusion
+from core.tracing import TraceWriter
+from core.metrics import observe_trace
+from core.router import (
+    classify, classify_by_rules, route_question, rewrite_and_route, get_meta_response, CentroidRouter,
+)
 from core.memory import rewrite_query, format_history
 
 load_dotenv()
@@ -32,9 +47,39 @@ BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "data"
 INDEX_DIR = BASE_DIR / "index"
 LOG_DIR = BASE_DIR / "logs"
+CACHE_DIR = BASE_DIR / "cache"  # rebuild() 시에도 유지되는 캐시 (임베딩 등)
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
 TOP_K = 10
+CONTEXT_TOKEN_BUDGET = 3_000  # 참고 문서 블록 최대 토큰 수 (None이면 제한 없음, 관련도 낮은 블록부터 제외)
+HYBRID_CANDIDATES = 30  # 하이브리드 검색 시 벡터/키워드 검색 각각의 후보 수
+RRF_K = 60              # Reciprocal Rank Fusion 상수
+EMBEDDING_CACHE_MAX_ENTRIES = 50_000
+QUERY_CACHE_SIZE = 1024            # 메모리에 보관할 검색 질의 임베딩 수
+QUERY_CACHE_TTL = 7 * 24 * 3600    # 질의 임베딩 유효 시간 (초, None이면 무제한)
+QUERY_CACHE_PERSIST = True         # 질의 임베딩을 디스크 캐시에도 저장 (재시작 후 재사용)
+ANSWER_CACHE_ENABLED = True        # 히스토리 없는 문서 질문의 답변 재사용
+ANSWER_CACHE_THRESHOLD = 0.95      # 이전 질문과의 코사인 유사도가 이 값 이상이면 캐시된 답변 사용
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 24 * 3600       # 캐시된 답변 유효 시간 (초, None이면 무제한)
+LOCAL_ROUTER_ENABLED = True        # 규칙/임베딩 중심점으로 확실한 질문은 LLM 분류 생략
+# 중심점 단계 임계값(CENTROID_MIN_*)은 배포 임베딩 모델로 측정하기 전까지 쓰지 않음 (규칙 → LLM)
+# 측정: python test/eval_test.py --routing test/routing_golden.jsonl → 추천값 반영 후 True
+CENTROID_ROUTER_ENABLED = False
+SPECULATIVE_RETRIEVAL = True       # 라우팅과 동시에 검색을 미리 시작 (document가 아니면 결과 폐기)
+SPECULATIVE_WORKERS = 4
+COMBINED_REWRITE_ROUTE = True      # 멀티턴: 질문 재작성 + 라우팅을 LLM 1회 호출로 처리
+COALESCE_REQUESTS = True           # 처리 중인 동일 질문(질문+히스토리+모델)은 결과를 공유 (singleflight)
+BUILD_WORKERS = min(8, os.cpu_count() or 1)  # 문서 추출/청킹 프로세스 수 (1이면 순차 처리)
+EMBED_BATCH_SIZE = 64             # 임베딩 API 1회 요청당 청크 수
+EMBED_CONCURRENCY = 4             # 동시에 진행할 임베딩 요청 수
+EMBED_TOKENS_PER_MINUTE = 1_000_000  # 임베딩 분당 토큰 예산 (계정 TPM 한도에 맞춰 조정)
+EMBED_MAX_RETRIES = 6
+TRACE_QUEUE_SIZE = 10_000          # 기록 대기 가능한 trace 수 (넘으면 버리고 dropped 집계)
+TRACE_BATCH_SIZE = 100
+TRACE_FLUSH_INTERVAL = 1.0         # trace 기록 주기 (초)
+TRACE_MAX_BYTES = 50 * 1024 * 1024 # traces.jsonl 교체 크기 (날짜가 바뀌어도 교체, 이전 파일은 gzip)
+TRACE_BACKUP_COUNT = 30            # 보관할 압축 trace 파일 수
 
 # ── 시스템 프롬프트 (범용 어시스턴트) ─────────────────
 SYSTEM_PROMPT_RAG = (
@@ -61,16 +106,40 @@ PROMPT_TEMPLATE_GENERAL = ChatPromptTemplate.from_messages([
 
 
 # ── JSONL 트레이스 로거 ───────────────────────────────
-def _save_trace_to_jsonl(trace: dict):
-    """trace dict를 logs/traces.jsonl에 한 줄씩 추가 저장합니다."""
-    LOG_DIR.mkdir(exist_ok=True)
+_trace_writer: TraceWriter | None = None
+_trace_writer_lock = threading.Lock()
+
+
+def get_trace_writer() -> TraceWriter:
+    """logs/traces.jsonl 기록기를 반환합니다 (처음 호출 시 생성)."""
+    global _trace_writer
     filepath = LOG_DIR / "traces.jsonl"
+    with _trace_writer_lock:
+        if _trace_writer is None or _trace_writer.path != filepath:
+            if _trace_writer is not None:
+                _trace_writer.close()
+            _trace_writer = TraceWriter(
+                filepath,
+                queue_size=TRACE_QUEUE_SIZE,
+                batch_size=TRACE_BATCH_SIZE,
+                flush_interval=TRACE_FLUSH_INTERVAL,
+                max_bytes=TRACE_MAX_BYTES,
+                backup_count=TRACE_BACKUP_COUNT,
+            )
+        return _trace_writer
+
+
+def _save_trace_to_jsonl(trace: dict):
+    """trace dict를 메트릭에 반영하고 logs/traces.jsonl 기록 큐에 넣습니다 (백그라운드에서 배치 기록)."""
+    observe_trace(trace)
 
     record = {
         "timestamp": datetime.now().isoformat(),
         "question": trace.get("question", ""),
         "rewritten_query": trace.get("rewritten_query", ""),
         "route": trace.get("route", ""),
+        "route_tier": trace.get("route_tier", ""),
+        "speculative_retrieval": trace.get("speculative_retrieval", ""),
         "answer": trace.get("answer", ""),
         "source": trace.get("source", "unknown"),
         "chat_history_turns": len(trace.get("chat_history", [])),
@@ -79,195 +148,621 @@ def _save_trace_to_jsonl(trace: dict):
                 "source": c["source"],
                 "page": c["page"],
                 "score": c["score"],
+                "rrf_score": c.get("rrf_score"),
                 "text_preview": c["text"][:200],
             }
             for c in trace.get("retrieved_chunks", [])
         ],
+        "context_packing": trace.get("context_packing", {}),
         "timing": trace.get("timing", {}),
         "token_usage": trace.get("token_usage", {}),
         "model": trace.get("model", ""),
         "embedding_model": trace.get("embedding_model", ""),
+        "cache": trace.get("cache", {}),
+        "queue": trace.get("queue", {}),
+        "coalesced": trace.get("coalesced", False),
     }
 
-    with open(filepath, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    get_trace_writer().write(record)
+
+
+def chunk_records(results: list[tuple[Document, float | None, float]]) -> list[dict]:
+    """
+    검색 결과 (Document, 벡터 거리, RRF 점수) 목록을 trace의 retrieved_chunks 형식으로 변환합니다.
+
+    score는 기존 trace와 같은 FAISS 거리(낮을수록 유사, 키워드 검색에서만 나온 청크는 None),
+    rrf_score는 순위를 정한 RRF 점수(높을수록 관련도 높음)입니다.
+    """
+    records = []
+    for doc, distance, rrf_score in results:
+        source_file = doc.metadata.get("source", "알 수 없음")
+        source_name = Path(source_file).name if source_file else "알 수 없음"
+        records.append({
+            "source": source_name,
+            "page": doc.metadata.get("page", "?"),
+            "score": round(float(distance), 4) if distance is not None else None,
+            "rrf_score": round(float(rrf_score), 4),
+            "text": doc.page_content,
+        })
+    return records
+
+
+def _merge_extra(trace: dict, extra: dict | None):
+    """extra 값을 trace에 기록합니다 (dict 값은 기존 항목에 병합)."""
+    for key, value in (extra or {}).items():
+        if isinstance(value, dict) and isinstance(trace.get(key), dict):
+            trace[key].update(value)
+        else:
+            trace[key] = value
+
+
+# ── 동일 질문 병합 (Singleflight) ─────────────────────
+class _Listener:
+    """스트리밍 토큰 수신자 1명과 지금까지 전달한 토큰 수 (수신자별 순서 보장용)"""
+
+    def __init__(self, callback: Callable[[str], None]):
+        self.callback = callback
+        self.delivered = 0
+        self.lock = threading.Lock()
+
+
+class _InFlight:
+    """
+    처리 중인 질문 1건. 뒤따라 온 동일 질문(follower)은 결과와 스트리밍 토큰을 공유받습니다.
+    토큰 전달(콜백 호출)은 공유 잠금 밖에서 하므로, 느린 수신자가 토큰 기록이나 다른 수신자 등록을 막지 않습니다.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.trace: dict | None = None
+        self.error: Exception | None = None
+        self.followers = 0
+        self._tokens: list[str] = []
+        self._listeners: list[_Listener] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, on_token: Callable[[str], None]):
+        """지금까지 생성된 토큰을 먼저 전달한 뒤 이후 토큰을 받도록 등록합니다."""
+        listener = _Listener(on_token)
+        with self._lock:
+            self._listeners.append(listener)
+        self._catch_up(listener)
+
+    def emit(self, token: str):
+        with self._lock:
+            self._tokens.append(token)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            self._catch_up(listener)
+
+    def _catch_up(self, listener: _Listener):
+        """수신자가 아직 받지 않은 토큰을 순서대로 전달합니다 (수신자별 잠금만 사용)."""
+        with listener.lock:
+            with self._lock:
+                pending = self._tokens[listener.delivered:]
+                listener.delivered = len(self._tokens)
+            if not pending:
+                return
+            # 한 요청의 전송 실패가 같은 질문을 기다리는 다른 요청에 영향을 주지 않도록 함
+            try:
+                listener.callback("".join(pending))
+            except Exception as e:
+                logger.warning(f"[요청 병합] 토큰 전달 실패: {e}")
 
 
 class RAG:
-    """PDF 기반 RAG 시스템 (라우팅 + 하이브리드 검색)"""
-
-    def __init__(self, model_name: str | None = None):
+    """
+    PDF 기반 RAG 시스템 (라우팅 + 하이브리드 검색)
+
+    Args:
+        model_name: 기본 LLM 모델 이름 (None이면 DEFAULT_MODEL)
+        data_dir / index_dir / cache_dir: 문서 / 인덱스 / 캐시 폴더 (None이면 DATA_DIR / INDEX_DIR / CACHE_DIR)
+        embeddings: 임베딩 모델 (None이면 get_embeddings(), 벤치마크 등에서 가짜 모델 주입)
+        chunk_size / chunk_overlap: 청크 분할 설정 (None이면 CHUNK_SIZE / CHUNK_OVERLAP, 바뀌면 인덱스 재빌드)
+    """
+
+    def __init__(
+        self,
+        model_name: str | None = None,
+        data_dir: Path | None = None,
+        index_dir: Path | None = None,
+        cache_dir: Path | None = None,
+        embeddings=None,
+        chunk_size: int | None = None,
+        chunk_overlap: int | None = None,
+    ):
         self.llm = get_llm(model_name)
-        self.embeddings = get_embeddings()
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.chunk_overlap = CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.data_dir = Path(data_dir) if data_dir else DATA_DIR
+        self.index_dir = Path(index_dir) if index_dir else INDEX_DIR
+        cache_dir = Path(cache_dir) if cache_dir else CACHE_DIR
+        self.manifest_file = self.index_dir / "manifest.json"
+        self.keyword_file = self.index_dir / "keyword.json"
+        self.settings_file = self.index_dir / "settings.json"
+        self.page_cache_dir = cache_dir / "pages"  # 문서별 추출 페이지 (청크 설정 변경 / 재빌드 시 재사용)
+        # 청크 임베딩은 디스크 캐시를 거쳐 이미 임베딩한 텍스트는 API를 호출하지 않음
+        self.embeddings = CachedEmbeddings(
+            embeddings if embeddings is not None else get_embeddings(),
+            EmbeddingCache(cache_dir / "embeddings.sqlite3", max_entries=EMBEDDING_CACHE_MAX_ENTRIES),
+        )
+        # 검색 질의 임베딩 LRU (반복 질문은 임베딩 API 왕복 생략)
+        self.query_cache = QueryEmbeddingCache(
+            self.embeddings,
+            max_size=QUERY_CACHE_SIZE,
+            ttl=QUERY_CACHE_TTL,
+            disk=self.embeddings.cache if QUERY_CACHE_PERSIST else None,
+        )
+        # 시맨틱 답변 캐시 (인덱스/모델이 바뀌면 자동 무효화)
+        self.answer_cache = AnswerCache(
+            threshold=ANSWER_CACHE_THRESHOLD, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL
+        )
+        # 로컬 라우터: 예시 질문 임베딩 중심점 (예시 임베딩은 디스크 캐시되어 최초 1회만 API 호출)
+        self.centroid_router: CentroidRouter | None = None
+        if LOCAL_ROUTER_ENABLED and CENTROID_ROUTER_ENABLED:
+            try:
+                self.centroid_router = CentroidRouter(self.embeddings)
+            except Exception as e:
+                logger.warning(f"[라우터] 중심점 분류기 초기화 실패: {e} → 규칙 + LLM 분류만 사용")
+        # 추측 검색(speculative retrieval)용 스레드 풀
+        self._executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="rag-speculative")
+        # 처리 중인 질문 (병합 키 → _InFlight)
+        self._flights: dict[str, _InFlight] = {}
+        self._flights_lock = threading.Lock()
         self.vectorstore: FAISS | None = None
+        self.keyword_index = KeywordIndex()
 
-        # 캐시가 유효한지 확인 → 유효하면 로드, 아니면 빌드
+        # 캐시가 유효한지 확인 → 유효하면 로드 후 변경된 문서만 반영, 아니면 전체 빌드
         if self._cache_is_valid():
             self._load_cache()
+            self._update()
         else:
             self._build()
 
+    # ── 문서 로드 ─────────────────────────────────────
+    def _list_data_files(self) -> list[Path]:
+        """data/ 폴더의 인덱싱 대상 파일 목록 (PDF → Word 순, 이름순)"""
+        return sorted(self.data_dir.glob("*.pdf")) + sorted(self.data_dir.glob("*.docx"))
+
+    def _load_files(self, paths: list[Path]) -> tuple[list[Document], dict[str, list[str]]]:
+        """여러 문서를 로드하고, 청크 목록과 파일별 벡터 ID 목록을 함께 반환합니다."""
+        chunks = []
+        ids_by_file = {}
+        per_file = load_files(
+            paths, self.chunk_size, self.chunk_overlap, workers=BUILD_WORKERS, page_cache_dir=self.page_cache_dir
+        )
+        for path, file_chunks in zip(paths, per_file):
+            ids_by_file[path.name] = [str(uuid.uuid4()) for _ in file_chunks]
+            chunks.extend(file_chunks)
+        return chunks, ids_by_file
+
     # ── 인덱스 빌드 ───────────────────────────────────
     def _build(self):
         """PDF 로드 → 청크 분할 → 임베딩 → FAISS 인덱스 생성"""
         print("🔨 인덱스를 새로 빌드합니다...")
 
-        documents = []
-        
-        # 1. PDF 파일 로드
-        for pdf_path in sorted(DATA_DIR.glob("*.pdf")):
-            loader = PyMuPDFLoader(str(pdf_path))
-            docs = loader.load()
-            documents.extend(docs)
-            total_chars = sum(len(d.page_content) for d in docs)
-            print(f"  📄 [PDF] 로드 완료: {pdf_path.name} ({total_chars:,}자, {len(docs)}페이지)")
-
-        # 2. Word (.docx) 파일 로드
-        for docx_path in sorted(DATA_DIR.glob("*.docx")):
-            loader = Docx2txtLoader(str(docx_path))
-            docs = loader.load()
-            documents.extend(docs)
-            total_chars = sum(len(d.page_content) for d in docs)
-            print(f"  📝 [Word] 로드 완료: {docx_path.name} ({total_chars:,}자)")
-
-        if not documents:
-            raise FileNotFoundError(f"data/ 폴더에 PDF 또는 Word 파일이 없습니다: {DATA_DIR}")
-
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            separators=["\n\n", "\n", ". ", " ", ""],
-        )
-        chunks = splitter.split_documents(documents)
+        data_files = self._list_data_files()
+        if not data_files:
+            raise FileNotFoundError(f"data/ 폴더에 PDF 또는 Word 파일이 없습니다: {self.data_dir}")
+
+        chunks, ids_by_file = self._load_files(data_files)
         print(f"  🔪 총 {len(chunks)}개 청크 생성")
 
-        # 각 청크의 텍스트 앞에 출처 문서명을 삽입 (검색 품질 향상)
-        for chunk in chunks:
-            source = chunk.metadata.get("source", "")
-            source_name = Path(source).name if source else "알 수 없음"
-            chunk.page_content = f"[출처: {source_name}]\n{chunk.page_content}"
+        if not chunks:
+            raise ValueError(f"data/ 폴더의 문서에서 텍스트를 추출할 수 없습니다: {self.data_dir}")
 
-        self.vectorstore = FAISS.from_documents(chunks, self.embeddings)
+        ids = [vid for file_ids in ids_by_file.values() for vid in file_ids]
+        self.vectorstore = None
+        self.keyword_index = KeywordIndex()
+        self._embed_into_index(chunks, ids)
         print(f"  ✅ FAISS 인덱스 생성 완료 (벡터 {self.vectorstore.index.ntotal}개)")
-        self._save_cache()
 
-    # ── 캐시 관리 ─────────────────────────────────────
-    MANIFEST_FILE = INDEX_DIR / "manifest.json"
+        current = self._get_current_file_manifest()
+        manifest = {
+            name: {**current[name], "ids": ids_by_file[name]}
+            for name in current
+        }
+        self._save_cache(manifest)
+
+    def _update(self):
+        """저장된 매니페스트와 data/ 폴더를 비교해 바뀐 문서의 벡터만 추가/삭제/교체합니다."""
+        saved_manifest = self._read_manifest()
+        current_manifest = self._get_current_file_manifest()
+        added, removed, modified = self._diff_manifest(saved_manifest, current_manifest)
+        if not (added or removed or modified):
+            return
+
+        if not current_manifest:
+            raise FileNotFoundError(f"data/ 폴더에 PDF 또는 Word 파일이 없습니다: {self.data_dir}")
+
+        print(
+            f"🔄 인덱스를 증분 업데이트합니다... "
+            f"(추가 {len(added)}개, 삭제 {len(removed)}개, 변경 {len(modified)}개)"
+        )
+
+        # 1. 삭제/변경된 문서의 기존 벡터 제거
+        stale_ids = [vid for name in removed + modified for vid in saved_manifest[name]["ids"]]
+        if stale_ids:
+            self.vectorstore.delete(stale_ids)
+            self.keyword_index.delete(stale_ids)
+            print(f"  🗑️ 기존 벡터 {len(stale_ids)}개 삭제")
+
+        # 2. 추가/변경된 문서만 다시 로드 → 임베딩 → 추가
+        changed = [self.data_dir / name for name in current_manifest if name in added or name in modified]
+        chunks, ids_by_file = self._load_files(changed)
+        if chunks:
+            ids = [vid for file_ids in ids_by_file.values() for vid in file_ids]
+            self._embed_into_index(chunks, ids)
+            print(f"  ➕ 새 벡터 {len(chunks)}개 추가")
+
+        # 3. 매니페스트 갱신 (변경 없는 문서는 기존 벡터 ID 유지)
+        manifest = {}
+        for name, stat in current_manifest.items():
+            file_ids = ids_by_file[name] if name in ids_by_file else saved_manifest[name]["ids"]
+            manifest[name] = {**stat, "ids": file_ids}
+
+        print(f"  ✅ 증분 업데이트 완료 (벡터 {self.vectorstore.index.ntotal}개)")
+        self._save_cache(manifest)
+
+    def _embed_into_index(self, chunks: list[Document], ids: list[str]):
+        """청크를 배치 단위로 임베딩하여 완료되는 대로 FAISS 인덱스에 추가합니다."""
+        self.embeddings.hits = 0
+        self.embeddings.misses = 0
+        scheduler = EmbeddingScheduler(
+            self.embeddings,
+            batch_size=EMBED_BATCH_SIZE,
+            max_concurrency=EMBED_CONCURRENCY,
+            tokens_per_minute=EMBED_TOKENS_PER_MINUTE,
+            max_retries=EMBED_MAX_RETRIES,
+        )
+        self.vectorstore = scheduler.add_documents(self.vectorstore, chunks, ids)
+        self.keyword_index.add(ids, [c.page_content for c in chunks])
+        print(
+            f"  ♻️ 임베딩 캐시 적중 {self.embeddings.hits}개 / "
+            f"신규 임베딩 {self.embeddings.misses}개 (재시도 {scheduler.retries}회)"
+        )
 
+    # ── 캐시 관리 ─────────────────────────────────────
     def _get_current_file_manifest(self) -> dict:
         """data/ 폴더의 현재 파일 목록과 크기를 딕셔너리로 반환합니다."""
-        data_files = sorted(DATA_DIR.glob("*.pdf")) + sorted(DATA_DIR.glob("*.docx"))
         return {
             f.name: {"size": f.stat().st_size, "mtime": f.stat().st_mtime}
-            for f in data_files
+            for f in self._list_data_files()
         }
 
+    def _read_manifest(self) -> dict:
+        with open(self.manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _diff_manifest(saved_manifest: dict, current_manifest: dict) -> tuple[list, list, list]:
+        """저장된 매니페스트 대비 (추가, 삭제, 변경)된 파일 이름 목록을 반환합니다."""
+        saved_names = set(saved_manifest.keys())
+        current_names = set(current_manifest.keys())
+
+        # 파일 추가 감지
+        added = sorted(current_names - saved_names)
+        if added:
+            print(f"📢 새 문서 추가됨: {', '.join(added)}")
+
+        # 파일 삭제 감지
+        removed = sorted(saved_names - current_names)
+        if removed:
+            print(f"📢 문서 삭제됨: {', '.join(removed)}")
+
+        # 파일 수정 감지 (크기 또는 수정시간 변경)
+        modified = []
+        for name in sorted(current_names & saved_names):
+            if current_manifest[name]["size"] != saved_manifest[name]["size"]:
+                print(f"📢 문서 변경됨: {name}")
+                modified.append(name)
+            elif current_manifest[name]["mtime"] > saved_manifest[name]["mtime"]:
+                print(f"📢 문서 수정됨: {name}")
+                modified.append(name)
+
+        return added, removed, modified
+
     def _cache_is_valid(self) -> bool:
-        index_faiss = INDEX_DIR / "index.faiss"
-        index_pkl = INDEX_DIR / "index.pkl"
+        """인덱스 파일과 (문서별 벡터 ID가 기록된) 매니페스트가 모두 있는지 확인합니다."""
+        index_faiss = self.index_dir / "index.faiss"
+        index_pkl = self.index_dir / "index.pkl"
         if not index_faiss.exists() or not index_pkl.exists():
             return False
 
-        current_manifest = self._get_current_file_manifest()
-
         # 문서가 하나도 없으면 캐시 무효
-        if not current_manifest:
+        if not self._list_data_files():
             return False
 
         # 매니페스트 파일이 없으면 (구버전 캐시) 재빌드
-        if not self.MANIFEST_FILE.exists():
+        if not self.manifest_file.exists():
             print("📢 매니페스트가 없습니다. 인덱스를 재빌드합니다.")
             return False
 
-        # 저장된 매니페스트와 현재 파일 목록 비교
-        with open(self.MANIFEST_FILE, "r", encoding="utf-8") as f:
-            saved_manifest = json.load(f)
-
-        saved_names = set(saved_manifest.keys())
-        current_names = set(current_manifest.keys())
-
-        # 파일 추가 감지
-        added = current_names - saved_names
-        if added:
-            print(f"📢 새 문서 추가됨: {', '.join(added)} → 인덱스를 재빌드합니다.")
+        # 문서별 벡터 ID가 없는 매니페스트 (구버전) → 증분 업데이트 불가, 재빌드
+        saved_manifest = self._read_manifest()
+        if any("ids" not in entry for entry in saved_manifest.values()):
+            print("📢 구버전 매니페스트입니다. 인덱스를 재빌드합니다.")
             return False
 
-        # 파일 삭제 감지
-        removed = saved_names - current_names
-        if removed:
-            print(f"📢 문서 삭제됨: {', '.join(removed)} → 인덱스를 재빌드합니다.")
+        # 청크 분할 설정이 바뀌면 기존 청크를 쓸 수 없으므로 재빌드 (같은 청크는 임베딩 캐시 재사용)
+        if self._read_settings() != self._index_settings():
+            print(f"📢 청크 설정이 바뀌었습니다 {self._index_settings()}. 인덱스를 재빌드합니다.")
             return False
 
-        # 파일 수정 감지 (크기 또는 수정시간 변경)
-        for name in current_names:
-            if current_manifest[name]["size"] != saved_manifest[name]["size"]:
-                print(f"📢 문서 변경됨: {name} → 인덱스를 재빌드합니다.")
-                return False
-            if current_manifest[name]["mtime"] > saved_manifest[name]["mtime"]:
-                print(f"📢 문서 수정됨: {name} → 인덱스를 재빌드합니다.")
-                return False
-
         return True
 
-    def _save_cache(self):
-        INDEX_DIR.mkdir(exist_ok=True)
-        self.vectorstore.save_local(str(INDEX_DIR))
+    def _index_settings(self) -> dict:
+        return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+
+    def _read_settings(self) -> dict | None:
+        if not self.settings_file.exists():
+            return None
+        with open(self.settings_file, "r", encoding="utf-8") as f:
+            return json.load(f)
 
-        # 매니페스트 저장 (현재 파일 목록 기록)
-        manifest = self._get_current_file_manifest()
-        with open(self.MANIFEST_FILE, "w", encoding="utf-8") as f:
+    def _save_cache(self, manifest: dict):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.vectorstore.save_local(str(self.index_dir))
+        self.keyword_index.save(self.keyword_file)
+
+        # 매니페스트 저장 (파일별 크기/수정시간 + 벡터 ID 기록)
+        with open(self.manifest_file, "w", encoding="utf-8") as f:
             json.dump(manifest, f, ensure_ascii=False, indent=2)
+        with open(self.settings_file, "w", encoding="utf-8") as f:
+            json.dump(self._index_settings(), f)
 
-        print(f"  💾 캐시 저장 완료: {INDEX_DIR} (문서 {len(manifest)}개 기록)")
+        self._update_index_version(manifest)
+        print(f"  💾 캐시 저장 완료: {self.index_dir} (문서 {len(manifest)}개 기록)")
 
     def _load_cache(self):
         print("📂 캐시된 인덱스를 로드합니다...")
         self.vectorstore = FAISS.load_local(
-            str(INDEX_DIR), self.embeddings, allow_dangerous_deserialization=True
+            str(self.index_dir), self.embeddings, allow_dangerous_deserialization=True
         )
-        print(f"  ✅ 로드 완료 (벡터 {self.vectorstore.index.ntotal}개)")
+        if self.keyword_file.exists():
+            self.keyword_index = KeywordIndex.load(self.keyword_file)
+        else:
+            # 키워드 인덱스 도입 전 캐시 → 임베딩 없이 docstore의 청크 텍스트로 생성
+            print("📢 키워드 인덱스가 없습니다. 저장된 청크로 생성합니다.")
+            ids = list(self.vectorstore.index_to_docstore_id.values())
+            texts = [self.vectorstore.docstore.search(vid).page_content for vid in ids]
+            self.keyword_index.add(ids, texts)
+            self.keyword_index.save(self.keyword_file)
+        self._update_index_version(self._read_manifest())
+        print(f"  ✅ 로드 완료 (벡터 {self.vectorstore.index.ntotal}개, 키워드 인덱스 {len(self.keyword_index)}개)")
+
+    def _update_index_version(self, manifest: dict):
+        """매니페스트 내용으로 인덱스 버전을 계산하여 답변 캐시에 반영합니다 (바뀌면 캐시 무효화)."""
+        digest = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+        self.answer_cache.set_index_version(digest[:16])
 
     def rebuild(self):
-        if INDEX_DIR.exists():
-            shutil.rmtree(INDEX_DIR)
+        if self.index_dir.exists():
+            shutil.rmtree(self.index_dir)
         self._build()
 
+    # ── 하이브리드 검색 ───────────────────────────────
+    def _embed_query(self, query: str, trace: dict | None = None) -> list[float]:
+        """질의 임베딩을 LRU 캐시에서 찾고, 없으면 API로 생성합니다. trace에 캐시 결과를 기록합니다."""
+        t0 = time.time()
+        vector, result = self.query_cache.embed(query)
+        if trace is not None:
+            trace["timing"]["1_query_embedding"] = round(time.time() - t0, 3)
+            trace.setdefault("cache", {})["query_embedding"] = {
+                "result": result,
+                **self.query_cache.stats(),
+            }
+        return vector
+
+    def _retrieve(
+        self,
+        query: str,
+        k: int = TOP_K,
+        timing: dict | None = None,
+        query_vector: list[float] | None = None,
+    ) -> list[tuple[Document, float | None, float]]:
+        """
+        벡터 검색(FAISS)과 키워드 검색(BM25) 결과를 RRF로 합쳐 상위 k개를 (Document, 벡터 거리, RRF 점수)로 반환합니다.
+        벡터 후보에 없이 키워드 검색에서만 나온 청크의 거리는 None입니다.
+        timing이 주어지면 단계별 소요 시간을 기록합니다.
+        """
+        timing = timing if timing is not None else {}
+        if query_vector is None:
+            query_vector = self._embed_query(query)
+
+        t0 = time.time()
+        dense = self.vectorstore.similarity_search_with_score_by_vector(query_vector, k=HYBRID_CANDIDATES)
+        t1 = time.time()
+        keyword = self.keyword_index.search(query, k=HYBRID_CANDIDATES)
+        t2 = time.time()
+
+        docs = {doc.id: doc for doc, _ in dense}
+        distances = {doc.id: distance for doc, distance in dense}
+        fused = reciprocal_rank_fusion(
+            [[doc.id for doc, _ in dense], [vid for vid, _ in keyword]], k=RRF_K
+        )[:k]
+        results = []
+        for vid, rrf_score in fused:
+            doc = docs.get(vid) or self.vectorstore.docstore.search(vid)
+            results.append((doc, distances.get(vid), rrf_score))
+        t3 = time.time()
+
+        timing["1_retrieval_dense"] = round(t1 - t0, 3)
+        timing["1_retrieval_keyword"] = round(t2 - t1, 3)
+        timing["1_retrieval_fusion"] = round(t3 - t2, 3)
+        return results
+
     # ── 검색 (디버깅용) ───────────────────────────────
     def search(self, question: str, top_k: int = TOP_K) -> list[tuple]:
-        return self.vectorstore.similarity_search_with_score(question, k=top_k)
+        return self._retrieve(question, k=top_k)
 
     # ── 모델 교체 ─────────────────────────────────────
     def set_model(self, model_name: str):
-        """런타임에 LLM 모델을 교체합니다."""
+        """기본 LLM 모델을 교체합니다 (요청별 모델은 ask_with_trace의 model_name 사용)."""
         self.llm = get_llm(model_name)
         logger.info(f"[모델 교체] → {model_name}")
 
-    # ── 핵심: 라우팅 + 답변 생성 ──────────────────────
-    def ask_with_trace(self, question: str, source: str = "unknown", chat_history: list[dict] | None = None) -> dict:
+    # ── LLM 답변 생성 (일반 / 스트리밍) ───────────────
+    @staticmethod
+    def _extract_token_usage(message) -> dict:
+        """응답 메시지에서 토큰 사용량을 꺼냅니다 (invoke: response_metadata, stream: usage_metadata)."""
+        usage = getattr(message, "response_metadata", {}).get("token_usage") or {}
+        if usage:
+            return {
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            }
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage:
+            return {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            }
+        return {}
+
+    def _generate(self, llm, prompt_messages: list, trace: dict, t_start: float, on_token: Callable[[str], None] | None):
+        """
+        LLM으로 답변을 생성하여 trace에 answer / timing / token_usage를 기록합니다.
+        on_token이 주어지면 스트리밍으로 생성하며 토큰 조각이 도착할 때마다 호출합니다.
+        """
+        t0 = time.time()
+        if on_token is None:
+            response = llm.invoke(prompt_messages)
+        else:
+            response = None
+            for chunk in llm.stream(prompt_messages):
+                response = chunk if response is None else response + chunk
+                if chunk.content:
+                    if "2_first_token" not in trace["timing"]:
+                        # 사용자가 체감하는 지연: 요청 시작 → 첫 토큰 도착
+                        trace["timing"]["2_first_token"] = round(time.time() - t_start, 3)
+                    on_token(chunk.content)
+        t1 = time.time()
+
+        trace["answer"] = response.content if response is not None else ""
+        trace["timing"]["2_llm_generation"] = round(t1 - t0, 3)
+        trace["timing"]["total"] = round(t1 - t_start, 3)
+        usage = self._extract_token_usage(response) if response is not None else {}
+        if usage:
+            trace["token_usage"] = usage
+
+    # ── 핵심: 동일 질문 병합 + 라우팅 + 답변 생성 ─────
+    def ask_with_trace(
+        self,
+        question: str,
+        source: str = "unknown",
+        chat_history: list[dict] | None = None,
+        on_token: Callable[[str], None] | None = None,
+        extra: dict | None = None,
+        model_name: str | None = None,
+    ) -> dict:
         """
         질문을 라우팅 → 경로별 처리 → trace 반환
 
+        같은 질문(정규화된 질문 + 히스토리 + 모델)이 이미 처리 중이면 파이프라인을 다시 실행하지 않고
+        그 결과를 공유받으며, 이때 trace["coalesced"]가 True로 기록됩니다.
+
         Args:
             question: 사용자 질문
             source: 요청 출처 ("slack", "dm", "test")
             chat_history: 이전 대화 히스토리 [{"role": "user"|"assistant", "content": "..."}]
+            on_token: 답변을 스트리밍으로 받을 콜백 (LLM 생성 중 토큰 조각마다 호출, None이면 한 번에 생성)
+            extra: trace에 함께 기록할 값 (예: 요청 큐 대기 정보, dict 값은 기존 항목에 병합)
+            model_name: 이 요청에 사용할 모델 (None이면 기본 모델, 다른 요청의 모델에 영향 없음)
         """
         chat_history = chat_history or []
+        llm = get_llm(model_name) if model_name else self.llm
+        if not COALESCE_REQUESTS or not question.strip():
+            return self._ask_pipeline(question, source, chat_history, on_token, extra, llm)
+
+        key = self._flight_key(question, chat_history, llm)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = _InFlight()
+            else:
+                flight.followers += 1
+
+        if is_leader:
+            if on_token is not None:
+                flight.subscribe(on_token)
+            try:
+                trace = self._ask_pipeline(
+                    question, source, chat_history, flight.emit if on_token is not None else None, extra, llm
+                )
+                flight.trace = copy.deepcopy(trace)
+                return trace
+            except Exception as e:
+                flight.error = e
+                raise
+            finally:
+                with self._flights_lock:
+                    del self._flights[key]
+                flight.done.set()
+                if flight.followers:
+                    logger.info(f"[요청 병합] Q: {question[:50]}... | 동일 질문 {flight.followers}건에 결과 공유")
+
+        # follower: 먼저 시작된 동일 질문의 결과를 기다림
+        t_start = time.time()
+        if on_token is not None:
+            flight.subscribe(on_token)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+
+        trace = copy.deepcopy(flight.trace)
+        trace["question"] = question
+        trace["source"] = source
+        trace["coalesced"] = True
+        # LLM 호출 / 캐시 조회 / 단계별 처리는 leader가 한 것이므로 토큰·비용·단계 시간이 중복 집계되지 않도록 제외
+        trace["token_usage"] = {}
+        trace["timing"] = {}
+        trace["cache"] = {}
+        _merge_extra(trace, extra)
+        trace["timing"]["total"] = round(time.time() - t_start, 3)
+        logger.info(f"[요청 병합] Q: {question[:50]}... | 처리 중인 동일 질문의 결과 사용 ({trace['timing']['total']}s 대기)")
+        _save_trace_to_jsonl(trace)
+        return trace
+
+    @staticmethod
+    def _flight_key(question: str, chat_history: list[dict], llm) -> str:
+        """요청 병합 키: 정규화된 질문 + 히스토리 해시 + 모델"""
+        history_hash = hashlib.sha256(
+            json.dumps(chat_history, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        model = getattr(llm, "model_name", str(llm))
+        return f"{model}\0{history_hash}\0{normalize_query(question)}"
+
+    def _ask_pipeline(
+        self,
+        question: str,
+        source: str,
+        chat_history: list[dict],
+        on_token: Callable[[str], None] | None,
+        extra: dict | None,
+        llm,
+    ) -> dict:
+        """라우팅 → 경로별 처리 → trace 반환 (ask_with_trace의 실제 처리)"""
 
         trace = {
             "question": question,
             "rewritten_query": "",
             "source": source,
             "route": "",
+            "route_tier": "",
             "chat_history": chat_history,
             "retrieved_chunks": [],
             "context": "",
             "prompt": "",
             "answer": "",
             "timing": {},
-            "model": getattr(self.llm, "model_name", str(self.llm)),
+            "model": getattr(llm, "model_name", str(llm)),
             "embedding_model": getattr(self.embeddings, "model", ""),
         }
+        _merge_extra(trace, extra)
 
         if not question.strip():
             trace["answer"] = "질문을 입력해 주세요."
@@ -275,21 +770,86 @@ class RAG:
 
         t_start = time.time()
 
+        # ── STEP 0-0: 시맨틱 답변 캐시 (히스토리 없는 독립 질문만) ──
+        # 캐시에는 문서 답변만 저장하므로, 규칙으로 인사 / 메타 질문이 확정되면 임베딩 없이 바로 라우팅으로
+        question_vector = None
+        if ANSWER_CACHE_ENABLED and not chat_history and classify_by_rules(question) in (None, "document"):
+            question_vector = self._embed_query(question, trace)
+            cached = self.answer_cache.lookup(question_vector, trace["model"])
+            if cached is not None:
+                result, similarity = cached
+                trace.update({key: value for key, value in result.items() if key != "question"})
+                trace["cache"]["answer"] = {
+                    "hit": True,
+                    "similarity": round(similarity, 4),
+                    "matched_question": result["question"],
+                }
+                trace["timing"]["total"] = round(time.time() - t_start, 3)
+                logger.info(f"[답변 캐시 적중] Q: {question[:50]}... ≈ '{result['question'][:50]}' ({similarity:.3f})")
+                _save_trace_to_jsonl(trace)
+                return trace
+            trace["cache"]["answer"] = {"hit": False}
+
         # ── STEP 0-1: Query Rewriting (대화 맥락 반영) ──
         search_query = question  # 벡터 검색에 사용할 질문
+        combined_route = None     # 재작성과 함께 결정된 경로 (통합 호출 성공 시)
         if chat_history:
             t_rw0 = time.time()
-            search_query = rewrite_query(question, chat_history, self.llm)
-            t_rw1 = time.time()
+            combined = rewrite_and_route(question, chat_history, llm) if COMBINED_REWRITE_ROUTE else None
+            if combined is not None:
+                search_query, combined_route = combined
+                trace["timing"]["0_rewrite_routing"] = round(time.time() - t_rw0, 3)
+            else:
+                search_query = rewrite_query(question, chat_history, llm)
+                trace["timing"]["0_rewriting"] = round(time.time() - t_rw0, 3)
             trace["rewritten_query"] = search_query
-            trace["timing"]["0_rewriting"] = round(t_rw1 - t_rw0, 3)
 
-        # ── STEP 0-2: 라우팅 (재작성된 질문으로 분류) ──
+        # 검색 질의 임베딩 (라우팅 중심점 단계와 벡터 검색이 공유, 필요할 때 1회만 계산)
+        query_vector = question_vector if search_query == question else None
+        vector_lock = threading.Lock()
+
+        def embed_search_query(query: str, target: dict = trace) -> list[float]:
+            nonlocal query_vector
+            with vector_lock:
+                if query_vector is None:
+                    query_vector = self._embed_query(query, target)
+                return query_vector
+
+        # ── STEP 0-2: 라우팅 (재작성된 질문으로 분류: 규칙 → 중심점 → LLM) ──
         t0 = time.time()
-        route = classify(search_query, self.llm)
+
+        # 규칙으로 바로 분류되지 않는 질문은 라우팅이 끝나기를 기다리지 않고 검색을 미리 시작
+        # 추측 검색은 trace가 반환된 뒤에도 실행 중일 수 있으므로 별도 dict에 기록하고, 결과를 쓸 때만 trace에 병합
+        speculative = None
+        speculative_trace = {"timing": {}, "cache": {}}
+        if SPECULATIVE_RETRIEVAL and combined_route is None and classify_by_rules(search_query) is None:
+            def speculative_retrieve():
+                started = time.time()
+                results = self._retrieve(
+                    search_query, k=TOP_K, timing=speculative_trace["timing"],
+                    query_vector=embed_search_query(search_query, speculative_trace),
+                )
+                return results, started, time.time()
+
+            speculative = self._executor.submit(speculative_retrieve)
+
+        if combined_route is not None:
+            route, route_tier = combined_route, "llm_combined"
+        elif LOCAL_ROUTER_ENABLED:
+            route, route_tier = route_question(
+                search_query, llm, embed=embed_search_query, centroid_router=self.centroid_router
+            )
+        else:
+            route, route_tier = classify(search_query, llm), "llm"
         t1 = time.time()
         trace["route"] = route
-        trace["timing"]["0_routing"] = round(t1 - t0, 3)
+        trace["route_tier"] = route_tier
+        if combined_route is None:
+            trace["timing"]["0_routing"] = round(t1 - t0, 3)
+
+        if speculative is not None and route != "document":
+            speculative.cancel()  # 이미 실행 중이면 끝나도 결과를 사용하지 않음
+            trace["speculative_retrieval"] = "discarded"
 
         # ── 히스토리 블록 (프롬프트 삽입용) ──
         history_block = ""
@@ -298,58 +858,51 @@ class RAG:
 
         # ── 경로별 처리 ──
         if route == "meta":
-            trace["answer"] = get_meta_response(search_query, self.vectorstore)
+            trace["answer"] = get_meta_response(search_query, self.vectorstore, self.data_dir)
             trace["timing"]["total"] = round(time.time() - t_start, 3)
             _save_trace_to_jsonl(trace)
             return trace
 
         if route == "general":
-            t2 = time.time()
             prompt_messages = PROMPT_TEMPLATE_GENERAL.format_messages(
                 question=question, history_block=history_block
             )
-            response = self.llm.invoke(prompt_messages)
-            t3 = time.time()
-            trace["answer"] = response.content
-            trace["timing"]["2_llm_generation"] = round(t3 - t2, 3)
-            trace["timing"]["total"] = round(t3 - t_start, 3)
             trace["prompt"] = "\n".join([f"[{m.type}]\n{m.content}" for m in prompt_messages])
-            if hasattr(response, "response_metadata"):
-                usage = response.response_metadata.get("token_usage", {})
-                if usage:
-                    trace["token_usage"] = {
-                        "prompt_tokens": usage.get("prompt_tokens", 0),
-                        "completion_tokens": usage.get("completion_tokens", 0),
-                        "total_tokens": usage.get("total_tokens", 0),
-                    }
+            self._generate(llm, prompt_messages, trace, t_start, on_token)
             logger.info(f"[GENERAL] Q: {question[:50]}... | LLM: {trace['timing']['2_llm_generation']}s")
             _save_trace_to_jsonl(trace)
             return trace
 
         # ── route == "document": RAG 파이프라인 ──
-        # STEP 1: 벡터 검색 (재작성된 질문으로 검색)
-        t2 = time.time()
-        results = self.vectorstore.similarity_search_with_score(search_query, k=TOP_K)
-        t3 = time.time()
-        trace["timing"]["1_retrieval"] = round(t3 - t2, 3)
-
-        for doc, score in results:
-            source_file = doc.metadata.get("source", "알 수 없음")
-            source_name = Path(source_file).name if source_file else "알 수 없음"
-            trace["retrieved_chunks"].append({
-                "source": source_name,
-                "page": doc.metadata.get("page", "?"),
-                "score": round(float(score), 4),
-                "text": doc.page_content,
-            })
-
-        # STEP 2: 컨텍스트 조합
-        context_parts = []
-        for i, chunk in enumerate(trace["retrieved_chunks"], 1):
-            context_parts.append(
-                f"[문서 {i}] (출처: {chunk['source']}, p.{chunk['page']})\n{chunk['text']}"
+        # STEP 1: 하이브리드 검색 (재작성된 질문으로 검색)
+        results = None
+        if speculative is not None:
+            try:
+                results, r0, r1 = speculative.result()
+            except Exception as e:
+                logger.warning(f"[추측 검색] 실패: {e} → 다시 검색")
+            else:
+                # 라우팅과 겹친 시간(overlap)과 라우팅 후 추가로 기다린 시간(wait)을 함께 기록
+                trace["speculative_retrieval"] = "used"
+                _merge_extra(trace, speculative_trace)
+                trace["timing"]["1_retrieval"] = round(r1 - r0, 3)
+                trace["timing"]["1_retrieval_overlap"] = round(max(0.0, min(r1, t1) - max(r0, t0)), 3)
+                trace["timing"]["1_retrieval_wait"] = round(max(0.0, time.time() - t1), 3)
+
+        if results is None:
+            t2 = time.time()
+            results = self._retrieve(
+                search_query, k=TOP_K, timing=trace["timing"], query_vector=embed_search_query(search_query)
             )
-        context = "\n\n---\n\n".join(context_parts)
+            t3 = time.time()
+            trace["timing"]["1_retrieval"] = round(t3 - t2, 3)
+
+        trace["retrieved_chunks"].extend(chunk_records(results))
+
+        # STEP 2: 컨텍스트 조합 (같은 쪽 청크 병합 + 겹침 제거 + 토큰 예산)
+        context, trace["context_packing"] = pack_context(
+            trace["retrieved_chunks"], CONTEXT_TOKEN_BUDGET, model_name=trace["model"]
+        )
         trace["context"] = context
 
         # STEP 3: 프롬프트 생성 (히스토리 포함)
@@ -358,22 +911,17 @@ class RAG:
         )
         trace["prompt"] = "\n".join([f"[{m.type}]\n{m.content}" for m in prompt_messages])
 
-        # STEP 4: LLM 호출
-        t4 = time.time()
-        response = self.llm.invoke(prompt_messages)
-        t5 = time.time()
-        trace["timing"]["2_llm_generation"] = round(t5 - t4, 3)
-        trace["timing"]["total"] = round(t5 - t_start, 3)
-        trace["answer"] = response.content
-
-        if hasattr(response, "response_metadata"):
-            usage = response.response_metadata.get("token_usage", {})
-            if usage:
-                trace["token_usage"] = {
-                    "prompt_tokens": usage.get("prompt_tokens", 0),
-                    "completion_tokens": usage.get("completion_tokens", 0),
-                    "total_tokens": usage.get("total_tokens", 0),
-                }
+        # STEP 4: LLM 호출 (on_token이 있으면 스트리밍)
+        self._generate(llm, prompt_messages, trace, t_start, on_token)
+
+        if question_vector is not None:
+            self.answer_cache.store(question, question_vector, trace["model"], {
+                "question": question,
+                "route": route,
+                "answer": trace["answer"],
+                "retrieved_chunks": trace["retrieved_chunks"],
+                "context": context,
+            })
 
         logger.info(
             f"[RAG] Q: {question[:50]}... | "
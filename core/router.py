@@ -5,37 +5,74 @@
 - "document": 문서 검색이 필요한 질문 → RAG 파이프라인
 - "meta":     시스템/문서 메타 정보 질문 → 직접 응답
 - "general":  일반 대화/범용 질문 → LLM 직접 답변
+
+분류는 빠른 단계부터 시도하며, 확신할 수 없을 때만 다음 단계로 넘어갑니다.
+1. rule:     키워드/정규식 규칙 (마이크로초, 문서 키워드는 ROUTER_DOCUMENT_KEYWORDS 환경 변수로 설정)
+2. centroid: 라벨별 예시 질문 임베딩의 중심점과 코사인 유사도 비교 (질의 임베딩 1회)
+3. llm:      LLM 분류 프롬프트 (네트워크 왕복)
 """
 
+import os
+import re
+import json
 import logging
+from collections.abc import Callable
+from functools import lru_cache
 from pathlib import Path
 
+import numpy as np
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from core.memory import format_history
+
 logger = logging.getLogger(__name__)
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 
+# ── 분류 기준 (분류 프롬프트와 재작성+분류 통합 프롬프트가 공유) ──
+ROUTE_RULES = (
+    "Rules:\n"
+    "- 'document': Questions about the CONTENT of uploaded documents "
+    "(reports, data, statistics, analysis, programs, events described in documents)\n"
+    "- 'meta': Questions ONLY about the technical system configuration "
+    "(what documents are loaded, how many vector chunks exist, what AI model is being used). "
+    "This is ONLY for system/infrastructure questions.\n"
+    "- 'general': Everything else — greetings, general knowledge, coding questions, "
+    "casual conversation, AND questions about the conversation itself "
+    "(e.g. 'what did I just ask?', 'summarize our conversation', 'what was my previous question?'). "
+    "Questions about the conversation or chat history are ALWAYS 'general', NEVER 'meta'."
+)
+ROUTES = ("document", "meta", "general")
+
 # ── 분류용 프롬프트 (경량, max_tokens=10) ─────────────
 CLASSIFIER_PROMPT = ChatPromptTemplate.from_messages([
     ("system", (
         "You are a question classifier. Classify the user's question into exactly one category.\n"
         "Respond with ONLY one word: document, meta, or general.\n\n"
-        "Rules:\n"
-        "- 'document': Questions about the CONTENT of uploaded documents "
-        "(reports, data, statistics, analysis, programs, events described in documents)\n"
-        "- 'meta': Questions ONLY about the technical system configuration "
-        "(what documents are loaded, how many vector chunks exist, what AI model is being used). "
-        "This is ONLY for system/infrastructure questions.\n"
-        "- 'general': Everything else — greetings, general knowledge, coding questions, "
-        "casual conversation, AND questions about the conversation itself "
-        "(e.g. 'what did I just ask?', 'summarize our conversation', 'what was my previous question?'). "
-        "Questions about the conversation or chat history are ALWAYS 'general', NEVER 'meta'."
+        + ROUTE_RULES
     )),
     ("human", "{question}"),
 ])
 
+# ── 멀티턴: 재작성 + 분류 통합 프롬프트 (LLM 1회 호출) ──
+REWRITE_ROUTE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", (
+        "You are a query rewriter and question classifier. "
+        "Given a conversation history and a follow-up question:\n"
+        "1. Rewrite the follow-up question as a standalone question in Korean. "
+        "If the question is already standalone, keep it as-is. Do NOT answer the question.\n"
+        "2. Classify the standalone question into exactly one category: document, meta, or general.\n\n"
+        + ROUTE_RULES + "\n\n"
+        "Respond with ONLY a JSON object, nothing else:\n"
+        '{{"question": "<standalone question>", "route": "document|meta|general"}}'
+    )),
+    ("human",
+     "## 대화 히스토리\n{history}\n\n"
+     "## 후속 질문\n{question}"),
+])
+
 
 def classify(question: str, llm) -> str:
     """질문을 분류하여 'document', 'meta', 'general' 중 하나를 반환합니다."""
@@ -43,7 +80,7 @@ def classify(question: str, llm) -> str:
     try:
         result = chain.invoke({"question": question}).strip().lower()
         # 결과가 유효한 카테고리가 아니면 기본값으로 document 처리
-        if result not in ("document", "meta", "general"):
+        if result not in ROUTES:
             logger.warning(f"[라우터] 분류 결과가 유효하지 않음: '{result}' → 'document'로 폴백")
             result = "document"
         logger.info(f"[라우터] '{question[:40]}...' → {result}")
@@ -53,10 +90,219 @@ def classify(question: str, llm) -> str:
         return "document"
 
 
-def get_meta_response(question: str, vectorstore=None) -> str:
+# ── 1단계: 규칙 기반 분류 ─────────────────────────────
+# 한 라벨의 규칙만 매칭될 때만 확정 (여러 라벨이 매칭되면 다음 단계로)
+# 문서 내용과 무관한 패턴(인사, 대화 자체, 시스템 정보)만 두고, 문서 질문 키워드는 문서 세트별 설정으로 분리
+# 봇을 주어로 한 질문 ("너 ...", "챗봇은 ...") — 문서 속 모델 / 자료 이야기와 구분
+_BOT_SUBJECT = r"(^|\s)(너|넌|네가|니가|봇|챗봇|당신|gpt)(은|는|이|가|의|에게|한테)?\s"
+
+RULES = [
+    ("general", re.compile(
+        r"^\s*(안녕(하세요|하십니까)?|하이|ㅎㅇ|hello|hi|hey|고마워|고맙습니다|감사합니다|감사|땡큐|thanks|thank you|ㄳ|바이|bye)"
+        r"[\s!?.~ㅎㅋ^]*$",
+        re.IGNORECASE,
+    )),
+    # 대화 자체에 대한 질문만 ("이전 보고서에서 말한 ..." 같은 문서 질문은 제외)
+    ("general", re.compile(
+        r"(내가|제가)?\s*(방금|아까)\s*(뭐|무엇을?)?\s*(라고\s*)?(물어|질문)"
+        r"|(^|\s)(우리|지금까지|이)\s*(나눈\s*)?대화\s*(내용\s*)?(을|를)?\s*(요약|정리)"
+    )),
+    ("meta", re.compile(
+        _BOT_SUBJECT + r".{0,10}(어떤|무슨|몇\s*개의?)\s*(문서|파일|자료).{0,10}(로드|있|들어|등록|학습)"
+        r"|(로드|등록|학습|인덱싱)\s*(된|한)\s*(문서|파일|자료)"
+        r"|(벡터|청크)\s*(는|가)?\s*(개수|수는|수가|몇\s*개)"
+        r"|" + _BOT_SUBJECT + r".{0,10}(어떤|무슨)\s*(ai\s*)?(모델|llm|임베딩)",
+        re.IGNORECASE,
+    )),
+]
+
+# 문서 질문으로 바로 확정할 키워드 (쉼표 구분, 공백은 있어도 없어도 매칭). 비어 있으면 문서 규칙 없음
+# 예: ROUTER_DOCUMENT_KEYWORDS="수료율,만족도,이탈률,운영 보고서,코칭 스터디,코딩 캠프"
+DOCUMENT_KEYWORDS_ENV = "ROUTER_DOCUMENT_KEYWORDS"
+
+
+def document_keywords() -> tuple[str, ...]:
+    return tuple(k.strip() for k in os.getenv(DOCUMENT_KEYWORDS_ENV, "").split(",") if k.strip())
+
+
+@lru_cache(maxsize=8)
+def _keyword_pattern(keywords: tuple[str, ...]) -> re.Pattern | None:
+    if not keywords:
+        return None
+    return re.compile("|".join(re.escape(k).replace("\\ ", "\\s*") for k in keywords), re.IGNORECASE)
+
+
+def classify_by_rules(question: str, keywords: tuple[str, ...] | None = None) -> str | None:
+    """
+    규칙으로 분류합니다. 매칭되는 라벨이 정확히 1개가 아니면 None.
+    keywords: 문서 질문 키워드 (None이면 ROUTER_DOCUMENT_KEYWORDS 환경 변수)
+    """
+    labels = {label for label, pattern in RULES if pattern.search(question)}
+    document_pattern = _keyword_pattern(document_keywords() if keywords is None else keywords)
+    if document_pattern is not None and document_pattern.search(question):
+        labels.add("document")
+    return labels.pop() if len(labels) == 1 else None
+
+
+# ── 2단계: 임베딩 중심점(nearest-centroid) 분류 ───────
+EXAMPLE_QUESTIONS = {
+    "document": [
+        "코칭스터디 17기 수료율은?",
+        "16기 참여자 만족도는 어땠어?",
+        "DX코딩캠프 여름방학 운영 결과 요약해줘",
+        "겨울방학 캠프 이탈률은?",
+        "운영보고서에서 제시한 개선점은 뭐야?",
+        "멘토링 프로그램 일정 알려줘",
+        "수강생 출석률 통계 알려줘",
+        "캠프에서 가장 높은 평가를 받은 강의는?",
+        "17기와 16기 결과를 비교해줘",
+        "프로그램 운영 중 발생한 이슈는?",
+    ],
+    "meta": [
+        "어떤 문서가 로드되어 있어?",
+        "문서 몇 개 있어?",
+        "벡터 청크는 몇 개야?",
+        "지금 사용하는 AI 모델이 뭐야?",
+        "임베딩 모델은 뭐 써?",
+        "인덱스에 들어있는 파일 목록 보여줘",
+        "시스템 정보 알려줘",
+        "학습된 자료 목록 보여줘",
+    ],
+    "general": [
+        "안녕하세요",
+        "고마워!",
+        "파이썬으로 리스트 정렬하는 법 알려줘",
+        "1+1은?",
+        "오늘 날씨 어때?",
+        "내가 방금 뭐 물어봤지?",
+        "지금까지 대화 요약해줘",
+        "회의 일정 조율 이메일 초안 써줘",
+        "재미있는 농담 하나 해줘",
+        "SQL JOIN이 뭔지 설명해줘",
+    ],
+}
+
+# 임계값은 사용하는 임베딩 모델에 따라 달라지므로 라벨이 있는 질문 세트로 측정해서 정함
+# (python test/eval_test.py --routing test/routing_golden.jsonl)
+# 아래 값은 아직 배포 임베딩 모델로 측정하지 않은 초기값 → core.rag.CENTROID_ROUTER_ENABLED = False로 꺼 둠
+CENTROID_MIN_SIMILARITY = 0.35  # 가장 가까운 중심점과의 최소 유사도
+CENTROID_MIN_MARGIN = 0.08      # 1위와 2위 중심점 유사도 차이
+
+
+class CentroidRouter:
+    """라벨별 예시 질문 임베딩의 중심점으로 질문을 분류합니다."""
+
+    def __init__(
+        self,
+        embeddings,
+        examples: dict[str, list[str]] = EXAMPLE_QUESTIONS,
+        min_similarity: float = CENTROID_MIN_SIMILARITY,
+        min_margin: float = CENTROID_MIN_MARGIN,
+    ):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.labels = list(examples)
+        centroids = []
+        for label in self.labels:
+            vectors = np.asarray(embeddings.embed_documents(examples[label]), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        self.centroids = np.stack(centroids)
+
+    def score(self, query_vector: list[float]) -> tuple[str, float, float]:
+        """(가장 가까운 라벨, 그 중심점과의 유사도, 1위-2위 유사도 차이)를 반환합니다."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self.centroids @ query
+        order = np.argsort(scores)[::-1]
+        best, second = float(scores[order[0]]), float(scores[order[1]])
+        return self.labels[order[0]], best, best - second
+
+    def classify(self, query_vector: list[float]) -> tuple[str | None, float]:
+        """(라벨, 1위-2위 유사도 차이)를 반환합니다. 확신할 수 없으면 라벨은 None."""
+        label, best, margin = self.score(query_vector)
+        if best < self.min_similarity or margin < self.min_margin:
+            return None, margin
+        return label, margin
+
+
+def route_question(
+    question: str,
+    llm,
+    embed: Callable[[str], list[float]] | None = None,
+    centroid_router: CentroidRouter | None = None,
+) -> tuple[str, str]:
+    """
+    규칙 → 임베딩 중심점 → LLM 순으로 질문을 분류합니다.
+
+    Args:
+        question: 분류할 질문
+        llm: 마지막 단계에서 사용할 LLM
+        embed: 질문 임베딩 함수 (중심점 단계에서만 호출)
+        centroid_router: 중심점 분류기 (None이면 중심점 단계 생략)
+
+    Returns:
+        (경로, 결정한 단계 "rule" | "centroid" | "llm")
+    """
+    route = classify_by_rules(question)
+    if route is not None:
+        logger.info(f"[라우터:rule] '{question[:40]}...' → {route}")
+        return route, "rule"
+
+    if centroid_router is not None and embed is not None:
+        route, margin = centroid_router.classify(embed(question))
+        if route is not None:
+            logger.info(f"[라우터:centroid] '{question[:40]}...' → {route} (margin={margin:.3f})")
+            return route, "centroid"
+
+    return classify(question, llm), "llm"
+
+
+def parse_rewrite_route(text: str) -> tuple[str, str] | None:
+    """통합 프롬프트의 JSON 응답을 (재작성된 질문, 경로)로 파싱합니다. 형식이 어긋나면 None."""
+    match = re.search(r"\{.*\}", text, re.DOTALL)  # 코드 블록(```json) 등 앞뒤 텍스트 무시
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group())
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    rewritten = str(data.get("question", "")).strip()
+    route = str(data.get("route", "")).strip().lower()
+    if not rewritten or route not in ROUTES:
+        return None
+    return rewritten, route
+
+
+def rewrite_and_route(question: str, history: list[dict], llm) -> tuple[str, str] | None:
+    """
+    대화 히스토리를 참고한 질문 재작성과 분류를 LLM 1회 호출로 수행합니다.
+    응답을 해석할 수 없으면 None을 반환하며, 호출 측은 기존 2회 호출(재작성 → 분류)로 폴백합니다.
+    """
+    chain = REWRITE_ROUTE_PROMPT | llm | StrOutputParser()
+    try:
+        text = chain.invoke({"history": format_history(history), "question": question})
+    except Exception as e:
+        logger.warning(f"[재작성+라우팅] 호출 실패: {e} → 2단계 처리로 폴백")
+        return None
+
+    parsed = parse_rewrite_route(text)
+    if parsed is None:
+        logger.warning(f"[재작성+라우팅] 응답 파싱 실패: '{text[:80]}' → 2단계 처리로 폴백")
+        return None
+
+    logger.info(f"[재작성+라우팅] '{question}' → '{parsed[0]}' ({parsed[1]})")
+    return parsed
+
+
+def get_meta_response(question: str, vectorstore=None, data_dir: Path = DATA_DIR) -> str:
     """시스템 메타 정보에 대한 질문에 직접 답변합니다."""
     # 문서 목록 수집 (PDF + Word)
-    data_files = sorted(DATA_DIR.glob("*.pdf")) + sorted(DATA_DIR.glob("*.docx"))
+    data_files = sorted(data_dir.glob("*.pdf")) + sorted(data_dir.glob("*.docx"))
     doc_list = "\n".join([f"  {i}. {f.name}" for i, f in enumerate(data_files, 1)])
     total_docs = len(data_files)
 
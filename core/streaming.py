@@ -0,0 +1,127 @@
+"""
+슬랙 스트리밍 답변 (Streaming Delivery)
+
+LLM이 생성하는 토큰을 받아 "검색 중" 메시지를 chat_update로 점진적으로 수정합니다.
+- 토큰 콜백은 버퍼에 쌓기만 하고, 메시지 수정(HTTP 호출)은 별도 스레드에서 수행 (느린 Slack API가 생성을 막지 않음)
+- 첫 토큰은 바로 표시 (사용자가 체감하는 첫 응답 시간 단축)
+- 이후에는 일정 간격 이상 지났을 때만 수정 (Slack API Rate Limit 대응)
+- Rate Limit(429)을 받으면 Retry-After 만큼 수정 간격을 늘림
+- 마지막에는 항상 전체 답변으로 수정
+"""
+
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ── 기본 설정 ─────────────────────────────────────────
+DEFAULT_UPDATE_INTERVAL = 1.0   # 메시지 수정 최소 간격 (초)
+MAX_UPDATE_INTERVAL = 10.0      # Rate Limit 시 늘어나는 수정 간격 상한 (초)
+MAX_MESSAGE_CHARS = 39_000      # Slack 메시지 길이 제한(40,000자) 여유
+CURSOR = " ▌"                   # 생성 중 표시
+
+
+class SlackMessageStreamer:
+    """
+    이미 게시된 메시지(ts)를 스트리밍 토큰으로 점진적으로 수정합니다.
+    on_token을 RAG.ask_with_trace(on_token=...)에 넘기고, 생성이 끝나면 finish()를 호출합니다.
+    생성이 실패하면 close()로 수정 스레드를 멈춘 뒤 오류 메시지를 게시합니다.
+
+    Args:
+        client: Slack WebClient
+        channel: 채널 ID
+        ts: 수정할 메시지 타임스탬프 ("검색 중" 메시지)
+        interval: 메시지 수정 최소 간격 (초)
+        started: 첫 표시 시간 측정 기준 시각 (기본: 생성 시점)
+    """
+
+    def __init__(
+        self,
+        client,
+        channel: str,
+        ts: str,
+        interval: float = DEFAULT_UPDATE_INTERVAL,
+        started: float | None = None,
+    ):
+        self.client = client
+        self.channel = channel
+        self.ts = ts
+        self.interval = interval
+        self._parts: list[str] = []
+        self._cond = threading.Condition()
+        self._dirty = False     # 마지막 수정 이후 받은 토큰이 있음
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self._last_update = 0.0
+        self._started = started or time.time()
+        self.first_visible = None  # 첫 토큰이 슬랙에 표시되기까지 걸린 시간 (초)
+        self.updates = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def _update(self, text: str) -> bool:
+        """메시지를 수정합니다. 실패해도 답변 생성은 계속되도록 예외를 삼킵니다."""
+        try:
+            self.client.chat_update(channel=self.channel, ts=self.ts, text=text[:MAX_MESSAGE_CHARS])
+            self.updates += 1
+            return True
+        except Exception as e:
+            response = getattr(e, "response", None)
+            if getattr(response, "status_code", None) == 429:
+                retry_after = float(response.headers.get("Retry-After", self.interval * 2))
+                self.interval = min(MAX_UPDATE_INTERVAL, max(self.interval * 2, retry_after))
+                logger.warning(f"[스트리밍] Rate Limit → 수정 간격 {self.interval:.1f}초로 조정")
+            else:
+                logger.warning(f"[스트리밍] 메시지 수정 실패: {e}")
+            return False
+
+    def on_token(self, token: str):
+        """토큰 조각을 버퍼에 추가하고 수정 스레드를 깨웁니다 (Slack API를 직접 호출하지 않음)."""
+        with self._cond:
+            if self._closed:
+                return
+            self._parts.append(token)
+            self._dirty = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slack-stream", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        """새 토큰이 있으면 첫 토큰은 바로, 이후에는 수정 간격이 지날 때마다 메시지를 수정합니다."""
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                wait = self._last_update + self.interval - time.time() if self._last_update else 0.0
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                text = self.text
+                self._dirty = False
+                self._last_update = time.time()
+            if self._update(text + CURSOR) and self.first_visible is None:
+                self.first_visible = round(time.time() - self._started, 3)
+
+    def close(self):
+        """수정 스레드를 멈춥니다 (진행 중인 수정이 끝날 때까지 대기). 이후 받는 토큰은 무시합니다."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def finish(self, text: str | None = None):
+        """전체 답변(기본: 지금까지 받은 토큰)으로 메시지를 최종 수정합니다."""
+        self.close()
+        final = text if text is not None else self.text
+        if not self._update(final):
+            # 최종 답변은 반드시 전달되어야 하므로 한 번 더 시도
+            time.sleep(min(self.interval, MAX_UPDATE_INTERVAL))
+            self._update(final)
@@ -0,0 +1,205 @@
+"""
+트레이스 기록기 (Trace Writer)
+
+요청마다 파일을 열고 닫는 대신, trace 레코드를 제한된 크기의 큐에 넣고
+백그라운드 스레드가 모아서(batch) 기록합니다.
+- 일정 개수가 쌓이거나 일정 시간이 지나면 기록, 종료 시(atexit) 남은 레코드 기록
+- 파일 크기 / 날짜가 바뀌면 교체(rotation)하고 이전 파일은 gzip 압축
+- 큐가 가득 차거나 디스크 오류가 나도 답변 처리는 막지 않음 (버린 레코드 수 집계)
+"""
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import logging
+from datetime import date, datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ── 기본 설정 ─────────────────────────────────────────
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0            # 초
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024    # 파일 교체 크기
+DEFAULT_BACKUP_COUNT = 30               # 보관할 압축 파일 수 (0이면 모두 보관)
+
+_STOP = object()
+
+
+class TraceWriter:
+    """
+    JSONL 레코드를 백그라운드에서 배치로 기록하는 기록기
+
+    교체된 파일은 "{이름}-YYYYmmdd-HHMMSS-ffffff.jsonl.gz" 형식으로 같은 폴더에 저장됩니다.
+
+    Args:
+        path: 기록할 JSONL 파일 경로
+        queue_size: 대기 가능한 최대 레코드 수 (넘으면 버림)
+        batch_size: 한 번에 기록할 레코드 수
+        flush_interval: 레코드가 적어도 이 시간(초)이 지나면 기록
+        max_bytes: 파일이 이 크기를 넘으면 교체 (0이면 크기 기준 교체 안 함)
+        rotate_daily: 날짜가 바뀌면 교체
+        backup_count: 보관할 압축 파일 수 (0이면 모두 보관)
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        rotate_daily: bool = True,
+        backup_count: int = DEFAULT_BACKUP_COUNT,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backup_count = backup_count
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._closed = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._day = self._file_day()
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ── 요청 경로 (막히지 않음) ───────────────────────
+    def write(self, record: dict) -> bool:
+        """레코드를 큐에 넣습니다. 큐가 가득 찼거나 종료된 뒤면 버리고 False를 반환합니다."""
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"[트레이스] 큐가 가득 차 레코드를 버림 (누적 {self.dropped}건)")
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """지금까지 넣은 레코드가 파일에 기록될 때까지 기다립니다."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """남은 레코드를 기록하고 백그라운드 스레드를 종료합니다."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("[트레이스] 종료 시 큐가 가득 차 일부 레코드를 기록하지 못함")
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    # ── 백그라운드 기록 ───────────────────────────────
+    def _run(self):
+        batch: list[dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+
+            self._write_batch(batch)
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    def _write_batch(self, batch: list[dict]):
+        if not batch:
+            return
+        # 레코드마다 직렬화하여 잘못된 레코드 1건 때문에 배치 전체를 버리지 않음
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            except Exception as e:
+                self.errors += 1
+                self.dropped += 1
+                logger.warning(f"[트레이스] 직렬화 실패 (1건 버림): {e}")
+        if not lines:
+            return
+        try:
+            self._rotate_if_needed()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self.written += len(lines)
+        except Exception as e:
+            # 디스크 오류 등은 답변과 무관하므로 기록만 포기
+            self.errors += 1
+            self.dropped += len(lines)
+            logger.warning(f"[트레이스] 기록 실패 ({len(lines)}건 버림): {e}")
+
+    # ── 파일 교체 (rotation) ──────────────────────────
+    def _file_day(self) -> date | None:
+        try:
+            return datetime.fromtimestamp(self.path.stat().st_mtime).date()
+        except OSError:
+            return None
+
+    def _rotate_if_needed(self):
+        today = date.today()
+        if self._day is None:
+            self._day = today
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            return
+        too_big = self.max_bytes and size >= self.max_bytes
+        new_day = self.rotate_daily and self._day != today
+        if size and (too_big or new_day):
+            self._rotate()
+        self._day = today
+
+    def _rotate(self):
+        """현재 파일을 gzip으로 압축해 보관하고 새 파일로 시작합니다."""
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")  # 이름순 = 시간순
+        rotated = self.path.with_name(f"{self.path.stem}-{stamp}{self.path.suffix}")
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+        logger.info(f"[트레이스] 파일 교체 → {rotated.name}.gz")
+
+        if self.backup_count:
+            backups = sorted(self.path.parent.glob(f"{self.path.stem}-*{self.path.suffix}.gz"))
+            for old in backups[:-self.backup_count]:
+                old.unlink(missing_ok=True)
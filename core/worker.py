@@ -0,0 +1,153 @@
+"""
+요청 큐 / 워커 풀 (Request Queue)
+
+슬랙 이벤트 리스너는 질문을 큐에 넣고 바로 반환하며, 정해진 수의 워커 스레드가 질문을 처리합니다.
+- 큐 크기 제한: 가득 차면 새 요청을 거절 (호출 측에서 안내 메시지 전송)
+- 사용자별 / 채널별 대기 요청 수 제한
+- 공정성: 사용자별 대기열을 라운드로빈으로 꺼내어, 한 사용자의 연속 질문이 다른 사용자를 막지 않음
+"""
+
+import threading
+import time
+import logging
+from collections import Counter, OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# ── 기본 설정 ─────────────────────────────────────────
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_SIZE = 50
+DEFAULT_MAX_PER_USER = 3
+DEFAULT_MAX_PER_CHANNEL = 20
+
+
+class QueueFull(Exception):
+    """요청을 받을 수 없을 때 발생 (reason: "queue_full" | "user_limit" | "channel_limit")"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+@dataclass
+class Job:
+    func: Callable[[dict], None]
+    user: str
+    channel: str
+    enqueued_at: float
+    depth: int  # 접수 시점에 앞에서 대기 중이던 요청 수
+
+
+class RequestQueue:
+    """
+    사용자별 라운드로빈으로 요청을 처리하는 제한된 크기의 작업 큐
+
+    작업 함수는 큐 정보 dict({"depth", "wait", "active"})를 인자로 받아 실행됩니다.
+
+    Args:
+        workers: 워커 스레드 수 (동시에 처리하는 최대 요청 수)
+        max_size: 대기 가능한 최대 요청 수
+        max_per_user: 사용자 1명이 동시에 대기시킬 수 있는 최대 요청 수
+        max_per_channel: 채널 1개에서 동시에 대기시킬 수 있는 최대 요청 수
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_per_user: int = DEFAULT_MAX_PER_USER,
+        max_per_channel: int = DEFAULT_MAX_PER_CHANNEL,
+    ):
+        self.max_size = max_size
+        self.max_per_user = max_per_user
+        self.max_per_channel = max_per_channel
+        self._queues: OrderedDict[str, deque[Job]] = OrderedDict()  # 사용자 → 대기 작업
+        self._per_channel: Counter[str] = Counter()
+        self._cond = threading.Condition()
+        self._size = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"rag-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def pending(self) -> int:
+        """대기 중인 요청 수 (처리 중인 요청 제외)"""
+        return self._size
+
+    def submit(self, func: Callable[[dict], None], user: str, channel: str) -> int:
+        """
+        작업을 큐에 넣고 앞에서 대기 중인 요청 수를 반환합니다.
+        제한을 넘으면 QueueFull을 발생시킵니다.
+        """
+        with self._cond:
+            reason = None
+            if self._size >= self.max_size:
+                reason = "queue_full"
+            elif len(self._queues.get(user, ())) >= self.max_per_user:
+                reason = "user_limit"
+            elif self._per_channel[channel] >= self.max_per_channel:
+                reason = "channel_limit"
+            if reason:
+                self.rejected += 1
+                logger.warning(f"[요청 큐] 요청 거절 ({reason}) user={user} channel={channel} | 대기 {self._size}건")
+                raise QueueFull(reason)
+
+            depth = self._size
+            self._queues.setdefault(user, deque()).append(Job(func, user, channel, time.time(), depth))
+            self._per_channel[channel] += 1
+            self._size += 1
+            self._cond.notify()
+            return depth
+
+    def _next_job(self) -> Job:
+        """가장 오래 차례를 기다린 사용자의 작업을 꺼냅니다 (라운드로빈)."""
+        with self._cond:
+            while not self._size:
+                self._cond.wait()
+            user, jobs = next(iter(self._queues.items()))
+            job = jobs.popleft()
+            if jobs:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            self._per_channel[job.channel] -= 1
+            if not self._per_channel[job.channel]:
+                del self._per_channel[job.channel]
+            self._size -= 1
+            self.active += 1
+            return job
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            info = {
+                "depth": job.depth,
+                "wait": round(time.time() - job.enqueued_at, 3),
+                "active": self.active,
+            }
+            try:
+                job.func(info)
+            except Exception as e:
+                logger.error(f"[요청 큐] 작업 실패: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    self.active -= 1
+                    self.completed += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": self._size,
+                "active": self.active,
+                "workers": len(self._threads),
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,46 @@
+"""
+LogHistogram 분위수 확인
+
+분위수 근사값이 관측한 최댓값을 넘지 않는지, 첫 구간(HISTOGRAM_MIN 이하) 값만 있을 때도
+p50/p90/p99 ≤ max 인지 확인합니다.
+
+실행:
+    python -m pytest test/analytics_test.py -q
+    python test/analytics_test.py
+"""
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.analytics import LogHistogram, HISTOGRAM_MIN, QUANTILES
+
+
+def check(values: list[float]):
+    histogram = LogHistogram()
+    for value in values:
+        histogram.add(value)
+    summary = histogram.summary()
+    for q in QUANTILES:
+        assert histogram.quantile(q) <= histogram.max, (q, histogram.quantile(q), histogram.max)
+        assert summary[f"p{round(q * 100)}"] <= summary["max"], summary
+    return summary
+
+
+def test_quantiles_never_exceed_max():
+    random.seed(0)
+    cases = {
+        "0만": [0.0] * 10,
+        "첫 구간만": [HISTOGRAM_MIN / 10] * 10,
+        "첫 구간 + 큰 값": [HISTOGRAM_MIN / 2] * 9 + [2.5],
+        "한 값": [0.4213],
+        "로그 정규": [random.lognormvariate(-2, 1.5) for _ in range(10_000)],
+    }
+    for name, values in cases.items():
+        print(f"✅ {name}: {check(values)}")
+
+
+if __name__ == "__main__":
+    test_quantiles_never_exceed_max()
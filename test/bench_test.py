@@ -0,0 +1,339 @@
+"""
+오프라인 성능 벤치마크 도구
+
+OpenAI / Slack 없이 가짜 모델(test/fakes.py)로 전체 파이프라인을 실행하여 성능을 측정합니다.
+LLM / 임베딩 / Slack API 지연은 옵션으로 흉내 내며, 같은 옵션이면 같은 결과가 나오므로
+변경 전후 비교(기준선 저장 → 비교)나 CI에서의 성능 회귀 확인에 사용할 수 있습니다.
+
+측정 항목:
+- 인덱스: 최초 빌드(cold) / 캐시 로드(warm) / 임베딩 캐시를 사용한 재빌드
+- 질문: 단계별(trace timing) 지연 시간 분포, 슬랙 첫 표시 시간, LLM 호출 종류별 횟수
+- 동시성: 동시 요청 수별 처리량(질문/초)과 지연 시간
+- 메모리: 빌드 / 질문 처리 중 Python 메모리 최대 사용량(tracemalloc), 프로세스 최대 RSS
+
+실행:
+    python test/bench_test.py
+    python test/bench_test.py --docs 20 --questions 60 --concurrency 1 4 8 16 --llm-latency 0.3
+    python test/bench_test.py --save-baseline bench_baseline.json
+    python test/bench_test.py --compare bench_baseline.json     # 기준선보다 느려지면 종료 코드 1
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import logging
+import resource
+import tempfile
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# 상위 폴더의 모듈을 import 하기 위한 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import fitz
+
+import core.rag as rag_module
+from core.rag import RAG
+from core.models import MODEL_REGISTRY
+from core.streaming import SlackMessageStreamer
+from core.analytics import LogHistogram
+from fakes import FakeChatModel, FakeEmbeddings, FakeSlackClient
+
+FAKE_MODEL = "fake-llm"
+REGRESSION_THRESHOLD = 0.2  # 기준선 대비 20% 이상 나빠지면 회귀로 표시
+MEMORY_QUESTIONS = 10       # 메모리 측정 시 처리할 질문 수
+
+# ── 가짜 문서 / 질문 ──────────────────────────────────
+PROGRAMS = ["코칭스터디", "DX코딩캠프", "AI 부트캠프", "데이터 분석 과정"]
+TOPICS = ["수료율", "만족도", "참여 인원", "멘토 수", "프로젝트 수", "중도 이탈률", "운영 예산"]
+
+
+def make_corpus(data_dir: Path, docs: int, pages: int, seed: int = 0) -> list[dict]:
+    """
+    운영보고서 형태의 가짜 PDF 문서를 만들고, 문서에 적은 사실 목록을 반환합니다.
+    사실: {"source": 파일명, "page": 쪽 번호(1부터), "program", "term": 기수, "topic", "value"}
+    """
+    rng = random.Random(seed)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    facts = []
+    for d in range(docs):
+        program = PROGRAMS[d % len(PROGRAMS)]
+        source = f"report_{d + 1:03d}.pdf"
+        doc = fitz.open()
+        for p in range(pages):
+            lines = [f"{program} {d + 1}기 운영보고서 — {p + 1}쪽", ""]
+            for topic in rng.sample(TOPICS, 4):
+                value = rng.randint(10, 99)
+                lines.append(f"{program} {d + 1}기의 {topic}은(는) {value}이며, 전 기수 대비 {rng.randint(1, 9)}% 변화했습니다.")
+                lines.append(f"{topic} 관련 세부 내용: 주차별 활동 {rng.randint(3, 12)}회, 설문 응답 {rng.randint(20, 300)}건.")
+                facts.append({
+                    "source": source, "page": p + 1, "program": program, "term": d + 1, "topic": topic, "value": value,
+                })
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), "\n".join(lines), fontname="korea", fontsize=9)
+        doc.save(str(data_dir / source))
+        doc.close()
+    return facts
+
+
+def make_questions(count: int, docs: int, seed: int = 0) -> list[tuple[str, list[dict]]]:
+    """(질문, 대화 히스토리) 목록 — 문서 질문 위주에 일반/메타 질문과 후속 질문을 섞습니다."""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        program = PROGRAMS[i % len(PROGRAMS)]
+        n = rng.randint(1, docs)
+        topic = rng.choice(TOPICS)
+        kind = i % 10
+        if kind == 7:
+            questions.append((f"안녕하세요 {i}번째 인사입니다", []))
+        elif kind == 8:
+            questions.append(("지금 로드된 문서 목록 알려줘", []))
+        elif kind == 9:
+            history = [
+                {"role": "user", "content": f"{program} {n}기 {topic} 알려줘"},
+                {"role": "assistant", "content": f"{program} {n}기의 {topic}은 {rng.randint(10, 99)}입니다."},
+            ]
+            questions.append((f"그럼 {rng.choice(TOPICS)}은?", history))
+        else:
+            questions.append((f"{program} {n}기 {topic}은 얼마인가요?", []))
+    return questions
+
+
+# ── 측정 ──────────────────────────────────────────────
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, round(time.perf_counter() - t0, 3)
+
+
+def ask_once(rag: RAG, slack: FakeSlackClient, question: str, history: list[dict], interval: float) -> dict:
+    """app.py와 같은 방식(검색 중 메시지 → 스트리밍 수정)으로 질문 1개를 처리합니다."""
+    received_at = time.time()
+    loading = slack.chat_postMessage(channel="C-BENCH", text="🔍 문서를 검색하고 있습니다...")
+    streamer = SlackMessageStreamer(slack, "C-BENCH", loading["ts"], interval=interval, started=received_at)
+    trace = rag.ask_with_trace(question, source="bench", chat_history=history, on_token=streamer.on_token)
+    streamer.finish(trace["answer"])
+    trace["timing"]["slack_first_visible"] = streamer.first_visible
+    trace["timing"]["end_to_end"] = round(time.time() - received_at, 3)
+    return trace
+
+
+def stage_summary(traces: list[dict]) -> dict:
+    histograms = defaultdict(LogHistogram)
+    for trace in traces:
+        for stage, seconds in trace["timing"].items():
+            if isinstance(seconds, (int, float)):
+                histograms[stage].add(seconds)
+    return {stage: histograms[stage].summary() for stage in sorted(histograms)}
+
+
+def run_concurrency(rag: RAG, slack: FakeSlackClient, questions: list, concurrency: int, interval: float) -> dict:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        t0 = time.perf_counter()
+        traces = list(pool.map(lambda qh: ask_once(rag, slack, qh[0], qh[1], interval), questions))
+        elapsed = time.perf_counter() - t0
+    totals = LogHistogram()
+    for trace in traces:
+        totals.add(trace["timing"]["end_to_end"])
+    summary = totals.summary()
+    return {
+        "throughput": round(len(questions) / elapsed, 2),
+        "elapsed": round(elapsed, 3),
+        "p50": summary["p50"],
+        "p90": summary["p90"],
+        "p99": summary["p99"],
+    }
+
+
+def run_benchmark(args, work_dir: Path) -> dict:
+    data_dir = work_dir / "data"
+    index_dir = work_dir / "index"
+    cache_dir = work_dir / "cache"
+    # 벤치마크 trace는 실제 logs/와 섞이지 않게 작업 폴더에 기록 (python -m core.analytics --log-dir로 분석 가능)
+    rag_module.LOG_DIR = work_dir / "logs"
+    rag_module.ANSWER_CACHE_ENABLED = args.answer_cache
+
+    llm = FakeChatModel(
+        model_name=FAKE_MODEL,
+        latency=args.llm_latency,
+        token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens,
+    )
+    MODEL_REGISTRY[FAKE_MODEL] = (None, lambda: llm)
+    embeddings = FakeEmbeddings(latency=args.embed_latency, per_text_latency=args.embed_text_latency)
+    slack = FakeSlackClient(latency=args.slack_latency)
+
+    print(f"📄 가짜 문서 생성: {args.docs}개 × {args.pages}쪽")
+    make_corpus(data_dir, args.docs, args.pages)
+    questions = make_questions(args.questions, args.docs)
+
+    def build():
+        return RAG(FAKE_MODEL, data_dir=data_dir, index_dir=index_dir, cache_dir=cache_dir, embeddings=embeddings)
+
+    # 1. 인덱스 빌드
+    _, cold = timed(build)
+    rag, warm = timed(build)
+    _, rebuild = timed(rag.rebuild)
+    results = {"build": {"cold": cold, "warm_load": warm, "rebuild_cached": rebuild}}
+
+    # 2. 순차 질문 (단계별 지연 시간)
+    llm.calls.clear()
+    traces = [ask_once(rag, slack, q, h, args.stream_interval) for q, h in questions]
+    results["stages"] = stage_summary(traces)
+    results["routes"] = dict(sorted(
+        {route: sum(t.get("route") == route for t in traces) for route in {t.get("route") for t in traces}}.items()
+    ))
+    results["llm_calls"] = dict(sorted(llm.calls.items()))
+
+    # 3. 동시성별 처리량
+    results["concurrency"] = {
+        str(c): run_concurrency(rag, slack, questions, c, args.stream_interval) for c in args.concurrency
+    }
+
+    # 4. 메모리 (추적 오버헤드가 시간 측정에 섞이지 않도록 따로 실행)
+    tracemalloc.start()
+    memory_rag = RAG(FAKE_MODEL, data_dir=data_dir, index_dir=work_dir / "index-memory", cache_dir=cache_dir, embeddings=embeddings)
+    build_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    for q, h in questions[:MEMORY_QUESTIONS]:
+        ask_once(memory_rag, slack, q, h, args.stream_interval)
+    ask_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results["memory"] = {
+        "build_peak_mb": round(build_peak / 1024 ** 2, 1),
+        "ask_peak_mb": round(ask_peak / 1024 ** 2, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # Linux: KB
+    }
+    rag_module.get_trace_writer().flush()
+    return results
+
+
+# ── 출력 / 기준선 비교 ────────────────────────────────
+def print_results(results: dict):
+    print("\n" + "=" * 70)
+    print("  오프라인 벤치마크 결과 (단위: 초)")
+    print("=" * 70)
+    b = results["build"]
+    print(f"\n■ 인덱스: 최초 빌드 {b['cold']:.3f} | 캐시 로드 {b['warm_load']:.3f} | 캐시 재빌드 {b['rebuild_cached']:.3f}")
+
+    print(f"\n■ 단계별 지연 시간 (질문 {results['config']['questions']}개)")
+    print(f"  {'':<24}{'count':>7}{'avg':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for stage, s in results["stages"].items():
+        print(f"  {stage:<24}{s['count']:>7}{s['avg']:>9.3f}{s['p50']:>9.3f}{s['p90']:>9.3f}{s['p99']:>9.3f}{s['max']:>9.3f}")
+    print(f"  경로: {results['routes']} | LLM 호출: {results['llm_calls']}")
+
+    print("\n■ 동시성별 처리량")
+    for c, r in results["concurrency"].items():
+        print(f"  동시 {c:>3} | {r['throughput']:>7.2f} 질문/초 | p50 {r['p50']:.3f} | p90 {r['p90']:.3f} | p99 {r['p99']:.3f}")
+
+    m = results["memory"]
+    print(f"\n■ 메모리: 빌드 최대 {m['build_peak_mb']}MB | 질문 처리 최대 {m['ask_peak_mb']}MB | 프로세스 RSS {m['max_rss_mb']}MB")
+
+
+def comparable_metrics(results: dict) -> dict[str, tuple[float, bool]]:
+    """비교할 지표 → (값, 클수록 좋은지)"""
+    metrics = {f"build.{k}": (v, False) for k, v in results["build"].items()}
+    for stage, s in results["stages"].items():
+        metrics[f"stage.{stage}.p50"] = (s["p50"], False)
+        metrics[f"stage.{stage}.p90"] = (s["p90"], False)
+    for c, r in results["concurrency"].items():
+        metrics[f"concurrency.{c}.throughput"] = (r["throughput"], True)
+        metrics[f"concurrency.{c}.p90"] = (r["p90"], False)
+    metrics.update({f"memory.{k}": (v, False) for k, v in results["memory"].items()})
+    return metrics
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list[str]:
+    """기준선과 비교한 표를 출력하고 회귀한 지표 이름 목록을 반환합니다."""
+    if baseline.get("config") != results.get("config"):
+        print("\n⚠️ 기준선과 벤치마크 설정이 다릅니다. 비교 결과는 참고용입니다.")
+
+    before = comparable_metrics(baseline)
+    after = comparable_metrics(results)
+    regressions = []
+    print(f"\n■ 기준선 비교 (±{threshold:.0%} 이상 변화 표시)")
+    for name, (value, higher_is_better) in after.items():
+        if name not in before:
+            continue
+        old = before[name][0]
+        if old <= 0.001:  # 너무 작은 값은 비율 비교가 의미 없음
+            continue
+        change = (value - old) / old
+        worse = -change if higher_is_better else change
+        mark = "⚠️" if worse >= threshold else ("✅" if worse <= -threshold else "  ")
+        if worse >= threshold:
+            regressions.append(name)
+        print(f"  {mark} {name:<40}{old:>10.3f} → {value:>10.3f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 LLM/임베딩/Slack으로 실행하는 오프라인 성능 벤치마크")
+    parser.add_argument("--docs", type=int, default=10, help="가짜 PDF 문서 수")
+    parser.add_argument("--pages", type=int, default=5, help="문서당 쪽 수")
+    parser.add_argument("--questions", type=int, default=40, help="질문 수")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="측정할 동시 요청 수")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="LLM 호출당 첫 토큰 지연 (초)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="출력 토큰당 지연 (초)")
+    parser.add_argument("--answer-tokens", type=int, default=80, help="답변 길이 (토큰)")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="임베딩 요청당 지연 (초)")
+    parser.add_argument("--embed-text-latency", type=float, default=0.0005, help="임베딩 텍스트 1개당 추가 지연 (초)")
+    parser.add_argument("--slack-latency", type=float, default=0.05, help="Slack API 호출당 지연 (초)")
+    parser.add_argument("--stream-interval", type=float, default=0.5, help="스트리밍 메시지 수정 간격 (초)")
+    parser.add_argument("--answer-cache", action="store_true", help="시맨틱 답변 캐시 사용 (기본: 끔)")
+    parser.add_argument("--work-dir", type=Path, help="작업 폴더 (그 안의 rag-bench/ 사용, 기본: 임시 폴더를 만들고 종료 시 삭제)")
+    parser.add_argument("--save-baseline", type=Path, help="결과를 기준선 JSON으로 저장")
+    parser.add_argument("--compare", type=Path, help="기준선 JSON과 비교 (회귀 시 종료 코드 1)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="회귀 판정 비율")
+    parser.add_argument("--verbose", action="store_true", help="요청별 로그 출력")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+    )
+
+    if args.work_dir:
+        work_dir = args.work_dir / "rag-bench"
+        shutil.rmtree(work_dir, ignore_errors=True)  # 최초 빌드를 측정하기 위해 이전 인덱스/캐시 삭제
+    else:
+        work_dir = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    try:
+        results = run_benchmark(args, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results["config"] = {
+        key: getattr(args, key)
+        for key in (
+            "docs", "pages", "questions", "concurrency", "llm_latency", "token_latency", "answer_tokens",
+            "embed_latency", "embed_text_latency", "slack_latency", "stream_interval", "answer_cache",
+        )
+    }
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 기준선 저장: {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n❌ 성능 회귀 {len(regressions)}건: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ 기준선 대비 성능 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
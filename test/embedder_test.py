@@ -0,0 +1,90 @@
+"""
+임베딩 스케줄러 로컬 테스트 도구
+
+API 호출 없이 가짜 임베딩 모델(지연 + 429 오류 흉내)로 EmbeddingScheduler를 실행하여
+배치/동시성/재시도 동작과 소요 시간을 확인합니다.
+잘못된 API 키(401) 같은 재시도할 수 없는 오류는 재시도 없이 바로 실패하는지도 확인합니다.
+
+실행:
+    python test/embedder_test.py
+    python -m pytest test/embedder_test.py -q
+    python test/embedder_test.py --chunks 2000 --batch-size 32 --concurrency 8 --rate-limit 0.2
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+# 상위 폴더의 모듈을 import 하기 위한 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from core.embedder import EmbeddingScheduler
+from fakes import FakeEmbeddings, FakeAuthenticationError
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+
+def test_non_retryable_error_raises_immediately():
+    fake = FakeEmbeddings(error=FakeAuthenticationError("Incorrect API key provided"))
+    scheduler = EmbeddingScheduler(fake, batch_size=8, max_retries=6, base_backoff=1.0)
+    texts = [f"청크 {i}" for i in range(20)]
+
+    t0 = time.time()
+    try:
+        list(scheduler.embed(texts))
+    except FakeAuthenticationError:
+        pass
+    else:
+        raise AssertionError("401 오류가 전달되지 않았습니다")
+    elapsed = time.time() - t0
+
+    assert scheduler.retries == 0, f"재시도하면 안 되는 오류를 {scheduler.retries}회 재시도했습니다"
+    assert elapsed < 1.0, f"실패까지 {elapsed:.2f}초 (백오프 대기 발생)"
+    print(f"✅ 401 오류: 재시도 없이 {elapsed:.3f}초 만에 실패 (API 요청 {fake.calls}회)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 스케줄러 로컬 테스트")
+    parser.add_argument("--chunks", type=int, default=500, help="임베딩할 청크 수")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="분당 토큰 예산")
+    parser.add_argument("--latency", type=float, default=0.2, help="요청 1회당 지연 (초)")
+    parser.add_argument("--rate-limit", type=float, default=0.1, help="429 오류 확률 (0~1)")
+    args = parser.parse_args()
+
+    fake = FakeEmbeddings(latency=args.latency, rate_limit_rate=args.rate_limit)
+    scheduler = EmbeddingScheduler(
+        fake,
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+        tokens_per_minute=args.tpm,
+        base_backoff=0.05,  # 재시도 대기를 짧게 (테스트용)
+    )
+
+    texts = [f"[출처: 테스트.pdf]\n코칭스터디 {i}기 운영 결과 요약 {i * 7 % 13}" for i in range(args.chunks)]
+
+    t0 = time.time()
+    received = []
+    for start, vectors in scheduler.embed(texts):
+        assert start == len(received), "배치가 입력 순서대로 도착하지 않았습니다"
+        received.extend(vectors)
+    elapsed = time.time() - t0
+
+    expected = [fake._vector(t) for t in texts]
+    print("\n" + "=" * 60)
+    print(f"  청크 {len(received)}개 / 순서·값 일치: {received == expected}")
+    print(f"  API 요청 {fake.calls}회 (429 {fake.rate_limited}회, 재시도 {scheduler.retries}회)")
+    print(f"  소요 시간: {elapsed:.2f}초 ({len(texts) / elapsed:,.0f} 청크/초)")
+    print("=" * 60)
+
+    test_non_retryable_error_raises_immediately()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+검색 품질 / 지연 시간 평가 도구
+
+정답 출처(파일 / 쪽)가 표시된 골든 질문 세트로 청크 크기 / 겹침 / Top-K 조합별 검색 성능을 비교합니다.
+- recall@k: 상위 k개 청크에 정답 출처가 포함된 질문 비율
+- MRR: 정답 출처가 처음 나온 순위의 역수 평균 (없으면 0)
+- 컨텍스트 토큰: 프롬프트의 "참고 문서" 블록 평균 토큰 수 (겹침 제거 후, 토큰 예산 적용 전)
+- 검색 지연 시간: 질의 임베딩을 제외한 하이브리드 검색 시간 (p50 / p95)
+
+청크 설정마다 인덱스를 cache/eval/ 아래에 따로 만들어 재사용하고, 임베딩은 디스크 캐시(cache/embeddings.sqlite3)를
+공유하므로 같은 청크 / 질문은 다시 임베딩하지 않습니다. Top-K는 같은 인덱스에서 검색 개수만 바꿔 측정합니다.
+
+골든 세트 (JSONL, 한 줄에 질문 1개):
+    {"question": "코칭스터디 17기 수료율은?", "source": "코칭스터디 17기 운영보고서.pdf", "page": 3}
+    - page: PDF 뷰어 기준 쪽 번호 (1부터), 여러 쪽이면 "pages": [3, 4], 생략하면 파일만 비교
+
+라우터 평가 (--routing): 경로 라벨이 있는 질문 세트로 규칙 단계의 정확도와, 중심점 단계의 임계값
+(CENTROID_MIN_SIMILARITY / CENTROID_MIN_MARGIN) 조합별 처리 비율(coverage)과 정확도를 측정합니다.
+    {"question": "문서 목록 좀 보여줘", "route": "meta"}     # test/routing_golden.jsonl
+
+실행:
+    python test/eval_test.py --golden golden.jsonl
+    python test/eval_test.py --golden golden.jsonl --chunk-sizes 300 500 800 --overlaps 0 100 --top-k 3 5 10
+    python test/eval_test.py --golden golden.jsonl --output eval.json
+    python test/eval_test.py --synthetic      # API 없이 가짜 문서 / 임베딩으로 도구 동작 확인
+    python test/eval_test.py --routing test/routing_golden.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+from pathlib import Path
+
+# 상위 폴더의 모듈을 import 하기 위한 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from core.rag import RAG, CACHE_DIR, DATA_DIR, EMBEDDING_CACHE_MAX_ENTRIES, chunk_records
+from core.context import pack_context
+from core.cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache
+from core.router import (
+    ROUTES, CENTROID_MIN_SIMILARITY, CENTROID_MIN_MARGIN, CentroidRouter, classify_by_rules,
+)
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+
+RECALL_TOLERANCE = 0.02  # 최고 recall에서 이만큼 이내면 같은 품질로 보고 컨텍스트가 가장 작은 설정 추천
+ROUTING_MIN_ACCURACY = 0.95  # 중심점 단계가 확정한 질문의 최소 정확도 (이 이상인 임계값 중 처리 비율이 가장 높은 것 추천)
+SIMILARITY_GRID = [0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5]
+MARGIN_GRID = [0.02, 0.04, 0.06, 0.08, 0.1, 0.12, 0.15]
+
+
+def load_golden(path: Path) -> list[dict]:
+    golden = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "question" not in item or "source" not in item:
+                raise ValueError(f"{path}:{line_no} — question / source가 필요합니다")
+            pages = item.get("pages") or ([item["page"]] if "page" in item else [])
+            golden.append({"question": item["question"], "source": item["source"], "pages": set(pages)})
+    return golden
+
+
+def synthetic_golden(facts: list[dict]) -> list[dict]:
+    """가짜 문서의 사실로 골든 질문을 만듭니다 (같은 질문의 정답 쪽이 여러 개면 모두 정답)."""
+    by_question: dict[str, dict] = {}
+    for fact in facts:
+        question = f"{fact['program']} {fact['term']}기 {fact['topic']}은 얼마인가요?"
+        item = by_question.setdefault(question, {"question": question, "source": fact["source"], "pages": set()})
+        item["pages"].add(fact["page"])
+    return list(by_question.values())
+
+
+def is_match(chunk: dict, expected: dict) -> bool:
+    if chunk["source"] != expected["source"]:
+        return False
+    page = chunk["page"]
+    return not expected["pages"] or (isinstance(page, int) and page + 1 in expected["pages"])
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    # 검색은 1ms 안팎이라 로그 구간 근사(LogHistogram) 대신 정확한 분위수 사용
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# ── 평가 ──────────────────────────────────────────────
+def evaluate(rag: RAG, golden: list[dict], k: int) -> dict:
+    latencies = []
+    hits, reciprocal_ranks, context_tokens = 0, 0.0, 0
+    for item in golden:
+        vector = rag._embed_query(item["question"])  # 캐시됨 — 검색 시간에서 제외
+        t0 = time.perf_counter()
+        chunks = chunk_records(rag._retrieve(item["question"], k=k, query_vector=vector))
+        latencies.append(time.perf_counter() - t0)
+
+        rank = next((i for i, chunk in enumerate(chunks, 1) if is_match(chunk, item)), None)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1 / rank
+        context_tokens += pack_context(chunks, model_name=getattr(rag.llm, "model_name", None))[1]["tokens"]
+
+    n = len(golden)
+    latencies.sort()
+    return {
+        "recall": round(hits / n, 3),
+        "mrr": round(reciprocal_ranks / n, 3),
+        "context_tokens": round(context_tokens / n),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+    }
+
+
+def recommend(results: list[dict], tolerance: float) -> dict | None:
+    """최고 recall에서 tolerance 이내인 설정 중 평균 컨텍스트 토큰이 가장 작은 설정"""
+    if not results:
+        return None
+    best_recall = max(r["recall"] for r in results)
+    candidates = [r for r in results if r["recall"] >= best_recall - tolerance]
+    return min(candidates, key=lambda r: (r["context_tokens"], -r["mrr"]))
+
+
+def print_results(results: list[dict], recommended: dict | None, questions: int):
+    print("\n" + "=" * 92)
+    print(f"  검색 평가 결과 (골든 질문 {questions}개)")
+    print("=" * 92)
+    print(
+        f"  {'size':>6} {'overlap':>7} {'top_k':>5} {'chunks':>7} {'build_s':>8} "
+        f"{'recall':>7} {'mrr':>6} {'ctx_tok':>8} {'p50_ms':>8} {'p95_ms':>8}"
+    )
+    for r in results:
+        mark = "  ← 추천" if r is recommended else ""
+        print(
+            f"  {r['chunk_size']:>6} {r['chunk_overlap']:>7} {r['top_k']:>5} {r['chunks']:>7} {r['build_seconds']:>8.2f} "
+            f"{r['recall']:>7.3f} {r['mrr']:>6.3f} {r['context_tokens']:>8,} "
+            f"{r['latency_p50_ms']:>8.2f} {r['latency_p95_ms']:>8.2f}{mark}"
+        )
+    if recommended:
+        print(
+            f"\n  추천: CHUNK_SIZE={recommended['chunk_size']}, CHUNK_OVERLAP={recommended['chunk_overlap']}, "
+            f"TOP_K={recommended['top_k']} (최고 recall과의 차이 {RECALL_TOLERANCE:.0%} 이내에서 컨텍스트 최소)"
+        )
+
+
+# ── 라우터 평가 ──────────────────────────────────────
+def load_routing_golden(path: Path) -> list[dict]:
+    labeled = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item.get("route") not in ROUTES:
+                raise ValueError(f"{path}:{line_no} — route는 {', '.join(ROUTES)} 중 하나여야 합니다")
+            labeled.append({"question": item["question"], "route": item["route"]})
+    return labeled
+
+
+def evaluate_routing(query_cache: QueryEmbeddingCache, router: CentroidRouter, labeled: list[dict]) -> dict:
+    """규칙 단계 결과와, 규칙이 확정하지 못한 질문에 대한 임계값 조합별 중심점 단계 결과를 계산합니다."""
+    rule_decided = rule_correct = 0
+    rule_errors = []  # 규칙 단계는 LLM으로 넘기지 않으므로 오분류는 그대로 잘못된 경로가 됨
+    scored = []  # 규칙으로 확정되지 않은 질문의 (정답, 가장 가까운 라벨, 유사도, 차이)
+    for item in labeled:
+        rule_route = classify_by_rules(item["question"])
+        if rule_route is not None:
+            rule_decided += 1
+            if rule_route == item["route"]:
+                rule_correct += 1
+            else:
+                rule_errors.append({**item, "predicted": rule_route})
+            continue
+        vector, _ = query_cache.embed(item["question"])
+        scored.append((item["route"], *router.score(vector)))
+
+    grid = []
+    for min_similarity in SIMILARITY_GRID:
+        for min_margin in MARGIN_GRID:
+            decided = [(label, guess) for label, guess, best, margin in scored
+                       if best >= min_similarity and margin >= min_margin]
+            correct = sum(label == guess for label, guess in decided)
+            grid.append({
+                "min_similarity": min_similarity,
+                "min_margin": min_margin,
+                "coverage": round(len(decided) / len(scored), 3) if scored else 0.0,
+                "accuracy": round(correct / len(decided), 3) if decided else None,
+                "decided": len(decided),
+                "errors": len(decided) - correct,
+            })
+    return {
+        "questions": len(labeled),
+        "rule": {
+            "decided": rule_decided,
+            "accuracy": round(rule_correct / rule_decided, 3) if rule_decided else None,
+            "errors": rule_errors,
+        },
+        "centroid_candidates": len(scored),
+        "scores": [
+            {"route": label, "nearest": guess, "similarity": round(best, 3), "margin": round(margin, 3)}
+            for label, guess, best, margin in scored
+        ],
+        "grid": grid,
+    }
+
+
+def recommend_thresholds(grid: list[dict], min_accuracy: float) -> dict | None:
+    """정확도가 min_accuracy 이상인 임계값 중 처리 비율이 가장 높은 조합 (같으면 정확도가 높은 쪽)"""
+    candidates = [g for g in grid if g["accuracy"] is not None and g["accuracy"] >= min_accuracy]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda g: (g["coverage"], g["accuracy"], g["min_similarity"], g["min_margin"]))
+
+
+def print_routing_results(result: dict, recommended: dict | None):
+    print("\n" + "=" * 72)
+    print(f"  라우터 평가 결과 (라벨 질문 {result['questions']}개)")
+    print("=" * 72)
+    rule = result["rule"]
+    accuracy = f"{rule['accuracy']:.3f}" if rule["accuracy"] is not None else "-"
+    print(f"  rule: 확정 {rule['decided']}개 (정확도 {accuracy}) → 중심점 단계 대상 {result['centroid_candidates']}개")
+    for error in rule["errors"]:
+        print(f"    ❌ {error['question']} → {error['predicted']} (정답 {error['route']})")
+    print()
+    print(f"  {'min_sim':>8} {'min_margin':>10} {'coverage':>9} {'accuracy':>9} {'errors':>7}")
+    for g in result["grid"]:
+        marks = []
+        if g["min_similarity"] == CENTROID_MIN_SIMILARITY and g["min_margin"] == CENTROID_MIN_MARGIN:
+            marks.append("현재")
+        if g is recommended:
+            marks.append("추천")
+        accuracy = f"{g['accuracy']:.3f}" if g["accuracy"] is not None else "-"
+        mark = f"  ← {', '.join(marks)}" if marks else ""
+        print(f"  {g['min_similarity']:>8.2f} {g['min_margin']:>10.2f} {g['coverage']:>9.3f} {accuracy:>9} {g['errors']:>7}{mark}")
+    if recommended:
+        print(
+            f"\n  추천: CENTROID_MIN_SIMILARITY={recommended['min_similarity']}, "
+            f"CENTROID_MIN_MARGIN={recommended['min_margin']} "
+            f"(정확도 {ROUTING_MIN_ACCURACY:.0%} 이상에서 처리 비율 최대, 나머지는 LLM 분류)"
+        )
+    else:
+        print(f"\n  정확도 {ROUTING_MIN_ACCURACY:.0%} 이상인 임계값이 없습니다 → 중심점 단계를 끄거나 예시 질문을 보강하세요")
+
+
+def run_routing(args) -> dict:
+    """라벨 질문 세트로 라우터를 평가합니다 (질의 / 예시 임베딩은 디스크 캐시 사용)."""
+    labeled = load_routing_golden(args.routing)
+    if args.synthetic:
+        from fakes import FakeEmbeddings
+        work_dir = Path(tempfile.mkdtemp(prefix="rag-eval-"))
+        base, cache_path = FakeEmbeddings(), work_dir / "embeddings.sqlite3"
+    else:
+        from core.models import get_embeddings
+        work_dir = None
+        base, cache_path = get_embeddings(), CACHE_DIR / "embeddings.sqlite3"
+    try:
+        embeddings = CachedEmbeddings(base, EmbeddingCache(cache_path, max_entries=EMBEDDING_CACHE_MAX_ENTRIES))
+        query_cache = QueryEmbeddingCache(embeddings, disk=embeddings.cache)
+        result = evaluate_routing(query_cache, CentroidRouter(embeddings), labeled)
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    result["recommended"] = recommend_thresholds(result["grid"], ROUTING_MIN_ACCURACY)
+    print_routing_results(result, result["recommended"])
+    return result
+
+
+def main():
+    global RECALL_TOLERANCE
+    parser = argparse.ArgumentParser(description="청크 크기 / 겹침 / Top-K 조합별 검색 품질·지연 시간 평가")
+    parser.add_argument("--golden", type=Path, help="골든 질문 세트 (JSONL)")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="평가할 문서 폴더")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[300, 500, 800])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--tolerance", type=float, default=RECALL_TOLERANCE, help="추천 시 허용하는 recall 감소폭")
+    parser.add_argument("--synthetic", action="store_true", help="가짜 문서 / 골든 세트 / 임베딩 사용 (API 불필요)")
+    parser.add_argument("--routing", type=Path, help="경로 라벨 질문 세트 (JSONL) — 검색 대신 라우터 평가")
+    parser.add_argument("--output", type=Path, help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+    RECALL_TOLERANCE = args.tolerance
+
+    if args.routing:
+        result = run_routing(args)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 결과 저장: {args.output}")
+        return
+
+    work_dir = None
+    rag_kwargs = {}
+    if args.synthetic:
+        from core.models import MODEL_REGISTRY
+        from fakes import FakeChatModel, FakeEmbeddings
+        from bench_test import make_corpus
+
+        work_dir = Path(tempfile.mkdtemp(prefix="rag-eval-"))
+        data_dir, cache_dir = work_dir / "data", work_dir / "cache"
+        golden = synthetic_golden(make_corpus(data_dir, docs=8, pages=4))
+        MODEL_REGISTRY["fake-llm"] = (None, FakeChatModel)
+        rag_kwargs = {"model_name": "fake-llm", "embeddings": FakeEmbeddings()}
+    elif args.golden:
+        data_dir, cache_dir = args.data_dir, CACHE_DIR
+        golden = load_golden(args.golden)
+    else:
+        parser.error("--golden 또는 --synthetic 중 하나가 필요합니다")
+    if not golden:
+        parser.error("골든 질문이 없습니다")
+
+    results = []
+    try:
+        for chunk_size in args.chunk_sizes:
+            for overlap in args.overlaps:
+                if overlap >= chunk_size:
+                    continue
+                print(f"\n🔧 chunk_size={chunk_size}, chunk_overlap={overlap}")
+                t0 = time.perf_counter()
+                rag = RAG(
+                    data_dir=data_dir,
+                    index_dir=cache_dir / "eval" / f"index-{chunk_size}-{overlap}",
+                    cache_dir=cache_dir,
+                    chunk_size=chunk_size,
+                    chunk_overlap=overlap,
+                    **rag_kwargs,
+                )
+                build_seconds = round(time.perf_counter() - t0, 2)
+                for k in args.top_k:
+                    results.append({
+                        "chunk_size": chunk_size,
+                        "chunk_overlap": overlap,
+                        "top_k": k,
+                        "chunks": rag.vectorstore.index.ntotal,
+                        "build_seconds": build_seconds,
+                        **evaluate(rag, golden, k),
+                    })
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    recommended = recommend(results, args.tolerance)
+    print_results(results, recommended, len(golden))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"questions": len(golden), "results": results, "recommended": recommended}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+로컬 테스트용 가짜(Fake) 모델
+
+네트워크/API 키 없이 파이프라인을 실행해 볼 수 있도록 결정적(deterministic) 가짜 모델을 제공합니다.
+- FakeEmbeddings: 지연 시간과 Rate Limit(429) 오류를 흉내 내는 임베딩 모델
+- FakeChatModel: 분류 / 재작성 / 요약 / 답변 프롬프트에 맞는 응답을 지연 시간과 스트리밍으로 흉내 내는 LLM
+- FakeSlackClient: 메시지 게시/수정 API 지연을 흉내 내는 Slack WebClient
+- FakeSlackServer: WebClient(base_url=...)로 연결하는 로컬 가짜 Slack Web API 서버
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+
+
+class FakeRateLimitError(Exception):
+    """OpenAI RateLimitError를 흉내 내는 429 오류"""
+
+    status_code = 429
+
+
+class FakeAuthenticationError(Exception):
+    """OpenAI AuthenticationError(잘못된 API 키)를 흉내 내는 401 오류 — 재시도해도 성공하지 않음"""
+
+    status_code = 401
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    글자 2-gram 해싱으로 벡터를 만드는 가짜 임베딩 모델.
+    같은 텍스트는 항상 같은 벡터, 글자가 많이 겹치는 텍스트끼리는 유사도가 높습니다.
+
+    Args:
+        dim: 벡터 차원
+        latency: 요청 1회당 지연 시간 (초)
+        per_text_latency: 텍스트 1개당 추가 지연 시간 (초)
+        rate_limit_rate: 요청이 429 오류로 실패할 확률 (0~1)
+        seed: 오류 발생용 난수 시드
+        error: 지정하면 모든 요청이 이 오류로 실패 (예: FakeAuthenticationError)
+    """
+
+    def __init__(
+        self,
+        dim: int = 256,
+        latency: float = 0.0,
+        per_text_latency: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+        error: Exception | None = None,
+    ):
+        self.model = f"fake-embedding-{dim}"
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.rate_limit_rate = rate_limit_rate
+        self.error = error
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.rate_limited = 0
+
+    def _vector(self, text: str) -> list[float]:
+        vector = [0.0] * self.dim
+        for i in range(max(1, len(text) - 1)):
+            vector[zlib.crc32(text[i:i + 2].encode("utf-8")) % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _request(self, count: int):
+        time.sleep(self.latency + self.per_text_latency * count)
+        with self._lock:
+            self.calls += 1
+            if self.error is not None:
+                raise self.error
+            if self._random.random() < self.rate_limit_rate:
+                self.rate_limited += 1
+                raise FakeRateLimitError("Error code: 429 - Rate limit reached (fake)")
+            self.texts += count
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self._request(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self._request(1)
+        return self._vector(text)
+
+
+# ── 가짜 LLM ──────────────────────────────────────────
+GENERAL_KEYWORDS = ("안녕", "고마", "감사", "날씨", "파이썬", "코드")
+META_KEYWORDS = ("문서 목록", "몇 개", "무슨 모델", "어떤 모델", "청크")
+
+
+def fake_route(question: str) -> str:
+    """질문의 키워드로 경로를 정하는 결정적 분류 (가짜 LLM 분류기 응답)"""
+    if any(k in question for k in META_KEYWORDS):
+        return "meta"
+    if any(k in question for k in GENERAL_KEYWORDS):
+        return "general"
+    return "document"
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+def _section(text: str, title: str) -> str:
+    """"## 제목" 아래의 내용을 반환합니다 (다음 "## " 제목 전까지)."""
+    match = re.search(rf"## {title}\n(.*?)(?:\n\n## |\Z)", text, re.DOTALL)
+    return match.group(1).strip() if match else text.strip()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    프롬프트 종류를 알아보고 결정적인 응답을 돌려주는 가짜 LLM.
+    같은 프롬프트에는 항상 같은 응답, 토큰 사용량은 응답 메타데이터(usage_metadata)로 보고합니다.
+
+    Args:
+        model_name: 모델 이름 (trace / 캐시 키에 사용)
+        latency: 호출 1회당 첫 토큰까지의 지연 시간 (초)
+        token_latency: 출력 토큰 1개당 지연 시간 (초)
+        answer_tokens: 답변 프롬프트에 대한 응답 길이 (토큰 수)
+    """
+
+    model_name: str = "fake-llm"
+    latency: float = 0.0
+    token_latency: float = 0.0
+    answer_tokens: int = 80
+    calls: Counter = Field(default_factory=Counter)  # 프롬프트 종류 → 호출 수
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: list[BaseMessage]) -> tuple[str, str]:
+        """(프롬프트 종류, 응답 텍스트)"""
+        system = next((m.content for m in messages if m.type == "system"), "")
+        human = messages[-1].content if messages else ""
+        if "query rewriter and question classifier" in system:
+            question = _section(human, "후속 질문")
+            kind, text = "rewrite_route", json.dumps({"question": question, "route": fake_route(question)}, ensure_ascii=False)
+        elif "question classifier" in system:
+            kind, text = "classify", fake_route(human)
+        elif "query rewriter" in system:
+            kind, text = "rewrite", _section(human, "후속 질문")
+        elif "running summary" in system:
+            kind, text = "summary", "- " + " ".join(human.split()[:30])
+        else:
+            words = re.findall(r"\w+", human) or ["답변"]
+            rng = random.Random(zlib.crc32(human.encode("utf-8")))
+            kind, text = "answer", " ".join(rng.choice(words) for _ in range(self.answer_tokens))
+        with self._lock:
+            self.calls[kind] += 1
+        return kind, text
+
+    def _usage(self, messages: list[BaseMessage], text: str) -> dict:
+        prompt = sum(_approx_tokens(str(m.content)) for m in messages)
+        completion = _approx_tokens(text)
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        _, text = self._respond(messages)
+        time.sleep(self.latency + self.token_latency * len(text.split()))
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        _, text = self._respond(messages)
+        time.sleep(self.latency)
+        pieces = re.findall(r"\S+\s*", text)
+        for piece in pieces:
+            time.sleep(self.token_latency)
+            if run_manager:
+                run_manager.on_llm_new_token(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        # 마지막 청크에 토큰 사용량 (stream_usage=True인 OpenAI 응답과 같은 형태)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+
+# ── 가짜 Slack 클라이언트 ─────────────────────────────
+class FakeSlackClient:
+    """
+    chat_postMessage / chat_update / conversations_replies를 흉내 내는 Slack WebClient
+
+    Args:
+        latency: API 호출 1회당 지연 시간 (초)
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.calls: Counter = Counter()  # API 메서드 → 호출 수
+
+    def _call(self, method: str):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls[method] += 1
+            self._counter += 1
+            return f"{time.time():.0f}.{self._counter:06d}"
+
+    def chat_postMessage(self, channel: str, text: str = "", thread_ts: str | None = None, **kwargs) -> dict:
+        ts = self._call("chat.postMessage")
+        return {"ok": True, "channel": channel, "ts": ts, "message": {"text": text, "ts": ts}}
+
+    def chat_update(self, channel: str, ts: str, text: str = "", **kwargs) -> dict:
+        self._call("chat.update")
+        return {"ok": True, "channel": channel, "ts": ts, "text": text}
+
+    def conversations_replies(self, channel: str, ts: str, **kwargs) -> dict:
+        self._call("conversations.replies")
+        return {"ok": True, "messages": []}
+
+
+# ── 가짜 Slack 서버 ───────────────────────────────────
+class FakeSlackServer:
+    """
+    Slack Web API(auth.test / chat.postMessage / chat.update / conversations.replies)를 흉내 내는 로컬 HTTP 서버.
+    WebClient(base_url=server.url)로 연결하며, 대화(채널 + 스레드 ts)별로 메시지와 API 호출 수를 기록합니다.
+    wait_for_answer()로 봇 메시지가 최종 답변(is_final)이 될 때까지 기다릴 수 있습니다.
+
+    Args:
+        latency: API 호출 1회당 지연 시간 (초)
+        is_final: 봇 메시지 텍스트가 최종 답변인지 판단하는 함수 (기본: 항상 최종)
+        port: 서버 포트 (0이면 빈 포트 자동 선택)
+    """
+
+    BOT_USER_ID = "UFAKEBOT"
+    BOT_ID = "BFAKEBOT"
+    TEAM_ID = "TFAKE"
+
+    def __init__(self, latency: float = 0.0, is_final: Callable[[str], bool] | None = None, port: int = 0):
+        self.latency = latency
+        self.is_final = is_final or (lambda text: True)
+        self._cond = threading.Condition()
+        self._counter = 0
+        self._conversations: dict[tuple[str, str], dict] = {}  # (채널, 스레드 ts 또는 "") → 기록
+        self._owners: dict[tuple[str, str], tuple[str, str]] = {}  # (채널, 메시지 ts) → 대화 키
+        self.calls: Counter = Counter()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                parsed = urlparse(self.path)
+                params = dict(parse_qsl(parsed.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    raw = self.rfile.read(length).decode("utf-8")
+                    if "json" in (self.headers.get("Content-Type") or ""):
+                        params.update(json.loads(raw))
+                    else:
+                        params.update(parse_qsl(raw))
+                time.sleep(server.latency)
+                body = json.dumps(server.handle(parsed.path.rsplit("/", 1)[-1], params)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/api/"
+        threading.Thread(target=self._server.serve_forever, name="fake-slack", daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def next_ts(self) -> str:
+        """중복 없는 메시지 ts (사용자 메시지 ts 발급에도 사용)"""
+        with self._cond:
+            self._counter += 1
+            return f"{int(time.time())}.{self._counter:06d}"
+
+    def _conversation(self, key: tuple[str, str]) -> dict:
+        return self._conversations.setdefault(key, {"messages": [], "calls": Counter(), "first": None, "final": None})
+
+    def _add_message(self, key: tuple[str, str], message: dict):
+        self._conversation(key)["messages"].append(message)
+        self._owners[(key[0], message["ts"])] = key
+
+    def add_user_message(self, channel: str, ts: str, text: str, user: str, thread_ts: str | None = None):
+        """
+        사용자가 보낸 메시지를 대화에 기록합니다 (conversations.replies 응답에 포함).
+        스레드를 시작하는 메시지는 thread_ts=ts, DM처럼 스레드가 없으면 thread_ts=None
+        """
+        with self._cond:
+            key = (channel, thread_ts or "")
+            self._add_message(key, {"type": "message", "user": user, "text": text, "ts": ts, "thread_ts": thread_ts})
+
+    def thread_messages(self, channel: str, thread_ts: str = "") -> list[dict]:
+        """대화 1개의 메시지 목록 (봇 메시지는 마지막으로 수정된 텍스트)"""
+        with self._cond:
+            return [dict(message) for message in self._conversation((channel, thread_ts))["messages"]]
+
+    def start_turn(self, channel: str, thread_ts: str = ""):
+        """
+        같은 스레드에 후속 질문을 보내기 전에 호출하여, 대화의 API 호출 수와 첫 메시지 / 최종 답변 기록을
+        비웁니다 (메시지는 유지). 이후 wait_for_answer() 등은 새 질문에 대한 값만 반영합니다.
+        """
+        with self._cond:
+            conversation = self._conversation((channel, thread_ts))
+            conversation.update(calls=Counter(), first=None, final=None)
+
+    def handle(self, method: str, params: dict) -> dict:
+        with self._cond:
+            self.calls[method] += 1
+            if method == "auth.test":
+                return {
+                    "ok": True, "url": "https://fake.slack.com/", "team": "fake", "user": "gpt",
+                    "team_id": self.TEAM_ID, "user_id": self.BOT_USER_ID, "bot_id": self.BOT_ID,
+                }
+            channel = params.get("channel", "")
+            if method == "chat.postMessage":
+                self._counter += 1
+                ts = f"{int(time.time())}.{self._counter:06d}"
+                key = (channel, params.get("thread_ts") or "")
+                message = {
+                    "type": "message", "user": self.BOT_USER_ID, "bot_id": self.BOT_ID,
+                    "text": params.get("text", ""), "ts": ts,
+                }
+                self._add_message(key, message)
+                self._record(key, method, message["text"])
+                return {"ok": True, "channel": channel, "ts": ts, "message": message}
+            if method == "chat.update":
+                key = self._owners.get((channel, params.get("ts", "")))
+                if key is None:
+                    return {"ok": False, "error": "message_not_found"}
+                for message in self._conversations[key]["messages"]:
+                    if message["ts"] == params["ts"]:
+                        message["text"] = params.get("text", "")
+                self._record(key, method, params.get("text", ""))
+                return {"ok": True, "channel": channel, "ts": params["ts"], "text": params.get("text", "")}
+            if method == "conversations.replies":
+                key = (channel, params.get("ts", ""))
+                conversation = self._conversation(key)
+                conversation["calls"][method] += 1
+                return {"ok": True, "messages": list(conversation["messages"]), "has_more": False}
+            return {"ok": False, "error": "unknown_method"}
+
+    def _record(self, key: tuple[str, str], method: str, text: str):
+        conversation = self._conversation(key)
+        conversation["calls"][method] += 1
+        if conversation["first"] is None:
+            conversation["first"] = time.time()
+        if conversation["final"] is None and self.is_final(text):
+            conversation["final"] = (time.time(), text)
+            self._cond.notify_all()
+
+    def wait_for_answer(self, channel: str, thread_ts: str = "", timeout: float = 60.0) -> tuple[float, str] | None:
+        """대화의 봇 메시지가 최종 답변이 될 때까지 기다려 (시각, 텍스트)를 반환합니다. 시간 초과 시 None."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._conversation((channel, thread_ts))["final"] is not None, timeout)
+            return self._conversation((channel, thread_ts))["final"]
+
+    def calls_for(self, channel: str, thread_ts: str = "") -> Counter:
+        """대화 1개에서 호출된 API 메서드별 횟수"""
+        with self._cond:
+            return Counter(self._conversation((channel, thread_ts))["calls"])
+
+    def first_reply_at(self, channel: str, thread_ts: str = "") -> float | None:
+        """대화에 봇이 처음 메시지를 게시/수정한 시각 ("검색 중" 메시지 등)"""
+        with self._cond:
+            return self._conversation((channel, thread_ts))["first"]
@@ -0,0 +1,120 @@
+"""
+인덱스 증분 업데이트 확인
+
+임시 data/ 폴더에 가짜 PDF로 인덱스를 빌드한 뒤 문서를 추가 / 변경 / 삭제하고 RAG를 다시 만들어,
+- 바뀐 문서의 벡터만 교체되고 변경 없는 문서의 벡터 ID는 유지되는지
+- FAISS 인덱스, 키워드 인덱스(index/keyword.json), 매니페스트의 벡터 ID가 서로 일치하는지
+- 증분 업데이트 결과의 청크가 처음부터 빌드한 결과와 같은지
+확인합니다. OpenAI API는 호출하지 않습니다 (가짜 LLM / 임베딩).
+
+실행:
+    python -m pytest test/index_test.py -q
+    python test/index_test.py
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+# 상위 폴더의 모듈을 import 하기 위한 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.rag as rag_module
+from core.rag import RAG
+from core.models import MODEL_REGISTRY
+from fakes import FakeChatModel, FakeEmbeddings
+from bench_test import FAKE_MODEL, make_corpus
+
+
+def build(work_dir: Path, data_dir: Path, name: str = "index") -> RAG:
+    """data_dir 문서로 RAG를 만듭니다 (work_dir/<name>에 인덱스가 있으면 로드 후 증분 업데이트)."""
+    MODEL_REGISTRY[FAKE_MODEL] = (None, lambda: FakeChatModel(model_name=FAKE_MODEL))
+    rag_module.LOG_DIR = work_dir / "logs"
+    return RAG(
+        FAKE_MODEL, data_dir=data_dir, index_dir=work_dir / name, cache_dir=work_dir / "cache", embeddings=FakeEmbeddings()
+    )
+
+
+def check_ids(rag: RAG, expected_files: set[str]) -> dict[str, list[str]]:
+    """FAISS / 키워드 인덱스 / 매니페스트의 벡터 ID가 일치하는지 확인하고 파일별 ID 목록을 반환합니다."""
+    manifest = rag._read_manifest()
+    assert set(manifest) == expected_files, f"매니페스트 문서 {sorted(manifest)} ≠ {sorted(expected_files)}"
+
+    manifest_ids = [vid for entry in manifest.values() for vid in entry["ids"]]
+    faiss_ids = list(rag.vectorstore.index_to_docstore_id.values())
+    with open(rag.keyword_file, "r", encoding="utf-8") as f:
+        keyword_ids = list(json.load(f)["docs"])
+
+    assert len(set(manifest_ids)) == len(manifest_ids), "매니페스트에 중복된 벡터 ID"
+    assert rag.vectorstore.index.ntotal == len(faiss_ids) == len(manifest_ids)
+    assert set(faiss_ids) == set(manifest_ids), "FAISS와 매니페스트의 벡터 ID가 다릅니다"
+    assert set(keyword_ids) == set(manifest_ids), "keyword.json과 매니페스트의 벡터 ID가 다릅니다"
+    assert set(rag.keyword_index.docs) == set(manifest_ids), "메모리 키워드 인덱스와 매니페스트의 벡터 ID가 다릅니다"
+
+    # 매니페스트에 기록된 파일과 청크의 출처가 같은지
+    for name, entry in manifest.items():
+        for vid in entry["ids"]:
+            assert Path(rag.vectorstore.docstore.search(vid).metadata["source"]).name == name
+    return {name: entry["ids"] for name, entry in manifest.items()}
+
+
+def chunk_texts(rag: RAG) -> list[str]:
+    return sorted(rag.vectorstore.docstore.search(vid).page_content for vid in rag.vectorstore.index_to_docstore_id.values())
+
+
+def bump_mtime(path: Path):
+    """파일 크기가 같아도 수정으로 감지되도록 수정 시간을 뒤로 옮김"""
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_incremental_update_keeps_ids_in_sync():
+    work_dir = Path(tempfile.mkdtemp(prefix="rag-index-"))
+    try:
+        source_dir, data_dir = work_dir / "source", work_dir / "data"
+        make_corpus(source_dir, docs=4, pages=2)
+        data_dir.mkdir()
+        for name in ("report_001.pdf", "report_002.pdf", "report_003.pdf"):
+            shutil.copy(source_dir / name, data_dir / name)
+
+        rag = build(work_dir, data_dir)
+        initial = check_ids(rag, {"report_001.pdf", "report_002.pdf", "report_003.pdf"})
+        print(f"✅ 빌드: 문서 {len(initial)}개, 벡터 {rag.vectorstore.index.ntotal}개")
+
+        # 1. 추가: 기존 문서의 벡터 ID는 그대로
+        shutil.copy(source_dir / "report_004.pdf", data_dir / "report_004.pdf")
+        rag = build(work_dir, data_dir)
+        added = check_ids(rag, {"report_001.pdf", "report_002.pdf", "report_003.pdf", "report_004.pdf"})
+        assert all(added[name] == initial[name] for name in initial), "추가 시 기존 문서의 벡터 ID가 바뀌었습니다"
+        print(f"✅ 추가: 벡터 {rag.vectorstore.index.ntotal}개 (새 문서 {len(added['report_004.pdf'])}개)")
+
+        # 2. 변경: 바뀐 문서만 새 ID, 이전 ID는 FAISS / 키워드 인덱스에서 제거
+        shutil.copy(source_dir / "report_004.pdf", data_dir / "report_002.pdf")
+        bump_mtime(data_dir / "report_002.pdf")
+        rag = build(work_dir, data_dir)
+        modified = check_ids(rag, set(added))
+        assert not set(modified["report_002.pdf"]) & set(added["report_002.pdf"]), "변경된 문서의 벡터 ID가 재사용되었습니다"
+        assert all(modified[name] == added[name] for name in added if name != "report_002.pdf")
+        print(f"✅ 변경: 벡터 {rag.vectorstore.index.ntotal}개")
+
+        # 3. 삭제
+        (data_dir / "report_003.pdf").unlink()
+        rag = build(work_dir, data_dir)
+        removed = check_ids(rag, {"report_001.pdf", "report_002.pdf", "report_004.pdf"})
+        assert all(removed[name] == modified[name] for name in removed)
+        print(f"✅ 삭제: 벡터 {rag.vectorstore.index.ntotal}개")
+
+        # 4. 처음부터 빌드한 인덱스와 청크 내용이 같은지
+        fresh = build(work_dir, data_dir, name="index-fresh")
+        check_ids(fresh, set(removed))
+        assert chunk_texts(rag) == chunk_texts(fresh), "증분 업데이트 결과가 전체 빌드와 다릅니다"
+        print(f"✅ 전체 빌드와 청크 {len(chunk_texts(fresh))}개 일치")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_incremental_update_keeps_ids_in_sync()
@@ -0,0 +1,126 @@
+"""
+하이브리드 검색 확인 (키워드 인덱스 + RRF)
+
+- tokenize: 한글 글자 2-gram, 숫자 / 영문 단어, 숫자+단위("17기", "85%") 토큰
+- KeywordIndex: 숫자+단위 질문의 BM25 순위, 삭제 / 저장 / 로드 후 결과 유지
+- reciprocal_rank_fusion: 두 검색 결과에 모두 나온 ID가 앞서는 순서와 점수
+- RAG._retrieve: 벡터 / 키워드 후보를 RRF로 합친 순서, 키워드 검색에서만 나온 청크의 거리(None)
+
+실행:
+    python -m pytest test/keyword_test.py -q
+    python test/keyword_test.py
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# 상위 폴더의 모듈을 import 하기 위한 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.rag as rag_module
+from core.rag import RRF_K
+from core.keyword import KeywordIndex, tokenize, reciprocal_rank_fusion
+from bench_test import make_corpus
+from index_test import build
+
+DOCS = {
+    "a": "코칭스터디 17기 수료율은 85%입니다.",
+    "b": "코칭스터디 7기 수료율은 70%였습니다.",
+    "c": "2024년 여름방학 특강 안내",
+}
+
+
+def test_tokenize_bigrams_and_number_units():
+    assert tokenize("17기 수료율은 85%") == ["17", "기", "수료", "료율", "율은", "85", "17기", "85%"]
+    # 전각 문자 / 대문자 정규화, 소수 + 단위
+    assert tokenize("ＧＰＴ 평점 3.5점, 2024년 여름") == ["gpt", "평점", "3.5", "점", "2024", "년", "여름", "3.5점", "2024년"]
+    # 조사가 붙어도 2-gram이 겹쳐 매칭
+    assert set(tokenize("수료율")) <= set(tokenize("수료율은"))
+    print("✅ 토큰화: 2-gram / 숫자+단위")
+
+
+def test_keyword_search_number_units():
+    index = KeywordIndex()
+    index.add(list(DOCS), list(DOCS.values()))
+
+    assert index.search("17기 수료율", k=3)[0][0] == "a"
+    assert index.search("7기 수료율", k=3)[0][0] == "b"  # "17기"의 "7기"와 섞이지 않음
+    assert [vid for vid, _ in index.search("2024년 여름", k=3)] == ["c"]
+    print("✅ BM25: 숫자+단위 질문이 해당 청크를 1위로 검색")
+
+
+def test_keyword_index_delete_and_reload():
+    work_dir = Path(tempfile.mkdtemp(prefix="rag-keyword-"))
+    try:
+        index = KeywordIndex()
+        index.add(list(DOCS), list(DOCS.values()))
+        index.delete(["a"])
+        assert "a" not in index.docs
+        assert all("a" not in posting for posting in index.postings.values()), "삭제한 ID가 역색인에 남아 있습니다"
+        assert "17기" not in index.postings
+
+        index.save(work_dir / "keyword.json")
+        loaded = KeywordIndex.load(work_dir / "keyword.json")
+        assert loaded.docs == index.docs and loaded.total_len == index.total_len
+        for query in ("수료율", "7기", "여름방학"):
+            assert loaded.search(query, k=3) == index.search(query, k=3)
+        print("✅ 삭제 / 저장 / 로드 후 검색 결과 동일")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_rrf_ordering():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+    # 두 결과에 모두 나온 c가 한쪽 1위(a)보다 앞서고, 같은 점수(b, d)는 먼저 나온 순서 유지
+    assert [vid for vid, _ in fused] == ["c", "a", "b", "d"]
+    assert abs(fused[0][1] - (1 / 63 + 1 / 61)) < 1e-12
+    assert abs(fused[2][1] - fused[3][1]) < 1e-12
+    print("✅ RRF: 순서 / 점수")
+
+
+def test_retrieve_fuses_dense_and_keyword():
+    work_dir = Path(tempfile.mkdtemp(prefix="rag-hybrid-"))
+    candidates = rag_module.HYBRID_CANDIDATES
+    # 후보 수를 청크 수보다 작게 하여 키워드 검색에서만 나온 청크가 결과에 섞이게 함
+    rag_module.HYBRID_CANDIDATES = 4
+    try:
+        facts = make_corpus(work_dir / "data", docs=6, pages=3)
+        rag = build(work_dir, work_dir / "data")
+
+        keyword_only = 0
+        for fact in facts[::7]:
+            query = f"{fact['program']} {fact['term']}기 {fact['topic']}"
+            vector = rag._embed_query(query)
+            dense = rag.vectorstore.similarity_search_with_score_by_vector(vector, k=rag_module.HYBRID_CANDIDATES)
+            keyword = rag.keyword_index.search(query, k=rag_module.HYBRID_CANDIDATES)
+            expected = reciprocal_rank_fusion([[doc.id for doc, _ in dense], [vid for vid, _ in keyword]], k=RRF_K)[:5]
+
+            results = rag._retrieve(query, k=5, query_vector=vector)
+            assert [(doc.id, score) for doc, _, score in results] == expected
+            assert [score for _, _, score in results] == sorted((score for _, _, score in results), reverse=True)
+            dense_ids = {doc.id for doc, _ in dense}
+            for doc, distance, _ in results:
+                assert (distance is None) == (doc.id not in dense_ids), "벡터 후보 여부와 거리 값이 맞지 않습니다"
+                keyword_only += distance is None
+            # 기수("17기")는 키워드 검색이 잡아 주므로 정답 문서가 상위 결과에 포함
+            assert fact["source"] in {Path(doc.metadata["source"]).name for doc, _, _ in results}, query
+        assert keyword_only, "키워드 검색에서만 나온 청크가 없어 docstore 조회 경로를 확인하지 못했습니다"
+        print(f"✅ 하이브리드 검색: 질문 {len(facts[::7])}개의 RRF 순서 / 정답 문서 포함 (키워드 전용 청크 {keyword_only}개)")
+    finally:
+        rag_module.HYBRID_CANDIDATES = candidates
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    test_tokenize_bigrams_and_number_units()
+    test_keyword_search_number_units()
+    test_keyword_index_delete_and_reload()
+    test_rrf_ordering()
+    test_retrieve_fuses_dense_and_keyword()
+
+
+if __name__ == "__main__":
+    main()
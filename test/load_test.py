@@ -0,0 +1,351 @@
+"""
+부하 테스트 도구
+
+가짜 Slack 서버(test/fakes.py)와 가짜 LLM/임베딩으로 app.py를 그대로 실행하고,
+app_mention / DM 이벤트를 Bolt 앱에 직접 넣어(Socket Mode와 같은 경로) 동시 요청 수를 단계적으로 늘립니다.
+동시 요청 수별로 처리량, 이벤트 응답(ack) 시간, 질문 → 최종 답변까지의 지연 시간 분위수,
+답변 1건당 Slack API 호출 수, 거절(요청 큐 가득 참) / 오류 / 시간 초과 비율을 보고합니다.
+
+--mention-only-ratio 비율의 가상 사용자는 message 이벤트 없이 app_mention만 보내며(message.channels 미구독),
+질문을 한 스레드에 이어서 하고 질문 사이에 멘션 없는 답글이 달립니다. 답변마다 앱이 받은 스레드 히스토리가
+가짜 Slack 서버의 대화와 일치하는지 확인하고, 누락된 히스토리가 있으면 실패(종료 코드 1)합니다.
+
+실행:
+    python test/load_test.py
+    python test/load_test.py --concurrency 1 5 10 20 40 --requests 5 --llm-latency 0.5 --workers 8
+    python test/load_test.py --dm-ratio 0.5 --json
+    python test/load_test.py --concurrency 4 --mention-only-ratio 1.0
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+
+# 상위 폴더의 모듈을 import 하기 위한 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from slack_bolt.request import BoltRequest
+
+import core.rag as rag_module
+import core.router as router_module
+import core.models as models_module
+from core.streaming import CURSOR
+from core.dedup import EventDeduplicator
+from core.analytics import LogHistogram
+from core.memory import MAX_TURNS, _to_history_message, _ts_key
+from fakes import FakeChatModel, FakeEmbeddings, FakeSlackServer
+from bench_test import make_corpus, make_questions
+
+ACK_TIMEOUT = 3.0              # Slack이 이벤트를 재전송하기 시작하는 ack 제한 시간 (초)
+LOADING_PREFIX = "문서를 검색 중입니다"  # app.py의 "검색 중" 메시지
+
+
+def is_final_answer(text: str) -> bool:
+    """봇 메시지가 "검색 중" / 스트리밍 중이 아닌 최종 메시지인지"""
+    return not text.startswith(LOADING_PREFIX) and not text.endswith(CURSOR)
+
+
+# ── 환경 준비 (app.py import 전에 가짜 백엔드 연결) ──
+def load_app(args, work_dir: Path, server: FakeSlackServer):
+    os.environ["SLACK_BOT_TOKEN"] = "xoxb-load-test"
+    os.environ["SLACK_API_URL"] = server.url
+    os.environ["WORKER_COUNT"] = str(args.workers)
+    os.environ.pop("METRICS_PORT", None)
+
+    data_dir = work_dir / "data"
+    print(f"📄 가짜 문서 생성: {args.docs}개 × {args.pages}쪽")
+    make_corpus(data_dir, args.docs, args.pages)
+    rag_module.DATA_DIR = router_module.DATA_DIR = data_dir
+    rag_module.INDEX_DIR = work_dir / "index"
+    rag_module.CACHE_DIR = work_dir / "cache"
+    rag_module.LOG_DIR = work_dir / "logs"
+
+    # 기본 모델 이름에 가짜 LLM을 등록 (app.py의 get_llm() / 사용자별 모델 선택이 그대로 동작)
+    llm = FakeChatModel(
+        model_name=models_module.DEFAULT_MODEL,
+        latency=args.llm_latency,
+        token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens,
+    )
+    models_module.MODEL_REGISTRY[models_module.DEFAULT_MODEL] = (None, lambda: llm)
+    models_module._instances.clear()
+    embeddings = FakeEmbeddings(latency=args.embed_latency)
+    rag_module.get_embeddings = lambda: embeddings
+    rag_module.ANSWER_CACHE_ENABLED = args.answer_cache
+
+    import app as app_module
+
+    # 요청별 로그는 끄고, 처리한 이벤트는 파일(cache/seen_events.json)에 남기지 않음
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    app_module.deduplicator = EventDeduplicator(ttl=app_module.EVENT_DEDUP_TTL)
+    app_module.STREAM_UPDATE_INTERVAL = args.stream_interval
+    return app_module
+
+
+# ── 이벤트 전송 ───────────────────────────────────────
+class LoadGenerator:
+    """
+    가상 사용자마다 이벤트 1건을 보내고 최종 답변을 받은 뒤 다음 이벤트를 보냅니다 (closed loop).
+    앱의 스레드 히스토리 조회(thread_store.get) 결과를 질문별로 기록하여 가짜 Slack 서버의 대화와 비교합니다.
+    """
+
+    def __init__(
+        self,
+        app_module,
+        server: FakeSlackServer,
+        questions: list,
+        timeout: float,
+        dm_ratio: float,
+        mention_only_ratio: float = 0.0,
+    ):
+        self.app = app_module.app
+        self.busy_messages = set(app_module.BUSY_MESSAGES.values())
+        self.server = server
+        self.questions = questions
+        self.timeout = timeout
+        self.dm_ratio = dm_ratio
+        self.mention_only_ratio = mention_only_ratio
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._histories: dict[tuple[str, str], tuple[list[dict], int]] = {}  # (채널, 질문 ts) → (히스토리, max_turns)
+
+        store_get = app_module.thread_store.get
+
+        def recording_get(client, channel, thread_ts, current_ts, max_turns=MAX_TURNS):
+            history, status = store_get(client, channel, thread_ts, current_ts, max_turns=max_turns)
+            with self._lock:
+                self._histories[(channel, current_ts)] = ([dict(m) for m in history], max_turns)
+            return history, status
+
+        app_module.thread_store.get = recording_get
+
+    def _next_seq(self) -> int:
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def send(self, user: str, question: str, dm: bool, mention_only: bool = False, thread_ts: str | None = None) -> dict:
+        """
+        질문 1건을 보내고 결과를 반환합니다.
+        mention_only=True: message 이벤트 없이 app_mention만 보냄 / thread_ts: 기존 스레드에 후속 질문으로 보냄
+        """
+        seq = self._next_seq()
+        ts = self.server.next_ts()
+        if dm:
+            channel, thread_ts = f"D{seq:06d}", None  # DM은 요청마다 별도 채널 (답변 구분용)
+            event = {"type": "message", "channel_type": "im", "user": user, "text": question, "ts": ts, "channel": channel}
+        else:
+            channel = f"C{user[1:]}"
+            text = f"<@{FakeSlackServer.BOT_USER_ID}> {question}"
+            event = {"type": "app_mention", "user": user, "text": text, "ts": ts, "channel": channel, "event_ts": ts}
+            if thread_ts:
+                event["thread_ts"] = thread_ts
+                self.server.start_turn(channel, thread_ts)
+            else:
+                thread_ts = ts
+        self.server.add_user_message(channel, ts, event["text"], user, thread_ts=thread_ts)
+        body = {
+            "token": "load-test",
+            "team_id": FakeSlackServer.TEAM_ID,
+            "api_app_id": "AFAKE",
+            "type": "event_callback",
+            "event_id": f"Ev{seq:08d}",
+            "event_time": int(time.time()),
+            "event": event,
+        }
+
+        started = time.time()
+        if not dm and not mention_only:
+            # message.channels 구독 시 Slack은 멘션 메시지를 message 이벤트로도 보냄 (스레드 히스토리 캐시 조건)
+            message_event = {**event, "type": "message", "channel_type": "channel"}
+            self.app.dispatch(BoltRequest(body={**body, "event_id": f"Evm{seq:08d}", "event": message_event}, mode="socket_mode"))
+        response = self.app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+        ack = time.time() - started
+        if response.status != 200:
+            return {"status": "error", "ack": ack, "calls": Counter(), "thread_ts": thread_ts}
+
+        final = self.server.wait_for_answer(channel, thread_ts or "", timeout=self.timeout)
+        result = {"ack": ack, "calls": self.server.calls_for(channel, thread_ts or ""), "thread_ts": thread_ts}
+        first = self.server.first_reply_at(channel, thread_ts or "")
+        if first is not None:
+            result["first_reply"] = first - started
+        if final is None:
+            result["status"] = "timeout"
+        elif final[1] in self.busy_messages:
+            result["status"] = "busy"
+        elif final[1].startswith("답변 생성 중 오류"):
+            result["status"] = "error"
+        else:
+            result["status"] = "ok"
+            result["latency"] = final[0] - started
+            if not dm:
+                result["history_complete"] = self._history_complete(channel, thread_ts, ts)
+        return result
+
+    def _history_complete(self, channel: str, thread_ts: str, ts: str) -> bool:
+        """앱이 질문(ts)에 쓴 히스토리가 가짜 Slack 서버에 있는 그 이전 대화(최근 max_turns개)와 같은지"""
+        with self._lock:
+            recorded = self._histories.get((channel, ts))
+        if recorded is None:
+            return False
+        history, max_turns = recorded
+        expected = []
+        for message in self.server.thread_messages(channel, thread_ts):
+            converted = _to_history_message(message)
+            if converted is not None and _ts_key(message["ts"]) < _ts_key(ts):
+                expected.append(converted)
+        return history == expected[-max_turns:]
+
+    def run_level(self, concurrency: int, requests_per_user: int) -> dict:
+        results: list[dict] = []
+        results_lock = threading.Lock()
+
+        def virtual_user(u: int):
+            user = f"U{concurrency:03d}{u:04d}"
+            # 사용자 u명 중 비율만큼 고르게: app_mention만 받는 앱처럼 이벤트를 보내고, 질문을 한 스레드에 이어서 함
+            mention_only = int((u + 1) * self.mention_only_ratio) > int(u * self.mention_only_ratio)
+            thread_ts = None
+            for r in range(requests_per_user):
+                i = u * requests_per_user + r
+                question, _ = self.questions[i % len(self.questions)]
+                if mention_only:
+                    if thread_ts:
+                        # 다른 사람이 멘션 없이 단 답글 (message 이벤트를 구독하지 않으면 앱에 전달되지 않음)
+                        channel = f"C{user[1:]}"
+                        self.server.add_user_message(
+                            channel, self.server.next_ts(), f"참고로 {r}번째 질문 전에 남기는 메모입니다.",
+                            f"UPEER{u:04d}", thread_ts=thread_ts,
+                        )
+                    result = self.send(user, question, dm=False, mention_only=True, thread_ts=thread_ts)
+                    thread_ts = thread_ts or result.get("thread_ts")
+                else:
+                    dm = int((i + 1) * self.dm_ratio) > int(i * self.dm_ratio)  # 질문 i개 중 비율만큼 고르게 DM
+                    result = self.send(user, question, dm)
+                with results_lock:
+                    results.append(result)
+
+        threads = [threading.Thread(target=virtual_user, args=(u,)) for u in range(concurrency)]
+        t0 = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - t0
+        return summarize(results, elapsed)
+
+
+def summarize(results: list[dict], elapsed: float) -> dict:
+    statuses = Counter(r["status"] for r in results)
+    latency, ack, first_reply = LogHistogram(), LogHistogram(), LogHistogram()
+    calls = Counter()
+    for r in results:
+        ack.add(r["ack"])
+        if "first_reply" in r:
+            first_reply.add(r["first_reply"])
+        if r["status"] == "ok":
+            latency.add(r["latency"])
+            calls.update(r["calls"])
+    answered = statuses["ok"]
+    latency_summary, ack_summary, first_summary = latency.summary(), ack.summary(), first_reply.summary()
+    return {
+        "requests": len(results),
+        "elapsed": round(elapsed, 3),
+        "throughput": round(answered / elapsed, 2) if elapsed else 0.0,
+        "latency": {k: latency_summary[k] for k in ("p50", "p90", "p99", "max")},
+        "ack": {"p50": ack_summary["p50"], "p99": ack_summary["p99"], "max": ack_summary["max"]},
+        "ack_timeouts": sum(r["ack"] >= ACK_TIMEOUT for r in results),
+        "first_reply": {"p50": first_summary["p50"], "p99": first_summary["p99"]},
+        "calls_per_answer": {method: round(n / answered, 2) for method, n in sorted(calls.items())} if answered else {},
+        "status": dict(statuses),
+        "error_rate": round(1 - answered / len(results), 3) if results else 0.0,
+        "history_checked": sum("history_complete" in r for r in results),
+        "history_incomplete": sum(r.get("history_complete") is False for r in results),
+    }
+
+
+def print_results(levels: dict):
+    print("\n" + "=" * 96)
+    print("  부하 테스트 결과 (지연 시간 단위: 초)")
+    print("=" * 96)
+    print(
+        f"  {'users':>5} {'reqs':>5} {'answers/s':>9} {'p50':>7} {'p90':>7} {'p99':>7} "
+        f"{'first p99':>9} {'ack p99':>8} {'ack>3s':>6} {'fail':>6} {'hist✗':>5}  API calls/answer · status"
+    )
+    for concurrency, r in levels.items():
+        calls = ", ".join(f"{method} {n}" for method, n in r["calls_per_answer"].items())
+        statuses = ", ".join(f"{status} {n}" for status, n in sorted(r["status"].items()))
+        print(
+            f"  {concurrency:>5} {r['requests']:>5} {r['throughput']:>9.2f} {r['latency']['p50']:>7.3f} "
+            f"{r['latency']['p90']:>7.3f} {r['latency']['p99']:>7.3f} {r['first_reply']['p99']:>9.3f} "
+            f"{r['ack']['p99']:>8.3f} {r['ack_timeouts']:>6} {r['error_rate']:>6.1%} {r['history_incomplete']:>5}  "
+            f"{calls} · {statuses}"
+        )
+    print("\n  first: 질문 → 첫 봇 메시지(\"검색 중\" 등) / ack: 이벤트 응답 / fail: 거절 + 오류 + 시간 초과 비율")
+    print("  hist✗: 스레드 히스토리가 Slack 대화와 다른(누락된) 답변 수")
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 Slack 서버로 app.py 부하 테스트")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16], help="단계별 동시 사용자 수")
+    parser.add_argument("--requests", type=int, default=5, help="단계마다 사용자 1명이 보내는 질문 수")
+    parser.add_argument("--dm-ratio", type=float, default=0.2, help="DM으로 보내는 질문 비율 (0~1)")
+    parser.add_argument(
+        "--mention-only-ratio", type=float, default=0.25,
+        help="message 이벤트 없이 app_mention만 보내고 한 스레드에서 이어서 질문하는 사용자 비율 (0~1)",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="app.py 요청 큐 워커 수 (WORKER_COUNT)")
+    parser.add_argument("--docs", type=int, default=10, help="가짜 PDF 문서 수")
+    parser.add_argument("--pages", type=int, default=5, help="문서당 쪽 수")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="LLM 호출당 첫 토큰 지연 (초)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="출력 토큰당 지연 (초)")
+    parser.add_argument("--answer-tokens", type=int, default=80, help="답변 길이 (토큰)")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="임베딩 요청당 지연 (초)")
+    parser.add_argument("--slack-latency", type=float, default=0.05, help="Slack API 호출당 지연 (초)")
+    parser.add_argument("--stream-interval", type=float, default=1.0, help="스트리밍 메시지 수정 간격 (초)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="답변 대기 제한 시간 (초)")
+    parser.add_argument("--answer-cache", action="store_true", help="시맨틱 답변 캐시 사용 (기본: 끔)")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    parser.add_argument("--verbose", action="store_true", help="앱 로그 출력")
+    args = parser.parse_args()
+
+    # app.py보다 먼저 로깅을 설정하여 부하 테스트 로그가 logs/app.log에 쌓이지 않게 함
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    work_dir = Path(tempfile.mkdtemp(prefix="rag-load-"))
+    server = FakeSlackServer(latency=args.slack_latency, is_final=is_final_answer)
+    try:
+        app_module = load_app(args, work_dir, server)
+        questions = make_questions(max(100, max(args.concurrency) * args.requests), args.docs)
+        generator = LoadGenerator(app_module, server, questions, args.timeout, args.dm_ratio, args.mention_only_ratio)
+
+        levels = {}
+        for concurrency in args.concurrency:
+            print(f"🚀 동시 사용자 {concurrency}명 × 질문 {args.requests}개...")
+            levels[str(concurrency)] = generator.run_level(concurrency, args.requests)
+        rag_module.get_trace_writer().flush()
+    finally:
+        server.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "levels": levels}, ensure_ascii=False, indent=2))
+    else:
+        print_results(levels)
+        print(f"\n  Slack API 호출 합계: {dict(server.calls)}")
+
+    checked = sum(r["history_checked"] for r in levels.values())
+    incomplete = sum(r["history_incomplete"] for r in levels.values())
+    if incomplete:
+        print(f"\n❌ 스레드 히스토리 누락 {incomplete}건 (확인한 답변 {checked}건)")
+        sys.exit(1)
+    print(f"\n✅ 스레드 히스토리 {checked}건 모두 Slack 대화와 일치")
+
+
+if __name__ == "__main__":
+    main()
@@ -45,7 +45,10 @@ def print_trace(trace: dict, show_prompt: bool = False):
     if trace.get("retrieved_chunks"):
         print_separator(f"검색된 청크 (Top-{len(trace['retrieved_chunks'])})")
         for i, chunk in enumerate(trace["retrieved_chunks"], 1):
-            print(f"\n  [{i}] 출처: {chunk['source']} (p.{chunk['page']})  |  유사도: {chunk['score']}")
+            print(
+                f"\n  [{i}] 출처: {chunk['source']} (p.{chunk['page']})  |  "
+                f"RRF: {chunk.get('rrf_score')}  |  벡터 거리: {chunk['score']}"
+            )
             preview = chunk["text"][:150].replace("\n", " ")
             if len(chunk["text"]) > 150:
                 preview += "..."
@@ -142,12 +145,13 @@ def interactive_mode(rag: RAG):
                 continue
             print_separator(f"검색만 수행: '{query}'")
             results = rag.search(query)
-            for i, (doc, score) in enumerate(results, 1):
+            for i, (doc, distance, rrf_score) in enumerate(results, 1):
                 source = doc.metadata.get("source", "?")
                 source_name = os.path.basename(source) if source else "?"
                 page = doc.metadata.get("page", "?")
                 preview = doc.page_content[:200].replace("\n", " ")
-                print(f"\n  [{i}] 유사도: {score:.4f} | 출처: {source_name} (p.{page})")
+                distance_label = f"{distance:.4f}" if distance is not None else "-"
+                print(f"\n  [{i}] RRF: {rrf_score:.4f} | 벡터 거리: {distance_label} | 출처: {source_name} (p.{page})")
                 print(f"      {preview}")
             print_separator()
             continue